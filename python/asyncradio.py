@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Replacements of the event queue, the scheduler and the wifi thread,
+used when the radio runs on an asyncio event loop (see the --asyncio
+option of mamemasradio.py).
+With them, the events, the timeouts, the scrolling texts and the periodic
+wifi measurement are all handled by the event loop thread, and the
+blocking calls of the states are run out of it.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import math
+import logging
+
+from eventqueue import EventCoalescer
+
+
+def _in_loop(loop):
+    """ Tells if the caller runs in the thread of the given loop
+    """
+    try:
+        return asyncio.get_running_loop() is loop
+    except RuntimeError:
+        return False
+
+
+def _call(loop, function, *args):
+    """ Calls the function in the loop thread : directly if already there,
+        else through call_soon_threadsafe
+    """
+    if _in_loop(loop):
+        function(*args)
+    else:
+        loop.call_soon_threadsafe(function, *args)
+
+
+class AsyncEventQueue:
+    """ The event queue of the radio, merging the superseded events as
+        eventqueue.CoalescingQueue does, and awaited by the event loop.
+        put() may be called from any thread (GPIO callbacks, track watcher...)
+        The event loop shall be the current one when the queue is created.
+    """
+
+    def __init__(self, loop):
+        self._loop = loop
+        self._coalescer = EventCoalescer()
+        self._ready = asyncio.Event()
+
+    def put(self, event):
+        _call(self._loop, self._add, event)
+
+    def _add(self, event):
+        self._coalescer.add(event)
+        self._ready.set()
+
+    async def get(self):
+        while not len(self._coalescer):
+            self._ready.clear()
+            await self._ready.wait()
+        return self._coalescer.pop()
+
+    def task_done(self):
+        return
+
+    def _get_stats(self):
+        return self._coalescer.stats
+
+    stats = property(fget=_get_stats)
+
+
+class AsyncTask:
+    """ The asyncio counterpart of scheduler.PeriodicTask, based on
+        loop.call_at() handles
+    """
+
+    def __init__(self, loop, period, callback):
+        self.logger = logging.getLogger(type(self).__name__)
+        self._loop = loop
+        self.period = period
+        self.callback = callback
+        self.paused = True
+        self.cancelled = False
+        self._handle = None
+        self._deadline = 0
+
+    def pause(self):
+        _call(self._loop, self._pause)
+
+    def resume(self, delay=0):
+        _call(self._loop, self._resume, delay)
+
+    def cancel(self):
+        _call(self._loop, self._cancel)
+
+    def _pause(self):
+        self.paused = True
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+
+    def _resume(self, delay):
+        if self.cancelled:
+            return
+        self._pause()
+        self.paused = False
+        self._deadline = self._loop.time() + delay
+        self._handle = self._loop.call_at(self._deadline, self._fire)
+
+    def _cancel(self):
+        self._pause()
+        self.cancelled = True
+
+    def _fire(self):
+        self._handle = None
+        try:
+            self.callback()
+        except Exception:
+            self.logger.exception("Error in task %s", self.callback)
+        if self.period is None:
+            if self._handle is None:
+                self.paused = True
+        elif not self.paused and self._handle is None:
+            # skip the periods that could not be honoured in time
+            late = max(0, math.floor((self._loop.time() - self._deadline) / self.period))
+            self._deadline += (late + 1) * self.period
+            self._handle = self._loop.call_at(self._deadline, self._fire)
+
+
+class AsyncScheduler:
+    """ Same interface as scheduler.Scheduler, but the callbacks are called
+        by the asyncio event loop instead of a dedicated thread.
+    """
+
+    def __init__(self, loop):
+        self._loop = loop
+
+    def schedule_periodic(self, period, callback, paused=False, delay=0):
+        if period <= 0:
+            raise ValueError("The period shall be positive")
+        task = AsyncTask(self._loop, period, callback)
+        if not paused:
+            task.resume(delay)
+        return task
+
+    def call_later(self, delay, callback):
+        task = AsyncTask(self._loop, None, callback)
+        task.resume(delay)
+        return task
+
+    def stop(self):
+        return
+
+
+class AsyncPoller:
+    """ Calls a blocking function periodically in the executor of the loop,
+        and gives its result to the callback, called in the loop thread.
+        It has the interface of the WifiThread : start, stop, pause, resume.
+    """
+
+    def __init__(self, loop, function, callback, period):
+        self.logger = logging.getLogger(type(self).__name__)
+        self._loop = loop
+        self._function = function
+        self._callback = callback
+        self._period = period
+        self._resumed = asyncio.Event()
+        self._task = None
+
+    def start(self):
+        _call(self._loop, self._start)
+
+    def stop(self):
+        _call(self._loop, self._stop_task)
+
+    def pause(self):
+        _call(self._loop, self._resumed.clear)
+
+    def resume(self):
+        _call(self._loop, self._resumed.set)
+
+    def _start(self):
+        self._task = self._loop.create_task(self._run())
+
+    def _stop_task(self):
+        if self._task is not None:
+            self._task.cancel()
+
+    async def _run(self):
+        while True:
+            await self._resumed.wait()
+            try:
+                result = await self._loop.run_in_executor(None, self._function)
+            except Exception:
+                self.logger.exception("Error in polled function %s", self._function)
+            else:
+                self._callback(result)
+            await asyncio.sleep(self._period)
+
+
+class AsyncBlockingCaller:
+    """ Same interface as scheduler.BlockingCaller, but the blocking calls
+        are run by an executor thread, so that they never block the event
+        loop. A single thread runs them : they keep their order, an mpd
+        command is never sent before the previous one.
+        The callback is called in the loop thread.
+    """
+
+    def __init__(self, loop):
+        self.logger = logging.getLogger(type(self).__name__)
+        self._loop = loop
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="BlockingCall")
+
+    def call(self, function, *args, callback=None):
+        _call(self._loop, self._submit, function, args, callback)
+
+    def stop(self):
+        """ Waits for the end of the pending calls
+        """
+        self._executor.shutdown(wait=True)
+
+    def _submit(self, function, args, callback):
+        future = self._loop.run_in_executor(self._executor, function, *args)
+        future.add_done_callback(lambda done: self._done(function, done, callback))
+
+    def _done(self, function, future, callback):
+        if future.cancelled():
+            return
+        error = future.exception()
+        if error is not None:
+            self.logger.error("Error in blocking call %s : %s", function, error)
+        elif callback is not None:
+            callback(future.result())
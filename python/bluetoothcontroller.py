@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Control of the bluetooth adapter through bluetoothd on D-Bus
+"""
+
+from threading import Thread, Lock
+import logging
+
+BLUEZ_SERVICE = "org.bluez"
+ADAPTER_INTERFACE = "org.bluez.Adapter1"
+DEVICE_INTERFACE = "org.bluez.Device1"
+MEDIA_PLAYER_INTERFACE = "org.bluez.MediaPlayer1"
+AGENT_INTERFACE = "org.bluez.Agent1"
+AGENT_MANAGER_INTERFACE = "org.bluez.AgentManager1"
+PROPERTIES_INTERFACE = "org.freedesktop.DBus.Properties"
+OBJECT_MANAGER_INTERFACE = "org.freedesktop.DBus.ObjectManager"
+
+AGENT_PATH = "/mamemasradio/agent"
+# The radio has no way to display or enter a pin code
+AGENT_CAPABILITY = "NoInputNoOutput"
+
+
+class BluetoothError(Exception):
+    """ Raised when bluetoothd cannot be reached or refuses a command
+    """
+
+
+def _to_python(value):
+    """ Converts the dbus-python types of a value to the python ones
+    """
+    if isinstance(value, dict):
+        return {_to_python(key): _to_python(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_to_python(item) for item in value]
+    # dbus.Boolean is an int
+    if type(value).__name__ == "Boolean":
+        return bool(value)
+    for python_type in (str, int, float):
+        if isinstance(value, python_type):
+            return python_type(value)
+    return value
+
+
+def _export_agent(bus, path):
+    """ Exports on the bus a pairing agent accepting every request
+    """
+    import dbus.service
+
+    class Agent(dbus.service.Object):
+
+        @dbus.service.method(AGENT_INTERFACE, in_signature="", out_signature="")
+        def Release(self):
+            return
+
+        @dbus.service.method(AGENT_INTERFACE, in_signature="os", out_signature="")
+        def AuthorizeService(self, device, uuid):
+            return
+
+        @dbus.service.method(AGENT_INTERFACE, in_signature="o", out_signature="")
+        def RequestAuthorization(self, device):
+            return
+
+        @dbus.service.method(AGENT_INTERFACE, in_signature="", out_signature="")
+        def Cancel(self):
+            return
+
+    return Agent(bus, path)
+
+
+class BluezBus:
+    """ The connection to bluetoothd on the system D-Bus, through dbus-python.
+        The signals are received by a GLib main loop running in its own
+        thread : the subscribed callbacks are called from that thread.
+
+        The BluetoothController only uses the methods of this class, so
+        that it can be tested with the stand-in of fakebluez.py.
+    """
+
+    def __init__(self):
+        try:
+            import dbus
+            from dbus.mainloop.glib import DBusGMainLoop
+            from gi.repository import GLib
+        except ImportError as error:
+            # python3-dbus or python3-gi is not installed
+            raise BluetoothError("Cannot reach bluetoothd : {}".format(error))
+        self.logger = logging.getLogger(type(self).__name__)
+        self._dbus = dbus
+        DBusGMainLoop(set_as_default=True)
+        try:
+            self._bus = dbus.SystemBus()
+        except dbus.exceptions.DBusException as error:
+            raise BluetoothError(str(error))
+        self._loop = GLib.MainLoop()
+        self._thread = Thread(target=self._loop.run, name="BluezBus", daemon=True)
+        self._thread.start()
+        self._agent = None
+        self._receivers = []
+
+    def _interface(self, path, interface):
+        return self._dbus.Interface(self._bus.get_object(BLUEZ_SERVICE, path), interface)
+
+    def get_managed_objects(self):
+        """ Returns the properties of the bluez objects, indexed by path
+            and by interface
+        """
+        try:
+            manager = self._interface("/", OBJECT_MANAGER_INTERFACE)
+            return _to_python(manager.GetManagedObjects())
+        except self._dbus.exceptions.DBusException as error:
+            raise BluetoothError(str(error))
+
+    def get_properties(self, path, interface):
+        try:
+            return _to_python(self._interface(path, PROPERTIES_INTERFACE).GetAll(interface))
+        except self._dbus.exceptions.DBusException as error:
+            raise BluetoothError(str(error))
+
+    def set_property(self, path, interface, name, value):
+        if isinstance(value, bool):
+            value = self._dbus.Boolean(value)
+        try:
+            self._interface(path, PROPERTIES_INTERFACE).Set(interface, name, value)
+        except self._dbus.exceptions.DBusException as error:
+            raise BluetoothError(str(error))
+
+    def subscribe_properties_changed(self, callback):
+        """ callback(path, interface, changed properties) is called for
+            each PropertiesChanged signal of bluez
+        """
+        def receiver(interface, changed, invalidated, path=None):
+            callback(str(path), str(interface), _to_python(changed))
+        self._receivers.append(self._bus.add_signal_receiver(
+            receiver, signal_name="PropertiesChanged",
+            dbus_interface=PROPERTIES_INTERFACE, bus_name=BLUEZ_SERVICE,
+            path_keyword="path"))
+
+    def subscribe_interfaces_added(self, callback):
+        """ callback(path, properties by interface) is called for each
+            object or interface created by bluez
+        """
+        def receiver(path, interfaces):
+            callback(str(path), _to_python(interfaces))
+        self._receivers.append(self._bus.add_signal_receiver(
+            receiver, signal_name="InterfacesAdded",
+            dbus_interface=OBJECT_MANAGER_INTERFACE, bus_name=BLUEZ_SERVICE))
+
+    def subscribe_interfaces_removed(self, callback):
+        """ callback(path, interfaces) is called for each object or
+            interface removed by bluez
+        """
+        def receiver(path, interfaces):
+            callback(str(path), _to_python(interfaces))
+        self._receivers.append(self._bus.add_signal_receiver(
+            receiver, signal_name="InterfacesRemoved",
+            dbus_interface=OBJECT_MANAGER_INTERFACE, bus_name=BLUEZ_SERVICE))
+
+    def register_agent(self, capability):
+        """ Registers the default pairing agent, as 'agent' and
+            'default-agent' of bluetoothctl do
+        """
+        try:
+            self._agent = _export_agent(self._bus, AGENT_PATH)
+            manager = self._interface("/org/bluez", AGENT_MANAGER_INTERFACE)
+            manager.RegisterAgent(AGENT_PATH, capability)
+            manager.RequestDefaultAgent(AGENT_PATH)
+        except self._dbus.exceptions.DBusException as error:
+            raise BluetoothError(str(error))
+
+    def close(self):
+        for receiver in self._receivers:
+            receiver.remove()
+        self._receivers = []
+        self._loop.quit()
+        self._bus.close()
+
+
+class BluetoothController:
+    """ Controls the bluetooth adapter through bluetoothd, on a single
+        connection kept open, instead of running bluetoothctl for each
+        command : setting a property is a D-Bus call of a few milliseconds.
+
+        It also follows the connection of the devices. The callback is
+        called with (controller, device name, connected) when a device
+        connects or disconnects, from the thread receiving the signals.
+
+        The bus is a BluezBus, or the FakeBluezBus for the tests.
+    """
+
+    def __init__(self, bus, callback=None):
+        self.logger = logging.getLogger(type(self).__name__)
+        self._bus = bus
+        self._callback = callback
+        self._lock = Lock()
+        self._devices = {}
+        # subscribed first, so that no change is missed
+        bus.subscribe_properties_changed(self._properties_changed)
+        objects = bus.get_managed_objects()
+        adapters = sorted(path for path, interfaces in objects.items()
+                          if ADAPTER_INTERFACE in interfaces)
+        if not adapters:
+            raise BluetoothError("No bluetooth adapter found")
+        self._adapter = adapters[0]
+        with self._lock:
+            for path, interfaces in objects.items():
+                if DEVICE_INTERFACE in interfaces:
+                    self._devices[path] = dict(interfaces[DEVICE_INTERFACE])
+        self.logger.debug("Bluetooth adapter : %s", self._adapter)
+
+    def setup(self):
+        """ Makes the adapter pairable without any pin code
+        """
+        self.pairable = True
+        self._bus.register_agent(AGENT_CAPABILITY)
+
+    def close(self):
+        self._bus.close()
+
+    def _properties_changed(self, path, interface, changed):
+        if interface != DEVICE_INTERFACE:
+            return
+        with self._lock:
+            device = self._devices.get(path)
+            if device is None:
+                # a device seen for the first time, not connected until now
+                try:
+                    device = self._bus.get_properties(path, DEVICE_INTERFACE)
+                except BluetoothError:
+                    device = {}
+                device["Connected"] = False
+                self._devices[path] = device
+            was_connected = device.get("Connected", False)
+            device.update(changed)
+            connected = device.get("Connected", False)
+            name = _device_name(path, device)
+        if connected != was_connected:
+            self.logger.info("Device %s %s", name, "connected" if connected else "disconnected")
+            if self._callback is not None:
+                self._callback(self, name, connected)
+
+    def _set_adapter_property(self, name, value):
+        self._bus.set_property(self._adapter, ADAPTER_INTERFACE, name, value)
+
+    def _get_connected_devices(self):
+        with self._lock:
+            return [_device_name(path, device) for path, device in sorted(self._devices.items())
+                    if device.get("Connected", False)]
+
+    powered = property(fset=lambda self, value: self._set_adapter_property("Powered", value))
+    pairable = property(fset=lambda self, value: self._set_adapter_property("Pairable", value))
+    discoverable = property(fset=lambda self, value:
+                            self._set_adapter_property("Discoverable", value))
+    connected_devices = property(fget=_get_connected_devices)
+
+
+def _device_name(path, properties):
+    for key in ("Alias", "Name", "Address"):
+        if properties.get(key):
+            return properties[key]
+    return path.rsplit("/", 1)[-1]
@@ -6,54 +6,23 @@ Created on Sun May 10 19:38:01 2020
 @author: Sébastien ROY
 """
 import logging
-import subprocess
 import random
 import datetime
-import time
-from threading import Thread, Event
-
-import RPi.GPIO as GPIO
 
 from radiostate import RadioState
 from volumestate import VolumeState
 from btidlestate import BtIdleState
 from resources import Resources
 from scrollingtext import ScrollingText
+from display import blink_pattern
 from radioevents import TextUpdateEvent, TextFieldType, PowerButtonEvent, StationButtonEvent, VolumeButtonEvent, VolumeTimeoutEvent
+from radioevents import BluetoothDeviceEvent, PlayerStatusEvent, DiscoverableTimeoutEvent
+from bluetoothcontroller import BluetoothController, BluetoothError
+from btmediawatcher import BtMediaWatcher
+from playersupervisor import PlayerSupervisor, PlayerStatus
 from powerbutton import PowerEvent
 from encoder import EncoderEvent
 
-class BlinkingThread(Thread):
-    """ A thread used to blink the display background when bluetooth is discoverable
-    """
-    def __init__(self, callback):
-        Thread.__init__(self)
-        self._callback = callback
-        self._stop = False
-        self._pause = Event()
-
-    def stop(self):
-        """ Stops the thread
-        """
-        self._stop = True
-
-    def pause(self):
-        """ Pauses the thread
-        """
-        self._pause.clear()
-
-    def resume(self):
-        """ Resumes the thread
-        """
-        self._pause.set()
-
-    def run(self):
-        while not self._stop:
-            self._pause.wait()
-            time.sleep(0.5)
-            self._callback()
-
-
 class BluetoothState(RadioState):
     """ Bluetooth state is entered when the radio is off and the user press the
     station button. The bluetooth state allows to play from a phone (for instance)
@@ -74,7 +43,8 @@ class BluetoothState(RadioState):
                                            display_size=20, refresh_rate=0,
                                            scroll_begin_delay=self._ctxt.rsc.scroll_begin,
                                            scroll_end_delay=self._ctxt.rsc.scroll_end,
-                                           scroll_rate=self._ctxt.rsc.scroll_rate)
+                                           scroll_rate=self._ctxt.rsc.scroll_rate,
+                                           scheduler=self._ctxt.scheduler)
         self._random_msg_display.start()
         self._random_msg_display.pause()
 
@@ -82,45 +52,91 @@ class BluetoothState(RadioState):
         self._clock_rolling_text = ScrollingText(self._get_time_text,
                                                  self._time_callback,
                                                  display_size=5,
-                                                 refresh_rate=1)
+                                                 refresh_rate=1,
+                                                 scheduler=self._ctxt.scheduler)
         self._clock_rolling_text.start()
         self._clock_rolling_text.pause()
 
-        self._blink_thread = None
+        # the display background blinks while bluetooth is discoverable
         self._blinking = False
+        self._discoverable_timeout = None
         # substates
         self._volume_state = VolumeState(self._ctxt, self)
         self._idle_state = BtIdleState(self._ctxt, self)
         self._sub_state = None
-        
-        # ensure the bluetooth device is pairable
-        subprocess.call(["bluetoothctl", "pairable", "on"])
-        subprocess.call(["bluetoothctl", "agent", "NoInputNoOutput"]) 
-        subprocess.call(["bluetoothctl", "default-agent"]) 
-
+        # bluetoothd is connected on the first entry, not at startup
+        self._bt_initialised = False
+        self._controller = None
+        self._media_watcher = None
+        self._player = None
         return
 
+    def _init_bluetooth(self):
+        # the player is kept running after the first entry, the sound is
+        # cut by the soundcard when the bluetooth mode is left
+        self._player = PlayerSupervisor(self._ctxt.hardware.processes,
+                                        callback=self._player_callback)
+        self._player.start()
+        bus = None
+        try:
+            bus = self._ctxt.hardware.create_bluetooth_bus()
+            self._controller = BluetoothController(bus, self._device_callback)
+            # the connected device and its track are displayed by the idle state
+            self._media_watcher = BtMediaWatcher(bus, self._media_callback)
+            # ensure the bluetooth device is pairable
+            self._controller.setup()
+        except BluetoothError as error:
+            self.logger.error("Cannot control the bluetooth adapter : %s", error)
+            if bus is not None and self._controller is None:
+                # the controller closes the bus on cleanup
+                bus.close()
+
+    def _set_adapter(self, name, value):
+        """ Sets a property of the bluetooth adapter (powered, discoverable).
+            The D-Bus call is made by the caller of the context, after the
+            initialisation
+        """
+        self._ctxt.caller.call(self._send_adapter, name, value)
+
+    def _send_adapter(self, name, value):
+        """ An error is only logged : the radio goes on without bluetooth
+        """
+        if self._controller is None:
+            return
+        try:
+            setattr(self._controller, name, value)
+        except BluetoothError as error:
+            self.logger.error("Cannot set the bluetooth %s property : %s", name, error)
+
+    def _device_callback(self, controller, name, connected):
+        self._ctxt.event_queue.put(BluetoothDeviceEvent(connected, name))
+
+    def _media_callback(self, watcher):
+        self._idle_state.media_changed(watcher.device_name, watcher.track_title)
+
+    def _player_callback(self, originator, status):
+        self._ctxt.event_queue.put(PlayerStatusEvent(status))
+
     def enter_state(self):
         """ Assumption : the Audio Profile Sink Role has been enabled
             switch on soundcard
-            echo "power on" | bluetoothctl
-            echo "pairable on" | bluetoothctl
-            bluealsa-aplay 00:00:00:00:00:00
+            power on and pairable on, through bluetoothd
+            bluealsa-aplay 00:00:00:00:00:00, started on the first entry only
         """
         self.logger.debug("Entering BluetoothState ")
+        if not self._bt_initialised:
+            self._bt_initialised = True
+            # bluetoothd is reached through blocking D-Bus calls
+            self._ctxt.caller.call(self._init_bluetooth)
 
         self.random_msg = self._ctxt.rsc.today_msg
         if not self.random_msg:
             self.random_msg = random.choice(self._ctxt.rsc.random_msgs)
 
          # switch on the soundcard
-        mute_gpio = self._ctxt.rsc.mute_gpio
-        if mute_gpio != 0:
-            GPIO.output(mute_gpio, GPIO.HIGH)
+        self._ctxt.soundcard.enabled = True
         # power on the bluetooth stuff
-        subprocess.call(["bluetoothctl", "power", "on"])
-        # play what users want to
-        self._aplay_proc = subprocess.Popen(["bluealsa-aplay","00:00:00:00:00:00"])
+        self._set_adapter("powered", True)
 
         self._ctxt.lcd.clear()
         self._ctxt.lcd.backlight_enabled = True
@@ -136,12 +152,12 @@ class BluetoothState(RadioState):
         return
 
     def leave_state(self):
-        #close all the bluetooth stuff
-        self._aplay_proc.kill()
-        #subprocess.call(["bluetoothctl" ,"pairable", "off"])
-        subprocess.call(["bluetoothctl", "power", "off"])
-
+        #close all the bluetooth stuff, the player goes on muted
+        self._ctxt.soundcard.enabled = False
+        # not discoverable any more, before the adapter is powered off
         self._stop_blinking()
+        self._set_adapter("powered", False)
+
         self._clock_rolling_text.pause()
         self._random_msg_display.pause()
         return
@@ -155,6 +171,19 @@ class BluetoothState(RadioState):
                 self._stop_blinking()
             else:
                 self._start_blinking()
+        elif type(event) is BluetoothDeviceEvent:
+            self.logger.info("Bluetooth device %s, connected : %s", event.originator, event.value)
+            if event.value and self._blinking:
+                # the device is paired : no need to stay discoverable
+                self._stop_blinking()
+        elif type(event) is PlayerStatusEvent:
+            if event.value == PlayerStatus.STARTED:
+                self.logger.info("Bluetooth player started")
+            else:
+                self.logger.warning("Bluetooth player failure : %s", event.value)
+        elif type(event) is DiscoverableTimeoutEvent:
+            if self._blinking:
+                self._stop_blinking()
         elif type(event) is VolumeTimeoutEvent:
             self._leave_volume()
         elif type(event) is VolumeButtonEvent:
@@ -166,9 +195,21 @@ class BluetoothState(RadioState):
             self.logger.debug("writing clock string : %s", event.value)
             self._ctxt.lcd.cursor_pos = (0, 15)
             self._ctxt.lcd.write_string(event.value.rjust(5))
+        elif self._sub_state is not None:
+            self._sub_state.handle_event(event)
         return
 
     def cleanup(self):
+        if self._discoverable_timeout is not None:
+            self._discoverable_timeout.cancel()
+        self._clock_rolling_text.stop()
+        self._random_msg_display.stop()
+        self._idle_state.cleanup()
+        self._volume_state.cleanup()
+        if self._controller is not None:
+            self._controller.close()
+        if self._player is not None:
+            self._player.stop()
         return
 
     def _leave_volume(self):
@@ -181,7 +222,7 @@ class BluetoothState(RadioState):
         if self._sub_state == self._volume_state:
             self._sub_state.handle_event(event)
         else:
-            self._volume_state.increment(event.value)
+            self._volume_state.increment(event.steps)
             self._sub_state.leave_state()
             self._sub_state = self._volume_state
             self._sub_state.enter_state()
@@ -208,22 +249,21 @@ class BluetoothState(RadioState):
 
     def _start_blinking(self):
         self.logger.debug("switch to discoverable")
-        self._blinking_starttime = time.time()
-        self._blink_thread = BlinkingThread(self.blink)
-        self._blink_thread.start()
-        self._blink_thread.resume()
-        subprocess.call(["bluetoothctl", "discoverable", "on"])
+        # the blinking is played by the display, serialized with the writes
+        self._ctxt.lcd.start_effect(blink_pattern())
+        self._discoverable_timeout = self._ctxt.scheduler.call_later(
+            self._ctxt.rsc.bt_discoverable_timeout, self._discoverable_timeout_callback)
+        self._blinking = True
+        self._set_adapter("discoverable", True)
 
     def _stop_blinking(self):
-        if self._blink_thread is not None:
-            self._blink_thread.stop()
-            self._blink_thread = None
+        if self._discoverable_timeout is not None:
+            self._discoverable_timeout.cancel()
+            self._discoverable_timeout = None
+        self._blinking = False
+        # ends the blinking
         self._ctxt.lcd.backlight_enabled = True
-        subprocess.call(["bluetoothctl", "discoverable", "off"])
-
-    def blink(self):
-        self.logger.debug("Blink!")
-        self._ctxt.lcd.backlight_enabled = not(self._ctxt.lcd.backlight_enabled)
-        if self._ctxt.lcd.backlight_enabled \
-                and (time.time() - self._blinking_starttime) > self._ctxt.rsc.bt_discoverable_timeout:
-            self._stop_blinking()
+        self._set_adapter("discoverable", False)
+
+    def _discoverable_timeout_callback(self):
+        self._ctxt.event_queue.put(DiscoverableTimeoutEvent())
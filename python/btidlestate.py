@@ -6,31 +6,87 @@ Created on Sat May 16 15:26:24 2020
 @author: Sebastien ROY
 """
 
+import logging
+
 from radiostate import RadioState
 from resources import Resources
+from radioevents import TextUpdateEvent, TextFieldType
+from scrollingtext import ScrollingText
 
 
 class BtIdleState(RadioState):
+    """ Displays the connected bluetooth device on the third line, and the
+        track it plays on the fourth one. They are given by media_changed(),
+        called by the BtMediaWatcher.
+        When no device is connected, the bluetooth playback message is displayed
+    """
     def __init__(self, context, owner):
         RadioState.__init__(self, context, owner)
+        self.logger = logging.getLogger(type(self).__name__)
+        self._device_name = ""
+        self._track_title = ""
+        rsc = self._ctxt.rsc
+        # the texts are refreshed by media_changed(), no need of refresh_rate
+        self._device_display = ScrollingText(self._device_text, self._device_callback,
+                                             display_size=20, refresh_rate=0,
+                                             scroll_begin_delay=rsc.scroll_begin,
+                                             scroll_end_delay=rsc.scroll_end,
+                                             scroll_rate=rsc.scroll_rate,
+                                             scheduler=self._ctxt.scheduler)
+        self._device_display.pause()
+        self._device_display.start()
+        self._track_display = ScrollingText(self._track_text, self._track_callback,
+                                            display_size=20, refresh_rate=0,
+                                            scroll_begin_delay=rsc.scroll_begin,
+                                            scroll_end_delay=rsc.scroll_end,
+                                            scroll_rate=rsc.scroll_rate,
+                                            scheduler=self._ctxt.scheduler)
+        self._track_display.pause()
+        self._track_display.start()
         return
 
     def enter_state(self):
-        # just display an idlle message
-        bt_msg = self._ctxt.rsc.get_i18n(Resources.BT_PLAYBACK_ENTRY)
-        self._ctxt.lcd.cursor_pos = (2, 0)
-        self._ctxt.lcd.write_string(bt_msg)
-        # last line is empty
-        self._ctxt.lcd.cursor_pos = (3, 0)
-        self._ctxt.lcd.write_string(" ".rjust(20))
-
+        self._device_display.resume()
+        self._track_display.resume()
         return
 
     def leave_state(self):
+        self._device_display.pause()
+        self._track_display.pause()
         return
 
+    def media_changed(self, device_name, track_title):
+        """ May be called from any thread
+        """
+        self._device_name = device_name
+        self._track_title = track_title
+        self._device_display.refresh()
+        self._track_display.refresh()
+
+    def _device_text(self):
+        if self._device_name:
+            return self._device_name
+        return self._ctxt.rsc.get_i18n(Resources.BT_PLAYBACK_ENTRY)
+
+    def _track_text(self):
+        return self._track_title
+
+    def _device_callback(self, originator, value):
+        self._ctxt.event_queue.put(TextUpdateEvent(value, TextFieldType.BT_DEVICE))
+
+    def _track_callback(self, originator, value):
+        self._ctxt.event_queue.put(TextUpdateEvent(value, TextFieldType.BT_TRACK))
+
     def handle_event(self, event):
+        if type(event) is TextUpdateEvent and event.originator == TextFieldType.BT_DEVICE:
+            self._ctxt.lcd.cursor_pos = (2, 0)
+            self._ctxt.lcd.write_string(event.value.ljust(20))
+        elif type(event) is TextUpdateEvent and event.originator == TextFieldType.BT_TRACK:
+            self._ctxt.lcd.cursor_pos = (3, 0)
+            self._ctxt.lcd.write_string(event.value.ljust(20))
         return
 
     def cleanup(self):
+        self._device_display.stop()
+        self._track_display.stop()
         return
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Follows the connected bluetooth device and the track it plays
+"""
+
+from threading import Lock
+import logging
+
+from bluetoothcontroller import DEVICE_INTERFACE, MEDIA_PLAYER_INTERFACE, BluetoothError
+
+
+def track_text(track):
+    """ Returns the text displayed for the Track property of a
+        MediaPlayer1 : "artist - title", or the title alone
+    """
+    title = track.get("Title", "")
+    artist = track.get("Artist", "")
+    if artist and title:
+        return "{} - {}".format(artist, title)
+    return title or artist
+
+
+class BtMediaWatcher:
+    """ Follows the connected bluetooth device and the track it plays
+        (A2DP/AVRCP metadata), from the signals of bluez : nothing is polled.
+        The MediaPlayer1 objects are created with their first Track by the
+        InterfacesAdded signal, then follow it by PropertiesChanged. The
+        InterfacesRemoved signal removes the players and devices.
+
+        The callback is called with the watcher as argument when the name
+        of the device or the track changes, from the thread receiving the
+        signals. When several devices are connected, the last one is shown.
+
+        The bus is a BluezBus, or the FakeBluezBus for the tests.
+    """
+
+    def __init__(self, bus, callback=None):
+        self.logger = logging.getLogger(type(self).__name__)
+        self._bus = bus
+        self._callback = callback
+        self._lock = Lock()
+        # name of the connected devices, by path, in connection order
+        self._connected = {}
+        self._names = {}
+        # track text by device path
+        self._tracks = {}
+        # device path by player path
+        self._players = {}
+        bus.subscribe_properties_changed(self._properties_changed)
+        bus.subscribe_interfaces_added(self._interfaces_added)
+        bus.subscribe_interfaces_removed(self._interfaces_removed)
+        for path, interfaces in sorted(bus.get_managed_objects().items()):
+            if DEVICE_INTERFACE in interfaces:
+                self._device_changed(path, interfaces[DEVICE_INTERFACE])
+            if MEDIA_PLAYER_INTERFACE in interfaces:
+                self._player_changed(path, interfaces[MEDIA_PLAYER_INTERFACE])
+
+    def _properties_changed(self, path, interface, changed):
+        if interface == DEVICE_INTERFACE:
+            self._notify(self._device_changed, path, changed)
+        elif interface == MEDIA_PLAYER_INTERFACE:
+            self._notify(self._player_changed, path, changed)
+
+    def _interfaces_added(self, path, interfaces):
+        if DEVICE_INTERFACE in interfaces:
+            self._notify(self._device_changed, path, interfaces[DEVICE_INTERFACE])
+        if MEDIA_PLAYER_INTERFACE in interfaces:
+            self._notify(self._player_changed, path, interfaces[MEDIA_PLAYER_INTERFACE])
+
+    def _interfaces_removed(self, path, interfaces):
+        if DEVICE_INTERFACE in interfaces:
+            self._notify(self._device_removed, path)
+        if MEDIA_PLAYER_INTERFACE in interfaces:
+            self._notify(self._player_removed, path)
+
+    def _notify(self, update, *args):
+        """ Applies the update, and calls the callback if the displayed
+            texts changed
+        """
+        with self._lock:
+            before = (self._device_name(), self._track_title())
+        update(*args)
+        with self._lock:
+            after = (self._device_name(), self._track_title())
+        if after != before and self._callback is not None:
+            self._callback(self)
+
+    def _device_changed(self, path, properties):
+        name = properties.get("Alias") or properties.get("Name")
+        if "Connected" in properties and not name and path not in self._names:
+            # a device seen for the first time : its name is needed
+            try:
+                device = self._bus.get_properties(path, DEVICE_INTERFACE)
+                name = device.get("Alias") or device.get("Name") or device.get("Address")
+            except BluetoothError:
+                name = None
+        with self._lock:
+            if name:
+                self._names[path] = name
+                if path in self._connected:
+                    self._connected[path] = name
+            if "Connected" in properties:
+                self._connected.pop(path, None)
+                if properties["Connected"]:
+                    self._connected[path] = self._names.get(path, path.rsplit("/", 1)[-1])
+                else:
+                    # the player of the device is gone with it
+                    self._tracks.pop(path, None)
+
+    def _device_removed(self, path):
+        with self._lock:
+            self._connected.pop(path, None)
+            self._names.pop(path, None)
+            self._tracks.pop(path, None)
+
+    def _player_changed(self, path, properties):
+        with self._lock:
+            # the players are children of their device
+            device = properties.get("Device") or self._players.get(path) \
+                or path.rsplit("/", 1)[0]
+            self._players[path] = device
+            if "Track" in properties:
+                self._tracks[device] = track_text(properties["Track"])
+
+    def _player_removed(self, path):
+        with self._lock:
+            device = self._players.pop(path, path.rsplit("/", 1)[0])
+            self._tracks.pop(device, None)
+
+    def _device_name(self):
+        if not self._connected:
+            return ""
+        return list(self._connected.values())[-1]
+
+    def _track_title(self):
+        if not self._connected:
+            return ""
+        return self._tracks.get(list(self._connected)[-1], "")
+
+    def _get_device_name(self):
+        with self._lock:
+            return self._device_name()
+
+    def _get_track_title(self):
+        with self._lock:
+            return self._track_title()
+
+    device_name = property(fget=_get_device_name)
+    track_title = property(fget=_get_track_title)
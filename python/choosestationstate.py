@@ -14,15 +14,10 @@ from radioevents import StationButtonEvent, ChooseTimeoutEvent
 from encoder import EncoderEvent
 from resources import Resources
 
-def timeout_callback(event_queue):
-    event = ChooseTimeoutEvent()
-    event_queue.put(event)
-
 class ChooseStationState(RadioState):
     def __init__(self, ctxt, owner):
         RadioState.__init__(self, ctxt, owner)
         self.target_nb = 0
-        self.playlist = self._ctxt.rsc.playlist
         self._timeout = None
 
     def enter_state(self):
@@ -42,12 +37,8 @@ class ChooseStationState(RadioState):
             if event.value == EncoderEvent.SWITCH_PRESSED:
                 self._timeout.cancel()
                 self._owner.enter_choosing(False, self.target_nb)
-            elif event.value == EncoderEvent.CW_ROTATION:
-                self.target_nb += 1
-                self.display_target()
-                self._reset_timer()
-            elif event.value == EncoderEvent.CCW_ROTATION:
-                self.target_nb -= 1
+            elif event.value in (EncoderEvent.CW_ROTATION, EncoderEvent.CCW_ROTATION):
+                self.target_nb += event.steps
                 self.display_target()
                 self._reset_timer()
         return
@@ -55,18 +46,17 @@ class ChooseStationState(RadioState):
     def _reset_timer(self):
         if self._timeout is not None:
             self._timeout.cancel()
-        self._timeout = Timer(self._ctxt.rsc.choose_timeout,
-                              timeout_callback,
-                              args=[self._ctxt.event_queue])
-        self._timeout.start()
+        self._timeout = self._ctxt.scheduler.call_later(self._ctxt.rsc.choose_timeout,
+                                                        self._timeout_callback)
+
+    def _timeout_callback(self):
+        self._ctxt.event_queue.put(ChooseTimeoutEvent())
 
 
     def display_target(self):
-        if self.target_nb < 1:
-            self.target_nb = len(self.playlist)
-        elif self.target_nb > len(self.playlist):
-            self.target_nb = 1
-        name, url = self.playlist[self.target_nb - 1]
+        # a turn of several steps goes round the playlist
+        self.target_nb = (self.target_nb - 1) % len(self._ctxt.rsc.playlist) + 1
+        name, url = self._ctxt.rsc.playlist[self.target_nb - 1]
         new_station = "{}: {}".format(self.target_nb, name)
         if len(new_station) > 20:
             new_station = new_station[:20]
@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Display layer sending only the changed cells to the lcd
+"""
+
+from threading import RLock
+import logging
+
+
+# The backlight of the lcd, driven by the PCF8574 expander, can only be
+# switched on or off : the effects are patterns of (backlight, duration)
+# steps. A fade is rendered by a decreasing (or increasing) on ratio.
+
+def blink_pattern(period=0.5):
+    return ((False, period), (True, period))
+
+
+def pulse_pattern(period=1.2):
+    """ Two short flashes, then a pause, as a heart beat
+    """
+    return ((False, period * 0.5), (True, period * 0.15),
+            (False, period * 0.15), (True, period * 0.2))
+
+
+def fade_pattern(duration=2.0, steps=4, fade_in=False):
+    """ A fade out (or in) in the given number of on/off cycles.
+        A fade out ends with the backlight off, a fade in with it on :
+        it is played with repeat=False and end_backlight=None
+    """
+    cycle = duration / steps
+    pattern = []
+    for step in range(steps):
+        on_ratio = (steps - step - 0.5) / steps
+        pattern.append((True, cycle * on_ratio))
+        pattern.append((False, cycle * (1 - on_ratio)))
+    pattern.append((False, 0))
+    if fade_in:
+        pattern = [(not state, delay) for state, delay in pattern]
+    return tuple(pattern)
+
+
+class _Effect:
+    """ The progress of a backlight effect
+    """
+    __slots__ = ("pattern", "step", "repeat", "remaining", "end_backlight")
+
+    def __init__(self, pattern, repeat, duration, end_backlight):
+        self.pattern = tuple(pattern)
+        self.step = 0
+        self.repeat = repeat
+        self.remaining = duration
+        self.end_backlight = end_backlight
+
+
+class EffectPlayer:
+    """ Plays the backlight effects : the steps of the patterns are timed
+        by the scheduler, and each one calls apply(backlight).
+        ShadowDisplay applies them to the lcd, the DisplayWorker queues
+        them as display commands.
+    """
+
+    def __init__(self, apply, scheduler):
+        self._apply = apply
+        self._scheduler = scheduler
+        self._lock = RLock()
+        self._effect = None
+        self._task = None
+
+    def start(self, pattern, repeat=True, duration=None, end_backlight=True):
+        """ Plays an effect, replacing the running one
+        """
+        with self._lock:
+            self._cancel()
+            self._effect = _Effect(pattern, repeat, duration, end_backlight)
+            self._step(self._effect)
+
+    def stop(self):
+        with self._lock:
+            self._cancel()
+
+    def _cancel(self):
+        if self._task is not None:
+            self._task.cancel()
+        self._effect = None
+        self._task = None
+
+    def _step(self, effect):
+        with self._lock:
+            if effect is not self._effect:
+                # stopped or replaced meanwhile
+                return
+            if effect.step >= len(effect.pattern):
+                effect.step = 0
+                if not effect.repeat:
+                    self._end(effect)
+                    return
+            if effect.remaining is not None and effect.remaining <= 0:
+                self._end(effect)
+                return
+            backlight, delay = effect.pattern[effect.step]
+            effect.step += 1
+            if effect.remaining is not None:
+                effect.remaining -= delay
+            self._apply(backlight)
+            self._task = self._scheduler.call_later(delay, lambda: self._step(effect))
+
+    def _end(self, effect):
+        self._effect = None
+        self._task = None
+        if effect.end_backlight is not None:
+            self._apply(effect.end_backlight)
+
+    def _get_running(self):
+        with self._lock:
+            return self._effect is not None
+
+    running = property(fget=_get_running)
+
+
+class ShadowDisplay:
+    """ A display layer wrapping the RPLCD CharLCD object.
+
+        It keeps a copy (the shadow) of the characters displayed on the lcd.
+        When a string is written, only the characters that differ from
+        the shadow are sent to the lcd, with the needed cursor moves.
+        As each character sent through the PCF8574 i2c expander costs
+        several bus transactions, this saves a lot of bus time when a
+        scrolling text moves or when the clock changes a single digit.
+
+        The ShadowDisplay has the same interface as CharLCD for the
+        features used by the radio : cursor_pos, write_string, clear,
+        backlight_enabled, cursor_mode, create_char.
+        As with auto_linebreaks, a text longer than the end of the line
+        continues on the next line. The line breaks characters are not
+        interpreted : they are written as spaces.
+
+        The stats property reports the bytes sent to the lcd, and the
+        bytes that would have been sent without the shadow.
+
+        All the accesses to the lcd are serialized by a lock, so the
+        backlight effects (see start_effect), run by the scheduler, never
+        interleave with the text writes of the event loop. In the radio,
+        the effects are played by the DisplayWorker instead, with the
+        other display commands.
+    """
+
+    # A changed cell separated from the previous run by this number of
+    # unchanged cells or less is merged to the run : rewriting one cell
+    # costs the same as a cursor move
+    MERGE_GAP = 1
+    # Each byte is sent as two nibbles, each nibble being written three
+    # times to the expander (data, data | enable, data)
+    I2C_WRITES_PER_BYTE = 6
+    _LINE_BREAKS = str.maketrans("\r\n", "  ")
+
+    def __init__(self, lcd, rows=4, cols=20, scheduler=None):
+        self.logger = logging.getLogger(type(self).__name__)
+        self._lock = RLock()
+        self._effects = EffectPlayer(self._apply_backlight, scheduler)
+        self._lcd = lcd
+        self._rows = rows
+        self._cols = cols
+        self._shadow = [[" "] * cols for i in range(rows)]
+        self._cursor = (0, 0)
+        # position of the lcd cursor, None if unknown
+        self._hw_cursor = None
+        self._cursor_visible = False
+        self.chars_requested = 0
+        self.commands_requested = 0
+        self.chars_written = 0
+        self.commands_sent = 0
+
+    def write_string(self, text):
+        """ Writes the text at the current cursor position, sending only
+            the characters that changed
+        """
+        with self._lock:
+            self._write_string(text)
+
+    def _write_string(self, text):
+        # the driver would move its cursor, out of sync with the shadow
+        text = text.translate(ShadowDisplay._LINE_BREAKS)
+        self.chars_requested += len(text)
+        row, col = self._cursor
+        changed = []
+        for char in text:
+            if self._shadow[row][col] != char:
+                changed.append((row, col, char))
+            col += 1
+            if col >= self._cols:
+                col = 0
+                row = (row + 1) % self._rows
+        self._cursor = (row, col)
+        for run_row, run_col, run_text in self._runs(changed):
+            self._write_run(run_row, run_col, run_text)
+        if self._cursor_visible:
+            self._move(self._cursor)
+
+    def clear(self):
+        with self._lock:
+            self.commands_requested += 1
+            self.commands_sent += 1
+            self._lcd.clear()
+            self._shadow = [[" "] * self._cols for i in range(self._rows)]
+            self._cursor = (0, 0)
+            self._hw_cursor = (0, 0)
+
+    def invalidate(self):
+        """ Forgets the shadow content : the next writes are fully sent.
+            To be used if the lcd may have been modified by another way
+        """
+        with self._lock:
+            self._shadow = [[None] * self._cols for i in range(self._rows)]
+            self._hw_cursor = None
+
+    def create_char(self, location, bitmap):
+        with self._lock:
+            self._lcd.create_char(location, bitmap)
+            # writing in the CGRAM moves the address counter
+            self._hw_cursor = None
+
+    def start_effect(self, pattern, repeat=True, duration=None, end_backlight=True):
+        """ Plays a backlight effect, replacing the running one.
+            pattern is a sequence of (backlight, duration) steps, see
+            blink_pattern(), pulse_pattern() and fade_pattern(). It is
+            played once, or repeated until duration seconds are elapsed
+            (forever if None) or stop_effect() is called.
+            At the end, the backlight is set to end_backlight, unless None.
+            The steps are run by the scheduler given at construction.
+        """
+        self._effects.start(pattern, repeat, duration, end_backlight)
+
+    def stop_effect(self, backlight=None):
+        """ Stops the running effect, and sets the backlight if not None
+        """
+        self._effects.stop()
+        if backlight is not None:
+            self._apply_backlight(backlight)
+
+    def _apply_backlight(self, value):
+        with self._lock:
+            if self._lcd.backlight_enabled != value:
+                self._lcd.backlight_enabled = value
+
+    def _get_effect_running(self):
+        return self._effects.running
+
+    def _runs(self, changed):
+        """ Groups the changed cells into runs of consecutive cells
+            of a same line
+        """
+        runs = []
+        for row, col, char in changed:
+            if runs:
+                run_row, run_col, chars = runs[-1]
+                gap = col - (run_col + len(chars))
+                if run_row == row and 0 <= gap <= ShadowDisplay.MERGE_GAP:
+                    chars.extend(self._shadow[row][run_col + len(chars):col])
+                    chars.append(char)
+                    continue
+            runs.append((row, col, [char]))
+        return [(row, col, "".join(chars)) for row, col, chars in runs]
+
+    def _write_run(self, row, col, text):
+        self._move((row, col))
+        self._lcd.write_string(text)
+        self.chars_written += len(text)
+        self._shadow[row][col:col + len(text)] = list(text)
+        end = col + len(text)
+        # at the end of the line, the lcd cursor position depends on
+        # the line breaks management of the driver
+        self._hw_cursor = (row, end) if end < self._cols else None
+
+    def _move(self, pos):
+        if self._hw_cursor != pos:
+            self._lcd.cursor_pos = pos
+            self._hw_cursor = pos
+            self.commands_sent += 1
+
+    def _get_cursor_pos(self):
+        return self._cursor
+
+    def _set_cursor_pos(self, pos):
+        with self._lock:
+            self.commands_requested += 1
+            self._cursor = pos
+            if self._cursor_visible:
+                self._move(pos)
+
+    def _get_backlight_enabled(self):
+        with self._lock:
+            return self._lcd.backlight_enabled
+
+    def _set_backlight_enabled(self, value):
+        # the backlight set explicitly ends the running effect
+        self.stop_effect(value)
+
+    def _set_cursor_mode(self, mode):
+        with self._lock:
+            self._lcd.cursor_mode = mode
+            self._cursor_visible = mode != "hide"
+            if self._cursor_visible:
+                self._move(self._cursor)
+
+    def _get_stats(self):
+        requested = self.chars_requested + self.commands_requested
+        written = self.chars_written + self.commands_sent
+        return {"requested_bytes": requested,
+                "written_bytes": written,
+                "saved_bytes": requested - written,
+                "saved_transactions": (requested - written) * ShadowDisplay.I2C_WRITES_PER_BYTE}
+
+    cursor_pos = property(fget=_get_cursor_pos, fset=_set_cursor_pos)
+    backlight_enabled = property(fget=_get_backlight_enabled, fset=_set_backlight_enabled)
+    cursor_mode = property(fset=_set_cursor_mode)
+    stats = property(fget=_get_stats)
+    effect_running = property(fget=_get_effect_running)
@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Thread sending the display commands to the lcd, by priority
+"""
+
+from collections import deque, namedtuple
+from threading import Thread, Condition
+from enum import Enum
+import heapq
+import itertools
+import logging
+import time
+
+from radioevents import TextUpdateEvent, WifiEvent
+from display import EffectPlayer
+
+# Number of executed commands kept for the latency measures
+HISTORY_SIZE = 2000
+# The backlight, as a cell : a backlight command supersedes the pending ones
+BACKLIGHT_CELLS = frozenset([("backlight",)])
+
+
+class DisplayPriority(Enum):
+    # the answer to a user action : volume, station choice, state change...
+    USER = 0
+    # the periodic refresh of the screen : scrolling texts, clocks, wifi level
+    COSMETIC = 1
+
+
+def display_priority(event):
+    """ Returns the priority of the display commands issued while handling
+        the event
+    """
+    if type(event) in (TextUpdateEvent, WifiEvent):
+        return DisplayPriority.COSMETIC
+    return DisplayPriority.USER
+
+
+# A command executed by the worker, with its timestamps (time.monotonic)
+CommandRecord = namedtuple("CommandRecord", ["priority", "queued", "started", "done"])
+
+
+class _Command:
+    """ A pending display command
+    """
+    __slots__ = ("priority", "seq", "function", "args", "cells", "queued", "discarded")
+
+    def __init__(self, priority, seq, function, args, cells):
+        self.priority = priority
+        self.seq = seq
+        self.function = function
+        self.args = args
+        # the cells of the screen written by the command, None if none
+        self.cells = cells
+        self.queued = time.monotonic()
+        self.discarded = False
+
+
+class DisplayWorker(Thread):
+    """ A thread sending the display commands to the ShadowDisplay, so that
+        the event loop never waits for the i2c bus : the methods of the
+        worker only queue the commands and return.
+
+        The DisplayWorker has the same interface as ShadowDisplay. The
+        commands are queued with the current 'priority' : the USER ones
+        are sent before the COSMETIC ones. A pending COSMETIC write is
+        discarded when a newer write covers all its cells, and it is sent
+        with the USER commands when a newer USER write overlaps it, so that
+        the screen always ends as with direct writes.
+        While the cursor is visible, all the commands keep their order.
+
+        The backlight effects are played by the worker, with the scheduler
+        given at construction : each step of the pattern is queued as a
+        COSMETIC command, superseded by the next step or by an explicit
+        setting of the backlight. Without scheduler, the effects are played
+        by the display.
+
+        The cursor position is followed by the worker, so that it can be
+        read at once. The stats add to the ones of the display the depth
+        of the queue and the latency of the commands, from their queuing
+        to the end of their sending.
+    """
+
+    def __init__(self, display, rows=4, cols=20, scheduler=None):
+        Thread.__init__(self, name="DisplayWorker", daemon=True)
+        self.logger = logging.getLogger(type(self).__name__)
+        self._display = display
+        self._effects = None
+        if scheduler is not None:
+            self._effects = EffectPlayer(self._queue_effect_step, scheduler)
+        self._rows = rows
+        self._cols = cols
+        self.priority = DisplayPriority.USER
+        self._condition = Condition()
+        self._heap = []
+        self._counter = itertools.count()
+        # the pending COSMETIC writes, that may be superseded
+        self._cosmetic = []
+        self._depth = 0
+        self._busy = False
+        self._stopping = False
+        self._cursor = (0, 0)
+        self._cursor_visible = False
+        # the last backlight requested, ahead of the lcd
+        self._backlight = display.backlight_enabled
+        self.history = deque(maxlen=HISTORY_SIZE)
+        self.max_queue_depth = 0
+        self.discarded_count = 0
+        self.promoted_count = 0
+
+    def write_string(self, text):
+        row, col = self._cursor
+        cells = set()
+        for char in text:
+            cells.add((row, col))
+            col += 1
+            if col >= self._cols:
+                col = 0
+                row = (row + 1) % self._rows
+        self._queue(DisplayWorker._write, (self._cursor, text), frozenset(cells))
+        self._cursor = (row, col)
+
+    def clear(self):
+        self._queue(DisplayWorker._clear, (), self._all_cells())
+        self._cursor = (0, 0)
+
+    def invalidate(self):
+        self._queue(DisplayWorker._invalidate)
+
+    def create_char(self, location, bitmap):
+        self._queue(DisplayWorker._create_char, (location, bitmap))
+
+    def start_effect(self, pattern, repeat=True, duration=None, end_backlight=True):
+        if self._effects is None:
+            self._queue(DisplayWorker._start_effect, (pattern, repeat, duration, end_backlight))
+        else:
+            self._effects.start(pattern, repeat, duration, end_backlight)
+
+    def stop_effect(self, backlight=None):
+        if self._effects is None:
+            if backlight is not None:
+                self._backlight = backlight
+            self._queue(DisplayWorker._stop_effect, (backlight,))
+            return
+        self._effects.stop()
+        if backlight is not None:
+            self._queue_backlight(backlight)
+
+    def flush(self, timeout=None):
+        """ Waits until all the queued commands are sent.
+            Returns False on timeout
+        """
+        with self._condition:
+            return self._condition.wait_for(lambda: self._depth == 0 and not self._busy,
+                                            timeout)
+
+    def stop(self):
+        """ Stops the thread once the pending commands are sent
+        """
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+
+    def run(self):
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._depth > 0 or self._stopping)
+                command = self._pop()
+                if command is None:
+                    break
+                self._busy = True
+            started = time.monotonic()
+            try:
+                command.function(self._display, *command.args)
+            except Exception as error:
+                self.logger.error("Display command failed : %s", error)
+            done = time.monotonic()
+            with self._condition:
+                self.history.append(CommandRecord(command.priority, command.queued,
+                                                  started, done))
+                self._busy = False
+                self._condition.notify_all()
+        self.logger.debug("Display worker stopped")
+
+    def _queue_effect_step(self, backlight):
+        # called by the scheduler : the steps are COSMETIC, whatever the
+        # event handled meanwhile
+        self._queue_backlight(backlight, DisplayPriority.COSMETIC)
+
+    def _queue_backlight(self, value, priority=None):
+        self._backlight = value
+        self._queue(DisplayWorker._set_backlight, (value,), BACKLIGHT_CELLS, priority)
+
+    def _queue(self, function, args=(), cells=None, priority=None):
+        if priority is None:
+            priority = self.priority
+        if self._cursor_visible:
+            priority = DisplayPriority.USER
+        with self._condition:
+            command = _Command(priority, next(self._counter), function, args, cells)
+            if cells is not None:
+                self._supersede(command)
+            if priority is DisplayPriority.COSMETIC and cells is not None:
+                self._cosmetic.append(command)
+            self._push(command)
+            self.max_queue_depth = max(self.max_queue_depth, self._depth)
+            self._condition.notify_all()
+
+    def _supersede(self, command):
+        # called with the condition acquired
+        for pending in list(self._cosmetic):
+            if pending.discarded or pending.seq > command.seq \
+                    or not (pending.cells & command.cells):
+                continue
+            if pending.cells <= command.cells:
+                self._discard(pending)
+                self.discarded_count += 1
+            elif command.priority is DisplayPriority.USER:
+                # sent before the newer write, at its place among the USER commands
+                self._discard(pending)
+                promoted = _Command(DisplayPriority.USER, pending.seq, pending.function,
+                                    pending.args, pending.cells)
+                promoted.queued = pending.queued
+                self._push(promoted)
+                self.promoted_count += 1
+                # the older writes overlapping it must still be sent before it
+                self._supersede(promoted)
+
+    def _discard(self, command):
+        self._cosmetic.remove(command)
+        command.discarded = True
+        self._depth -= 1
+
+    def _push(self, command):
+        heapq.heappush(self._heap, (command.priority.value, command.seq, command))
+        self._depth += 1
+
+    def _pop(self):
+        # called with the condition acquired, returns None when stopped
+        while self._heap:
+            command = heapq.heappop(self._heap)[2]
+            if command.discarded:
+                continue
+            self._depth -= 1
+            if command in self._cosmetic:
+                self._cosmetic.remove(command)
+            return command
+        return None
+
+    def _all_cells(self):
+        return frozenset((row, col) for row in range(self._rows) for col in range(self._cols))
+
+    @staticmethod
+    def _write(display, pos, text):
+        if display.cursor_pos != pos:
+            display.cursor_pos = pos
+        display.write_string(text)
+
+    @staticmethod
+    def _clear(display):
+        display.clear()
+
+    @staticmethod
+    def _invalidate(display):
+        display.invalidate()
+
+    @staticmethod
+    def _create_char(display, location, bitmap):
+        display.create_char(location, bitmap)
+
+    @staticmethod
+    def _start_effect(display, pattern, repeat, duration, end_backlight):
+        display.start_effect(pattern, repeat, duration, end_backlight)
+
+    @staticmethod
+    def _stop_effect(display, backlight):
+        display.stop_effect(backlight)
+
+    @staticmethod
+    def _move(display, pos):
+        display.cursor_pos = pos
+
+    @staticmethod
+    def _set_backlight(display, value):
+        display.backlight_enabled = value
+
+    @staticmethod
+    def _set_cursor_mode(display, mode):
+        display.cursor_mode = mode
+
+    def _get_cursor_pos(self):
+        return self._cursor
+
+    def _set_cursor_pos(self, pos):
+        self._cursor = pos
+        if self._cursor_visible:
+            self._queue(DisplayWorker._move, (pos,))
+
+    def _get_backlight_enabled(self):
+        # the lcd may be late on the pending commands
+        return self._backlight
+
+    def _set_backlight_enabled(self, value):
+        if self._effects is None:
+            self._queue_backlight(value)
+        else:
+            # the backlight set explicitly ends the running effect
+            self.stop_effect(value)
+
+    def _set_cursor_mode(self, mode):
+        self._cursor_visible = mode != "hide"
+        self._queue(DisplayWorker._set_cursor_mode, (mode,))
+
+    def _get_effect_running(self):
+        if self._effects is None:
+            return self._display.effect_running
+        return self._effects.running
+
+    def _get_queue_depth(self):
+        with self._condition:
+            return self._depth
+
+    def _get_stats(self):
+        stats = dict(self._display.stats)
+        with self._condition:
+            history = list(self.history)
+            stats.update({"queue_depth": self._depth,
+                          "max_queue_depth": self.max_queue_depth,
+                          "discarded_commands": self.discarded_count,
+                          "promoted_commands": self.promoted_count})
+        for priority in DisplayPriority:
+            latencies = sorted(record.done - record.queued for record in history
+                               if record.priority is priority)
+            name = priority.name.lower()
+            stats[name + "_commands"] = len(latencies)
+            if latencies:
+                stats[name + "_latency_median"] = latencies[len(latencies) // 2]
+                stats[name + "_latency_max"] = latencies[-1]
+        return stats
+
+    cursor_pos = property(fget=_get_cursor_pos, fset=_set_cursor_pos)
+    backlight_enabled = property(fget=_get_backlight_enabled, fset=_set_backlight_enabled)
+    cursor_mode = property(fset=_set_cursor_mode)
+    effect_running = property(fget=_get_effect_running)
+    queue_depth = property(fget=_get_queue_depth)
+    stats = property(fget=_get_stats)
@@ -6,10 +6,11 @@ Created on Thu Sep 13 20:38:09 2018
 @author: sebastien.roy
 """
 
-import RPi.GPIO as GPIO
 from enum import Enum
 import time
 
+from stepaccumulator import StepAccumulator, ACCUMULATION_WINDOW
+
 class EncoderEvent(Enum) :
     CW_ROTATION = +1
     CCW_ROTATION = -1
@@ -19,10 +20,12 @@ class EncoderEvent(Enum) :
 
 class RotaryEncoder(object):
 
-    def __init__(self, pina, pinb, switch, callback):   # The callback expected signature
+    def __init__(self, gpio, pina, pinb, switch, callback, scheduler=None,
+                 window=ACCUMULATION_WINDOW, max_acceleration=1):   # The callback expected signature
         """Initialisation of the Rotary encoder
 
         Parametres :
+            gpio -- the RPi.GPIO module, or a simulation of it
             pina -- GPIO number of the A pin of the rotary encoder
             pinb -- GPIO number of the A pin of the rotary encoder
             switch -- GPIO number of the switch of the rotary encoder.
@@ -30,31 +33,41 @@ class RotaryEncoder(object):
             callback -- a reference to a callback function. The function signature is the following
                 1st argument : the originator (will be the RotaryEncoder instance)
                 2nd argument : the EncoderEvent that initiated the callback
+                3rd argument : for the rotations, the signed number of steps
+                    (positive clockwise). Not given for the switch events.
+            scheduler -- if given, the detents are accumulated during window seconds
+                and the callback is called once with the net number of steps.
+                Else the callback is called for each detent.
+            max_acceleration -- maximum multiplication of the steps when the knob
+                is turned fast. 1 means no acceleration
         """
+        self._gpio = gpio
         self._pina = pina
         self._pinb = pinb
         self._switch = switch
         self._rot_value = 0
         self._last_rest_value = 0
         self._callback = callback
+        self._accumulator = StepAccumulator(self._steps_callback, scheduler,
+                                            window, max_acceleration)
 
-        GPIO.setmode(GPIO.BCM)
-        GPIO.setup(self._pina, GPIO.IN, pull_up_down=GPIO.PUD_UP)
-        GPIO.setup(self._pinb, GPIO.IN, pull_up_down=GPIO.PUD_UP)
+        self._gpio.setmode(self._gpio.BCM)
+        self._gpio.setup(self._pina, self._gpio.IN, pull_up_down=self._gpio.PUD_UP)
+        self._gpio.setup(self._pinb, self._gpio.IN, pull_up_down=self._gpio.PUD_UP)
 
-        GPIO.add_event_detect(self._pina, GPIO.RISING, callback=self._rotation_callback)    # No bounce time
-        GPIO.add_event_detect(self._pinb, GPIO.RISING, callback=self._rotation_callback)    # No bounce time
+        self._gpio.add_event_detect(self._pina, self._gpio.RISING, callback=self._rotation_callback)    # No bounce time
+        self._gpio.add_event_detect(self._pinb, self._gpio.RISING, callback=self._rotation_callback)    # No bounce time
         if switch != 0 :
-            GPIO.setup(self._switch, GPIO.IN, pull_up_down=GPIO.PUD_UP)
-            GPIO.add_event_detect(self._switch, GPIO.BOTH, callback=self._switch_callback, bouncetime=5)
+            self._gpio.setup(self._switch, self._gpio.IN, pull_up_down=self._gpio.PUD_UP)
+            self._gpio.add_event_detect(self._switch, self._gpio.BOTH, callback=self._switch_callback, bouncetime=5)
 
-        self._pina_value = GPIO.input(pina)
-        self._pinb_value = GPIO.input(pinb)
+        self._pina_value = self._gpio.input(self._pina)
+        self._pinb_value = self._gpio.input(self._pinb)
         return
 
     def _rotation_callback(self, pin):
-        a_value = GPIO.input(self._pina)
-        b_value = GPIO.input(self._pinb)
+        a_value = self._gpio.input(self._pina)
+        b_value = self._gpio.input(self._pinb)
         if a_value == self._pina_value and b_value == self._pinb_value:    # Same interrupt as before (Bouncing)?
             return                                                         # ignore interrupt!
 
@@ -62,14 +75,18 @@ class RotaryEncoder(object):
         self._pinb_value = b_value                                          # for next bouncing check
         if (a_value and b_value):                               # Both one active? Yes -> end of sequence
             if pin == self._pinb:                           # Turning direction depends on
-                self._callback(self, EncoderEvent.CW_ROTATION)    # which input gave last interrupt
+                self._accumulator.add(1)                        # which input gave last interrupt
             else:                                                       # so depending on direction either
-                self._callback(self, EncoderEvent.CCW_ROTATION)    # increase or decrease counter
+                self._accumulator.add(-1)                       # increase or decrease counter
         return                                                      # THAT'S IT
 
+    def _steps_callback(self, steps):
+        event = EncoderEvent.CW_ROTATION if steps > 0 else EncoderEvent.CCW_ROTATION
+        self._callback(self, event, steps)
+
     def _switch_callback(self, pin):
         time.sleep(0.01)  # let edge time to stabilise before reading value
-        event = EncoderEvent.SWITCH_PRESSED if GPIO.input(pin) == 0 else EncoderEvent.SWITCH_RELEASED
+        event = EncoderEvent.SWITCH_PRESSED if self._gpio.input(pin) == 0 else EncoderEvent.SWITCH_RELEASED
         self._callback(self, event)
         return
 
@@ -82,20 +99,22 @@ class RotaryEncoder(object):
         return
 
     def clear(self):
-        GPIO.remove_event_detect(self._pina)
-        GPIO.remove_event_detect(self._pinb)
+        self._accumulator.cancel()
+        self._gpio.remove_event_detect(self._pina)
+        self._gpio.remove_event_detect(self._pinb)
         if self._switch != 0:
-            GPIO.remove_event_detect(self._switch)
+            self._gpio.remove_event_detect(self._switch)
 
 # tests
-def test_callback(originator, event):
+def test_callback(originator, event, steps=0):
     print("Originator : ", originator)
-    print("Event : ", event )
+    print("Event : ", event, steps)
     return
 
 if __name__ == "__main__" :
     print("Tests unitaires avec pina = 5, pinb = 6, switch = 4")
-    encoder = RotaryEncoder(5,6,4,callback=test_callback)
+    from hardware import RaspberryHardware
+    encoder = RotaryEncoder(RaspberryHardware().gpio, 5, 6, 4, callback=test_callback)
     input("Press enter to end...")
 
 
@@ -9,8 +9,7 @@ Created on Sun Sep 30 19:29:51 2018
 import logging
 
 from radiostate import RadioState
-from wifiscanner import WifiScanner
-from radioevents import StationButtonEvent, PowerButtonEvent
+from radioevents import StationButtonEvent, PowerButtonEvent, WifiScanEvent
 from encoder import EncoderEvent
 from powerbutton import PowerEvent
 from resources import Resources
@@ -40,32 +39,34 @@ class EssidState(RadioState):
         lcd.write_string(please_turn)
         lcd.cursor_pos = (2, 0)
         lcd.write_string(please_press)
-        scanner = WifiScanner()
-        scanner.scan_wifi()
-        self._ids = [cell.essid for cell in scanner.cells]
-        self.logger.info("Available ESSIDs : %s", self._ids)
+        # the cells of the last scan are displayed at once,
+        # the list is updated when a new scan completes
+        scan_cache = self._ctxt.scan_cache
         self._essid_nb = 0
         self.essid=""
+        self._update_ids(scan_cache.cells)
+        scan_cache.refresh_if_stale()
+
+    def _update_ids(self, cells):
+        selected = self._ids[self._essid_nb] if self._ids else None
+        self._ids = [cell.essid for cell in cells if cell.essid]
+        self.logger.info("Available ESSIDs : %s", self._ids)
+        # keep the selected network if it is still there
+        self._essid_nb = self._ids.index(selected) if selected in self._ids else 0
         if len(self._ids) > 0:
             self.display_essid()
 
     def handle_event(self, event):
         if type(event) is PowerButtonEvent and event.value == PowerEvent.SWITCH_PRESSED:
             self._owner.switch_radio(True)
+        elif type(event) is WifiScanEvent:
+            self._update_ids(event.value)
         elif type(event) is StationButtonEvent:
-            if event.value == EncoderEvent.CW_ROTATION:
-                if self._essid_nb >= len(self._ids) - 1:
-                    self._essid_nb = 0
-                else:
-                    self._essid_nb += 1
-                self.display_essid()
-            elif event.value == EncoderEvent.CCW_ROTATION:
-                if self._essid_nb == 0:
-                    self._essid_nb = len(self._ids) - 1
-                else:
-                    self._essid_nb -= 1
-                self.display_essid()
-            elif event.value == EncoderEvent.SWITCH_PRESSED:
+            if event.value in (EncoderEvent.CW_ROTATION, EncoderEvent.CCW_ROTATION):
+                if len(self._ids) > 0:
+                    self._essid_nb = (self._essid_nb + event.steps) % len(self._ids)
+                    self.display_essid()
+            elif event.value == EncoderEvent.SWITCH_PRESSED and len(self._ids) > 0:
                 self.essid = self._ids[self._essid_nb]
                 self._owner.enter_choose_pwd()
 
@@ -108,20 +109,24 @@ class PasswdState(RadioState):
             self._owner.switch_radio(True)
         elif type(event) is StationButtonEvent:
             length = len(self._allowed_chars)
-            if event.value == EncoderEvent.CW_ROTATION:
-                if self._cursor_pos < 19:   # size of text is greater than 20, no test to do
-                    self._cursor_pos += 1
-                    self._update_cursor()
-                elif length - self._chars_pos > 20:
-                    self._chars_pos +=1
+            if event.value in (EncoderEvent.CW_ROTATION, EncoderEvent.CCW_ROTATION):
+                chars_pos = self._chars_pos
+                # one move per step, the display is updated once
+                for i in range(abs(event.steps)):
+                    if event.steps > 0:
+                        if self._cursor_pos < 19:   # size of text is greater than 20, no test to do
+                            self._cursor_pos += 1
+                        elif length - self._chars_pos > 20:
+                            self._chars_pos +=1
+                    else:
+                        if self._cursor_pos > 0:
+                            self._cursor_pos -= 1
+                        elif self._chars_pos > 0:
+                            self._chars_pos -= 1
+                if self._chars_pos != chars_pos:
                     self.display_chars()
-            elif event.value == EncoderEvent.CCW_ROTATION:
-                if self._cursor_pos > 0:
-                    self._cursor_pos -= 1
+                else:
                     self._update_cursor()
-                elif self._chars_pos > 0:
-                    self._chars_pos -= 1
-                    self.display_chars()
             elif event.value == EncoderEvent.SWITCH_PRESSED:
                 pos = self._chars_pos + self._cursor_pos
                 if pos < length - 2:
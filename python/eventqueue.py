@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Event queue of the radio, coalescing the superseded events
+"""
+
+from collections import deque
+from threading import Condition
+import queue
+import time
+
+from radioevents import TextUpdateEvent, WifiEvent, WifiScanEvent
+
+
+def coalescing_key(event):
+    """ Returns the key of the events superseded by a newer one of the same
+        key, or None if the event shall never be merged (buttons, timeouts...)
+    """
+    if type(event) is TextUpdateEvent:
+        return ("text", event.originator)
+    elif type(event) is WifiEvent:
+        return ("wifi",)
+    elif type(event) is WifiScanEvent:
+        return ("wifi_scan",)
+    return None
+
+
+class EventCoalescer:
+    """ The storage of the pending events of the radio.
+
+        When an event is added while an older one of the same key is still
+        pending, the older one is dropped : only the newest text of a field
+        or the newest wifi level matters. The newest event takes its place
+        at the end of the queue, so that it keeps its order relatively to
+        the button events.
+
+        This class is not thread safe, see CoalescingQueue.
+    """
+
+    def __init__(self, key_function=coalescing_key):
+        self._key_function = key_function
+        # Each entry is a list holding the event, or None once superseded
+        self._entries = deque()
+        self._pending = {}
+        self._size = 0
+        self.put_count = 0
+        self.merged_count = 0
+        self.delivered_count = 0
+
+    def add(self, event):
+        self.put_count += 1
+        key = self._key_function(event)
+        entry = [event]
+        if key is not None:
+            previous = self._pending.get(key)
+            if previous is not None:
+                previous[0] = None
+                self._size -= 1
+                self.merged_count += 1
+            self._pending[key] = entry
+        self._entries.append(entry)
+        self._size += 1
+
+    def pop(self):
+        """ Returns the oldest pending event. The coalescer shall not be empty
+        """
+        while True:
+            entry = self._entries.popleft()
+            event = entry[0]
+            if event is not None:
+                break
+        key = self._key_function(event)
+        if key is not None and self._pending.get(key) is entry:
+            del self._pending[key]
+        self._size -= 1
+        self.delivered_count += 1
+        return event
+
+    def __len__(self):
+        return self._size
+
+    def _get_stats(self):
+        return {"put": self.put_count,
+                "merged": self.merged_count,
+                "delivered": self.delivered_count,
+                "pending": self._size}
+
+    stats = property(fget=_get_stats)
+
+
+class CoalescingQueue:
+    """ A replacement of queue.Queue for the events of the radio, merging
+        the superseded events (see EventCoalescer).
+        put() may be called from any thread.
+    """
+
+    def __init__(self, key_function=coalescing_key):
+        self._coalescer = EventCoalescer(key_function)
+        self._condition = Condition()
+
+    def put(self, event):
+        with self._condition:
+            self._coalescer.add(event)
+            self._condition.notify()
+
+    def get(self, block=True, timeout=None):
+        with self._condition:
+            deadline = None if timeout is None else time.monotonic() + timeout
+            while not len(self._coalescer):
+                if not block:
+                    raise queue.Empty
+                if deadline is None:
+                    self._condition.wait()
+                else:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise queue.Empty
+                    self._condition.wait(remaining)
+            return self._coalescer.pop()
+
+    def task_done(self):
+        return
+
+    def qsize(self):
+        with self._condition:
+            return len(self._coalescer)
+
+    def empty(self):
+        return self.qsize() == 0
+
+    def _get_stats(self):
+        with self._condition:
+            return self._coalescer.stats
+
+    stats = property(fget=_get_stats)
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Stand-in for bluetoothd, used by the tests and the simulated hardware
+"""
+
+from threading import RLock
+import copy
+import logging
+
+from bluetoothcontroller import BluetoothError, ADAPTER_INTERFACE, DEVICE_INTERFACE
+from bluetoothcontroller import MEDIA_PLAYER_INTERFACE
+
+
+class FakeBluezBus:
+    """ An in-process stand-in for bluetoothd on the system D-Bus, with the
+        same methods as BluezBus. It is used by the unit tests and by the
+        simulated hardware.
+
+        The bluez objects are kept in 'objects' : their properties, indexed
+        by path and by interface. As bluetoothd does, setting a property
+        sends a PropertiesChanged signal to the subscribers, and adding or
+        removing an object sends an InterfacesAdded or InterfacesRemoved
+        signal ; the signals are delivered from the calling thread.
+        All the method calls are stored in 'calls'.
+
+        Usage :
+            bus = FakeBluezBus()
+            controller = BluetoothController(bus, callback)
+            path = bus.add_device("00:11:22:33:44:55", "My phone")
+            bus.set_device_properties(path, Connected=True)
+            player = bus.add_player(path)
+            bus.set_track(player, Title="Song", Artist="Singer")
+    """
+
+    def __init__(self, adapter="hci0", recorder=None):
+        self.logger = logging.getLogger(type(self).__name__)
+        self.lock = RLock()
+        self.adapter_path = "/org/bluez/" + adapter
+        self.objects = {self.adapter_path: {ADAPTER_INTERFACE: {
+            "Address": "B8:27:EB:00:00:01",
+            "Alias": "mamemasradio",
+            "Powered": False,
+            "Pairable": False,
+            "Discoverable": False}}}
+        self.calls = []
+        self.agent_capability = None
+        self.closed = False
+        self._subscribers = []
+        self._added_subscribers = []
+        self._removed_subscribers = []
+        self._recorder = recorder
+
+    def _call(self, name, *args):
+        with self.lock:
+            self.calls.append((name,) + args)
+        if self._recorder is not None:
+            self._recorder.record("dbus", name, 0, args)
+
+    def get_managed_objects(self):
+        self._call("GetManagedObjects")
+        with self.lock:
+            return copy.deepcopy(self.objects)
+
+    def get_properties(self, path, interface):
+        self._call("GetAll", path, interface)
+        with self.lock:
+            try:
+                return dict(self.objects[path][interface])
+            except KeyError:
+                raise BluetoothError("No interface {} on {}".format(interface, path))
+
+    def set_property(self, path, interface, name, value):
+        self._call("Set", path, interface, name, value)
+        with self.lock:
+            try:
+                properties = self.objects[path][interface]
+            except KeyError:
+                raise BluetoothError("No interface {} on {}".format(interface, path))
+            if name not in properties:
+                raise BluetoothError("No property {} on {}".format(name, path))
+            changed = properties[name] != value
+            properties[name] = value
+        if changed:
+            self.emit_properties_changed(path, interface, {name: value})
+
+    def subscribe_properties_changed(self, callback):
+        with self.lock:
+            self._subscribers.append(callback)
+
+    def subscribe_interfaces_added(self, callback):
+        with self.lock:
+            self._added_subscribers.append(callback)
+
+    def subscribe_interfaces_removed(self, callback):
+        with self.lock:
+            self._removed_subscribers.append(callback)
+
+    def register_agent(self, capability):
+        self._call("RegisterAgent", capability)
+        self.agent_capability = capability
+
+    def close(self):
+        with self.lock:
+            self._subscribers = []
+            self._added_subscribers = []
+            self._removed_subscribers = []
+            self.closed = True
+
+    def emit_properties_changed(self, path, interface, changed):
+        with self.lock:
+            subscribers = list(self._subscribers)
+        for callback in subscribers:
+            callback(path, interface, dict(changed))
+
+    def emit_interfaces_added(self, path, interfaces):
+        with self.lock:
+            subscribers = list(self._added_subscribers)
+        for callback in subscribers:
+            callback(path, copy.deepcopy(interfaces))
+
+    def emit_interfaces_removed(self, path, interfaces):
+        with self.lock:
+            subscribers = list(self._removed_subscribers)
+        for callback in subscribers:
+            callback(path, list(interfaces))
+
+    def add_device(self, address, name, **properties):
+        """ Adds a known device, as after its pairing. Returns its path
+        """
+        path = "{}/dev_{}".format(self.adapter_path, address.replace(":", "_"))
+        device = {"Address": address, "Name": name, "Alias": name,
+                  "Paired": True, "Connected": False}
+        device.update(properties)
+        with self.lock:
+            self.objects[path] = {DEVICE_INTERFACE: device}
+        self.emit_interfaces_added(path, {DEVICE_INTERFACE: device})
+        return path
+
+    def set_device_properties(self, path, **properties):
+        """ Changes properties of a device, as when it connects, and sends
+            the signal
+        """
+        with self.lock:
+            self.objects[path][DEVICE_INTERFACE].update(properties)
+        self.emit_properties_changed(path, DEVICE_INTERFACE, properties)
+
+    def add_player(self, device_path, **track):
+        """ Adds the media player of a connected device, as bluez does
+            when the device plays, with its first track. Returns its path
+        """
+        path = device_path + "/player0"
+        player = {"Device": device_path, "Status": "playing" if track else "stopped",
+                  "Track": dict(track)}
+        with self.lock:
+            self.objects[path] = {MEDIA_PLAYER_INTERFACE: player}
+        self.emit_interfaces_added(path, {MEDIA_PLAYER_INTERFACE: player})
+        return path
+
+    def remove_object(self, path):
+        """ Removes a device or a media player, as bluez does when a device
+            is unpaired or stops its player, and sends the signal
+        """
+        with self.lock:
+            interfaces = self.objects.pop(path)
+        self.emit_interfaces_removed(path, list(interfaces))
+
+    def set_track(self, player_path, **track):
+        """ Changes the track of a media player (Title, Artist, Album...)
+            and sends the signal
+        """
+        with self.lock:
+            player = self.objects[player_path][MEDIA_PLAYER_INTERFACE]
+            player["Track"] = dict(track)
+            player["Status"] = "playing"
+        self.emit_properties_changed(player_path, MEDIA_PLAYER_INTERFACE,
+                                     {"Track": dict(track), "Status": "playing"})
+
+    def _get_adapter(self):
+        with self.lock:
+            return dict(self.objects[self.adapter_path][ADAPTER_INTERFACE])
+
+    adapter = property(fget=_get_adapter)
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Stand-in for the mpd daemon, used by the tests and the benchmarks
+"""
+
+import socket
+import socketserver
+import shlex
+import select
+import logging
+from threading import Thread, RLock, Condition
+
+
+class FakeMpdServer:
+    """ A local stand-in for the mpd daemon, speaking the subset of the
+        text protocol used by the radio.
+        It is used by the unit tests and to measure the cost of the
+        mpd commands without a real mpd.
+
+        The state of the fake player (queue, volume, current song)
+        is kept in plain attributes, so tests can check or modify it.
+        All the received command lines are stored in 'commands'.
+
+        Usage :
+            server = FakeMpdServer()
+            server.start()
+            client = MpdClient("127.0.0.1", server.port)
+            ...
+            server.stop()
+    """
+
+    def __init__(self, host="127.0.0.1", port=0):
+        self.logger = logging.getLogger(type(self).__name__)
+        self.lock = RLock()
+        self.changes = Condition(self.lock)
+        self.versions = {"player": 0, "mixer": 0, "playlist": 0}
+        self.queue = []
+        self.volume = 20
+        self.state = "stop"
+        self.song_pos = -1
+        self.tags = {}
+        self.commands = []
+        self.next_id = 0
+        self.connections = 0
+        # number of the next answers lost : the commands are executed, then
+        # the connection is closed without answer, as when mpd dies
+        self.lost_answers = 0
+        self._sockets = set()
+        self._server = _FakeTCPServer((host, port), _MpdHandler,
+                                      bind_and_activate=False)
+        self._server.daemon_threads = True
+        self._server.allow_reuse_address = True
+        self._server.server_bind()
+        self._server.server_activate()
+        self._server.fake = self
+        self._thread = None
+        self.host, self.port = self._server.server_address
+
+    def start(self):
+        self._thread = Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def notify(self, subsystem):
+        """ Wakes up the clients waiting for a change of the subsystem
+        """
+        with self.lock:
+            self.versions[subsystem] += 1
+            self.changes.notify_all()
+
+    def set_tags(self, **tags):
+        """ Changes the tags of the current song, as when a new title
+            is announced by the stream
+        """
+        with self.lock:
+            self.tags = dict(tags)
+            self.notify("player")
+
+    def drop_connections(self):
+        """ Closes all the client connections, as mpd does on timeout
+        """
+        with self.lock:
+            sockets = list(self._sockets)
+        for sock in sockets:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def execute(self, args):
+        """ Executes one command and returns the answer lines.
+            Raises ValueError if the command is unknown or malformed
+        """
+        name = args[0]
+        with self.lock:
+            self.commands.append(" ".join(args))
+            if name == "status":
+                lines = ["volume: {}".format(self.volume),
+                         "playlistlength: {}".format(len(self.queue)),
+                         "state: {}".format(self.state)]
+                if self.song_pos >= 0:
+                    lines.append("song: {}".format(self.song_pos))
+                return lines
+            elif name == "currentsong":
+                if self.song_pos < 0 or self.state == "stop":
+                    return []
+                lines = ["file: {}".format(self.queue[self.song_pos]),
+                         "Pos: {}".format(self.song_pos)]
+                lines.extend("{}: {}".format(key, value) for key, value in self.tags.items())
+                return lines
+            elif name == "playlistinfo":
+                lines = []
+                for pos, uri in enumerate(self.queue):
+                    lines.append("file: {}".format(uri))
+                    lines.append("Pos: {}".format(pos))
+                return lines
+            elif name == "play":
+                pos = int(args[1]) if len(args) > 1 else max(self.song_pos, 0)
+                if pos >= len(self.queue):
+                    raise ValueError("Bad song index")
+                self.song_pos = pos
+                self.state = "play"
+                self.notify("player")
+            elif name == "stop":
+                self.state = "stop"
+                self.notify("player")
+            elif name == "clear":
+                self.queue = []
+                self.song_pos = -1
+                self.state = "stop"
+                self.notify("playlist")
+            elif name == "add":
+                self.queue.append(args[1])
+                self.notify("playlist")
+            elif name == "addid":
+                pos = int(args[2]) if len(args) > 2 else len(self.queue)
+                if pos > len(self.queue):
+                    raise ValueError("Bad song index")
+                self.queue.insert(pos, args[1])
+                if 0 <= pos <= self.song_pos:
+                    self.song_pos += 1
+                self.next_id += 1
+                self.notify("playlist")
+                return ["Id: {}".format(self.next_id)]
+            elif name == "delete":
+                pos = int(args[1])
+                if pos >= len(self.queue):
+                    raise ValueError("Bad song index")
+                del self.queue[pos]
+                if pos < self.song_pos:
+                    self.song_pos -= 1
+                elif pos == self.song_pos:
+                    self.song_pos = -1
+                    self.state = "stop"
+                    self.notify("player")
+                self.notify("playlist")
+            elif name == "move":
+                source, target = int(args[1]), int(args[2])
+                if source >= len(self.queue) or target >= len(self.queue):
+                    raise ValueError("Bad song index")
+                self.queue.insert(target, self.queue.pop(source))
+                if self.song_pos == source:
+                    self.song_pos = target
+                elif source < self.song_pos <= target:
+                    self.song_pos -= 1
+                elif target <= self.song_pos < source:
+                    self.song_pos += 1
+                self.notify("playlist")
+            elif name == "setvol":
+                self.volume = int(args[1])
+                self.notify("mixer")
+            elif name == "ping":
+                pass
+            else:
+                raise ValueError("unknown command \"{}\"".format(name))
+        return []
+
+
+class _FakeTCPServer(socketserver.ThreadingTCPServer):
+
+    def handle_error(self, request, client_address):
+        # the connections dropped by the tests are expected
+        self.fake.logger.debug("Connection with %s closed", client_address)
+
+
+class _MpdHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        fake = self.server.fake
+        with fake.lock:
+            fake.connections += 1
+            fake._sockets.add(self.connection)
+            self._seen = dict(fake.versions)
+        try:
+            self._serve()
+        finally:
+            with fake.lock:
+                fake._sockets.discard(self.connection)
+
+    def _serve(self):
+        self._send(["OK MPD 0.23.5"])
+        batch = None
+        for raw in self.rfile:
+            line = raw.decode("utf-8").rstrip("\n")
+            if line == "close":
+                return
+            elif line == "command_list_begin":
+                batch = []
+            elif line == "command_list_end":
+                self._answer(batch)
+                batch = None
+            elif batch is not None:
+                batch.append(line)
+            elif line.startswith("idle"):
+                self._idle(shlex.split(line)[1:])
+            else:
+                self._answer([line])
+
+    def _idle(self, subsystems):
+        fake = self.server.fake
+        subsystems = subsystems or list(fake.versions)
+        while True:
+            with fake.lock:
+                changed = [name for name in subsystems
+                           if fake.versions[name] != self._seen[name]]
+                if changed:
+                    for name in changed:
+                        self._seen[name] = fake.versions[name]
+                    self._send(["changed: {}".format(name) for name in changed] + ["OK"])
+                    return
+                fake.changes.wait(0.02)
+            # the only command accepted while idle is noidle
+            readable, _, _ = select.select([self.connection], [], [], 0)
+            if readable:
+                line = self.rfile.readline().decode("utf-8").rstrip("\n")
+                if line == "noidle":
+                    self._send(["OK"])
+                return
+
+    def _answer(self, lines):
+        fake = self.server.fake
+        answer = []
+        for index, line in enumerate(lines):
+            args = shlex.split(line)
+            try:
+                answer.extend(fake.execute(args))
+            except (ValueError, IndexError) as error:
+                answer.append("ACK [5@{}] {{{}}} {}".format(index, args[0], error))
+                self._send(answer)
+                return
+        answer.append("OK")
+        with fake.lock:
+            lost = fake.lost_answers > 0
+            if lost:
+                fake.lost_answers -= 1
+        if lost:
+            self.connection.shutdown(socket.SHUT_RDWR)
+            return
+        self._send(answer)
+
+    def _send(self, lines):
+        self.wfile.write(("\n".join(lines) + "\n").encode("utf-8"))
+        self.wfile.flush()
@@ -0,0 +1,437 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Hardware of the radio : the Raspberry Pi one, or a simulated one
+"""
+
+from collections import namedtuple
+from threading import Lock, Event
+import subprocess
+import io
+import time
+import logging
+
+from wifiscanner import WifiProbe, WifiScanner
+from bluetoothcontroller import BluezBus
+from display import ShadowDisplay
+
+# A bus operation recorded by the simulated hardware.
+# size is the number of bytes sent on the bus, detail depends on the bus
+BusRecord = namedtuple("BusRecord", ["timestamp", "bus", "operation", "size", "detail"])
+
+
+class SoundCard:
+    """ The amplifier of the soundcard, switched on and off through
+        its mute GPIO. A mute GPIO of 0 means that there is none.
+    """
+
+    def __init__(self, gpio, mute_gpio):
+        self.logger = logging.getLogger(type(self).__name__)
+        self._gpio = gpio
+        self._mute_gpio = mute_gpio
+
+    def setup(self):
+        self.logger.info("Soundcard mute gpio : %s", self._mute_gpio)
+        if self._mute_gpio != 0:
+            self._gpio.setmode(self._gpio.BCM)
+            self._gpio.setup(self._mute_gpio, self._gpio.OUT, initial=self._gpio.LOW)
+
+    def cleanup(self):
+        """ Leaves the amplifier on, with the GPIO released
+        """
+        if self._mute_gpio != 0:
+            self._gpio.setup(self._mute_gpio, self._gpio.OUT, initial=self._gpio.HIGH)
+            self._gpio.setup(self._mute_gpio, self._gpio.IN)
+
+    def _set_enabled(self, value):
+        if self._mute_gpio != 0:
+            self._gpio.output(self._mute_gpio, self._gpio.HIGH if value else self._gpio.LOW)
+
+    enabled = property(fset=_set_enabled)
+
+
+class RaspberryHardware:
+    """ The hardware of the radio on the Raspberry Pi.
+
+        gpio is the RPi.GPIO module, processes is the subprocess module :
+        the simulated hardware provides objects with the same interface.
+        The Raspberry Pi specific modules are imported only when this
+        class is used, so that the radio can run elsewhere on the
+        simulated hardware.
+    """
+
+    def __init__(self):
+        import RPi.GPIO
+        self.gpio = RPi.GPIO
+        self.processes = subprocess
+
+    def create_lcd(self, address):
+        from RPLCD.i2c import CharLCD
+        return CharLCD(i2c_expander='PCF8574', address=address,
+                       port=1,
+                       cols=20, rows=4, dotsize=8,
+                       charmap='A00',
+                       auto_linebreaks=True,
+                       backlight_enabled=False)
+
+    def create_wifi_scanner(self):
+        return WifiScanner(WifiProbe())
+
+    def mpd_address(self, rsc):
+        return rsc.mpd_host, rsc.mpd_port
+
+    def create_bluetooth_bus(self):
+        return BluezBus()
+
+    def close(self):
+        return
+
+
+class BusRecorder:
+    """ Records the operations done on the simulated buses (gpio, i2c,
+        process), with their timestamp.
+        It may be used from several threads.
+    """
+
+    def __init__(self, clock=time.monotonic):
+        self._clock = clock
+        self._lock = Lock()
+        self._records = []
+
+    def record(self, bus, operation, size=0, detail=None):
+        with self._lock:
+            self._records.append(BusRecord(self._clock(), bus, operation, size, detail))
+
+    def records(self, bus=None, since=None):
+        """ Returns the records of the bus (all the buses if None),
+            done at since or later if given
+        """
+        with self._lock:
+            return [record for record in self._records
+                    if (bus is None or record.bus == bus)
+                    and (since is None or record.timestamp >= since)]
+
+    def bytes_written(self, bus=None, since=None):
+        return sum(record.size for record in self.records(bus, since))
+
+    def count(self, bus=None, operation=None, since=None):
+        return len([record for record in self.records(bus, since)
+                    if operation is None or record.operation == operation])
+
+    def clear(self):
+        with self._lock:
+            self._records = []
+
+
+class SimulatedGpio:
+    """ An in-memory replacement of the RPi.GPIO module.
+
+        The inputs are changed by set_input(), which calls the edge
+        callbacks from the calling thread, as RPi.GPIO does from its own
+        thread. The bounce times are ignored.
+    """
+
+    BCM = 11
+    BOARD = 10
+    IN = 1
+    OUT = 0
+    LOW = 0
+    HIGH = 1
+    PUD_OFF = 20
+    PUD_DOWN = 21
+    PUD_UP = 22
+    RISING = 31
+    FALLING = 32
+    BOTH = 33
+
+    def __init__(self, recorder):
+        self._recorder = recorder
+        self._lock = Lock()
+        self._levels = {}
+        self._callbacks = {}
+        self.mode = None
+
+    def setmode(self, mode):
+        self.mode = mode
+
+    def setup(self, pin, direction, pull_up_down=PUD_OFF, initial=None):
+        with self._lock:
+            if direction == SimulatedGpio.OUT:
+                self._levels[pin] = initial if initial is not None else SimulatedGpio.LOW
+            else:
+                self._levels[pin] = SimulatedGpio.HIGH if pull_up_down == SimulatedGpio.PUD_UP \
+                    else SimulatedGpio.LOW
+        self._recorder.record("gpio", "setup", 0, (pin, direction))
+
+    def input(self, pin):
+        with self._lock:
+            return self._levels.get(pin, SimulatedGpio.LOW)
+
+    def output(self, pin, value):
+        with self._lock:
+            self._levels[pin] = SimulatedGpio.HIGH if value else SimulatedGpio.LOW
+        self._recorder.record("gpio", "output", 1, (pin, value))
+
+    def add_event_detect(self, pin, edge, callback=None, bouncetime=None):
+        with self._lock:
+            self._callbacks[pin] = (edge, callback)
+
+    def remove_event_detect(self, pin):
+        with self._lock:
+            self._callbacks.pop(pin, None)
+
+    def cleanup(self):
+        with self._lock:
+            self._levels.clear()
+            self._callbacks.clear()
+
+    def set_input(self, pin, value):
+        """ Changes the level of an input pin, as the button wired to it does
+        """
+        value = SimulatedGpio.HIGH if value else SimulatedGpio.LOW
+        with self._lock:
+            previous = self._levels.get(pin, SimulatedGpio.LOW)
+            self._levels[pin] = value
+            edge, callback = self._callbacks.get(pin, (None, None))
+        if callback is None or previous == value:
+            return
+        if edge == SimulatedGpio.BOTH \
+                or (edge == SimulatedGpio.RISING and value == SimulatedGpio.HIGH) \
+                or (edge == SimulatedGpio.FALLING and value == SimulatedGpio.LOW):
+            callback(pin)
+
+
+class SimulatedLcd:
+    """ An in-memory replacement of the RPLCD CharLCD object, for the
+        features used by the radio.
+
+        It keeps the content of the screen and records the bytes that
+        the real lcd would receive on the i2c bus, with their timestamp.
+    """
+
+    def __init__(self, recorder, rows=4, cols=20):
+        self._recorder = recorder
+        self._rows = rows
+        self._cols = cols
+        self._content = [[" "] * cols for i in range(rows)]
+        self._pos = (0, 0)
+        self._backlight = False
+        self.chars = {}
+
+    def _send(self, operation, lcd_bytes, detail=None):
+        self._recorder.record("i2c", operation,
+                              lcd_bytes * ShadowDisplay.I2C_WRITES_PER_BYTE, detail)
+
+    def write_string(self, text):
+        row, col = self._pos
+        for char in text:
+            self._content[row][col] = char
+            col += 1
+            if col >= self._cols:
+                row, col = (row + 1) % self._rows, 0
+        self._pos = (row, col)
+        self._send("write_string", len(text), text)
+
+    def clear(self):
+        self._content = [[" "] * self._cols for i in range(self._rows)]
+        self._pos = (0, 0)
+        self._send("clear", 1)
+
+    def create_char(self, location, bitmap):
+        self.chars[location] = tuple(bitmap)
+        # the CGRAM address, then the 8 lines of the bitmap
+        self._send("create_char", 1 + len(bitmap), location)
+
+    def close(self, clear=False):
+        if clear:
+            self.clear()
+
+    def _get_cursor_pos(self):
+        return self._pos
+
+    def _set_cursor_pos(self, pos):
+        self._pos = pos
+        self._send("cursor_pos", 1, pos)
+
+    def _get_backlight_enabled(self):
+        return self._backlight
+
+    def _set_backlight_enabled(self, value):
+        self._backlight = bool(value)
+        # a single write of the expander port
+        self._recorder.record("i2c", "backlight", 1, self._backlight)
+
+    def _set_cursor_mode(self, mode):
+        self._send("cursor_mode", 1, mode)
+
+    def _get_lines(self):
+        return ["".join(row) for row in self._content]
+
+    cursor_pos = property(fget=_get_cursor_pos, fset=_set_cursor_pos)
+    backlight_enabled = property(fget=_get_backlight_enabled, fset=_set_backlight_enabled)
+    cursor_mode = property(fset=_set_cursor_mode)
+    lines = property(fget=_get_lines)
+
+
+class SimulatedProcess:
+    """ A process started by the SimulatedProcessRunner.
+        A process with a simulated output, or whose output is read, is
+        over at once. The others run until they are killed or terminated.
+    """
+
+    def __init__(self, args, output, stdout):
+        self.args = args
+        self.returncode = None
+        self._ended = Event()
+        text = output if output is not None else ""
+        self.stdout = io.StringIO(text) if stdout == subprocess.PIPE else None
+        self._output = text
+        if output is not None or self.stdout is not None:
+            self._end(0)
+
+    def _end(self, returncode):
+        if self.returncode is None:
+            self.returncode = returncode
+            self._ended.set()
+
+    def poll(self):
+        return self.returncode
+
+    def wait(self, timeout=None):
+        if not self._ended.wait(timeout):
+            raise subprocess.TimeoutExpired(self.args, timeout)
+        return self.returncode
+
+    def communicate(self, input=None, timeout=None):
+        self.wait(timeout)
+        return (self._output if self.stdout is not None else None), None
+
+    def kill(self):
+        self._end(-9)
+
+    def terminate(self):
+        self._end(-15)
+
+
+class SimulatedProcessRunner:
+    """ A replacement of the subprocess module for the functions used by
+        the radio. The commands are not run : their output is taken
+        from outputs, a dictionary indexed by the command name.
+        Each spawn is recorded on the "process" bus, the processes
+        started are kept in 'processes'.
+    """
+
+    PIPE = subprocess.PIPE
+    DEVNULL = subprocess.DEVNULL
+
+    def __init__(self, recorder, outputs=None):
+        self._recorder = recorder
+        self.outputs = dict(outputs) if outputs is not None else {}
+        self.processes = []
+
+    def call(self, args, **kwargs):
+        self._recorder.record("process", "call", 0, tuple(args))
+        return 0
+
+    def Popen(self, args, stdout=None, **kwargs):
+        self._recorder.record("process", "popen", 0, tuple(args))
+        process = SimulatedProcess(args, self.outputs.get(args[0]), stdout)
+        self.processes.append(process)
+        return process
+
+
+class SimulatedWifiProbe(WifiProbe):
+    """ A WifiProbe running the wifi commands on the simulated process
+        runner, with simulated kernel statistics
+    """
+
+    def __init__(self, processes, wireless_stats):
+        WifiProbe.__init__(self, processes)
+        self._wireless_stats = wireless_stats
+
+    def get_wireless_stats(self):
+        return self._wireless_stats
+
+
+SIMULATED_ESSID = "Simulated Wifi"
+
+SIMULATED_OUTPUTS = {
+    "iwgetid": "wlan0     ESSID:\"{}\"\n".format(SIMULATED_ESSID),
+    "iwlist": "wlan0     Scan completed :\n"
+              "          Cell 01 - Address: 02:00:00:00:00:01\n"
+              "                    Quality=56/70  Signal level=-54 dBm  \n"
+              "                    Encryption key:on\n"
+              "                    ESSID:\"{}\"\n".format(SIMULATED_ESSID),
+    "hostname": "192.168.1.20\n",
+    }
+
+SIMULATED_WIRELESS_STATS = \
+    "Inter-| sta-|   Quality        |   Discarded packets               | Missed | WE\n" \
+    " face | tus | link level noise |  nwid  crypt   frag  retry   misc | beacon | 22\n" \
+    " wlan0: 0000   56.  -54.  -256        0      0      0      0      0        0\n"
+
+
+class SimulatedHardware:
+    """ The hardware of the radio simulated in memory, to run the whole
+        radio on any Linux box : GPIO, lcd, processes and wifi are
+        simulated, the audio is played by a FakeMpdServer and bluetoothd
+        is replaced by a FakeBluezBus.
+
+        All the bus operations are recorded by the recorder, with their
+        timestamp, so that the bus traffic and the delay between an
+        input and the display can be measured.
+    """
+
+    def __init__(self, outputs=SIMULATED_OUTPUTS, wireless_stats=SIMULATED_WIRELESS_STATS):
+        self.recorder = BusRecorder()
+        self.gpio = SimulatedGpio(self.recorder)
+        self.processes = SimulatedProcessRunner(self.recorder, outputs)
+        self.wireless_stats = wireless_stats
+        self.lcd = None
+        self.mpd_server = None
+        self.bluez = None
+
+    def create_lcd(self, address):
+        self.lcd = SimulatedLcd(self.recorder)
+        return self.lcd
+
+    def create_wifi_scanner(self):
+        return WifiScanner(SimulatedWifiProbe(self.processes, self.wireless_stats))
+
+    def mpd_address(self, rsc):
+        if self.mpd_server is None:
+            # imported here : the fake server is only a test tool
+            from fakempd import FakeMpdServer
+            self.mpd_server = FakeMpdServer()
+            self.mpd_server.start()
+        return self.mpd_server.host, self.mpd_server.port
+
+    def create_bluetooth_bus(self):
+        from fakebluez import FakeBluezBus
+        self.bluez = FakeBluezBus(recorder=self.recorder)
+        return self.bluez
+
+    def close(self):
+        if self.mpd_server is not None:
+            self.mpd_server.stop()
+            self.mpd_server = None
+
+    def press(self, pin):
+        """ Presses the button wired to the pin (active low)
+        """
+        self.gpio.set_input(pin, SimulatedGpio.LOW)
+
+    def release(self, pin):
+        self.gpio.set_input(pin, SimulatedGpio.HIGH)
+
+    def turn(self, pina, pinb, steps):
+        """ Turns the rotary encoder wired to pina and pinb of the given
+            number of detents, positive clockwise
+        """
+        # clockwise, pin a leads : b is the last to rise
+        first, second = (pina, pinb) if steps > 0 else (pinb, pina)
+        for i in range(abs(steps)):
+            self.gpio.set_input(first, SimulatedGpio.LOW)
+            self.gpio.set_input(second, SimulatedGpio.LOW)
+            self.gpio.set_input(first, SimulatedGpio.HIGH)
+            self.gpio.set_input(second, SimulatedGpio.HIGH)
@@ -11,11 +11,18 @@ import sys
 sys.path.append("./lib")
 import smbus
 from time import *
+try:
+   from smbus2 import i2c_msg
+except ImportError:
+   i2c_msg = None
+
+# Maximum length of a smbus block transfer : command byte + 32 data bytes
+BLOCK_SIZE = 33
 
 class i2c_device:
-   def __init__(self, addr, port=1):
+   def __init__(self, addr, port=1, bus=None):
       self.addr = addr
-      self.bus = smbus.SMBus(port)
+      self.bus = bus if bus is not None else smbus.SMBus(port)
 
 # Write a single command
    def write_cmd(self, cmd):
@@ -32,6 +39,20 @@ class i2c_device:
       self.bus.write_block_data(self.addr, cmd, data)
       sleep(0.0001)
 
+# Write a sequence of bytes, in as few transfers as possible and without
+# sleeping between the bytes. Uses a single i2c_rdwr transfer when the bus
+# is a smbus2 one, else smbus blocks (the first byte being sent as command)
+   def write_bytes(self, data):
+      if i2c_msg is not None and hasattr(self.bus, "i2c_rdwr"):
+         self.bus.i2c_rdwr(i2c_msg.write(self.addr, data))
+         return
+      for start in range(0, len(data), BLOCK_SIZE):
+         block = data[start:start + BLOCK_SIZE]
+         if len(block) == 1:
+            self.bus.write_byte(self.addr, block[0])
+         else:
+            self.bus.write_i2c_block_data(self.addr, block[0], block[1:])
+
 # Read a single byte
    def read(self):
       return self.bus.read_byte(self.addr)
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Compares lcd_display_string and lcd_display_string_fast against a fake
+SMBus counting the bus transactions.
+Can be launched without any i2c hardware :
+    python3 lcd_benchmark.py
+"""
+import sys
+import time
+import types
+
+
+class FakeSMBus:
+   """ Records the bytes received by the expander and the transactions
+   """
+   def __init__(self, port=1):
+      self.transactions = 0
+      self.received = []
+
+   def write_byte(self, addr, value):
+      self.transactions += 1
+      self.received.append(value)
+
+   def write_byte_data(self, addr, cmd, value):
+      self.transactions += 1
+      self.received.extend((cmd, value))
+
+   def write_i2c_block_data(self, addr, cmd, values):
+      if len(values) > 32:
+         raise ValueError("Block too long")
+      self.transactions += 1
+      self.received.append(cmd)
+      self.received.extend(values)
+
+   def reset(self):
+      self.transactions = 0
+      self.received = []
+
+
+# the benchmark shall run where python-smbus is not installed
+sys.modules.setdefault("smbus", types.SimpleNamespace(SMBus=FakeSMBus))
+
+import i2c_lib
+import lcddriver
+
+
+# On the bus, a byte is 9 clock cycles (8 bits + ack), plus the address byte
+# at the beginning of each transaction
+def bus_time(bus, frequency=100000):
+   return (len(bus.received) + bus.transactions) * 9 / frequency
+
+
+if __name__ == "__main__":
+   bus = FakeSMBus()
+   device = i2c_lib.i2c_device(lcddriver.ADDRESS, bus=bus)
+   display = lcddriver.lcd(device)
+   text = "Radio en construction"[:20]
+   count = 10
+
+   bus.reset()
+   t0 = time.perf_counter()
+   for i in range(count):
+      display.lcd_display_string(text, 3)
+   t1 = time.perf_counter()
+   slow_bytes = list(bus.received)
+   slow_transactions = bus.transactions
+   slow_bus_time = bus_time(bus)
+
+   bus.reset()
+   t2 = time.perf_counter()
+   for i in range(count):
+      display.lcd_display_string_fast(text, 3)
+   t3 = time.perf_counter()
+
+   if bus.received != slow_bytes:
+      print("ERROR : the fast path does not send the same bytes to the expander")
+      sys.exit(1)
+
+   print("Per line of 20 characters :")
+   print("  lcd_display_string      : {:4d} transactions, {:6.2f} ms wall, {:6.2f} ms bus".format(
+         slow_transactions // count, (t1 - t0) / count * 1000, slow_bus_time / count * 1000))
+   print("  lcd_display_string_fast : {:4d} transactions, {:6.2f} ms wall, {:6.2f} ms bus".format(
+         bus.transactions // count, (t3 - t2) / count * 1000, bus_time(bus) / count * 1000))
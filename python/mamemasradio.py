@@ -6,40 +6,84 @@ Created on Sun Sep 16 18:32:07 2018
 @author: Sebastien Roy
 """
 
-from queue import Queue
-from threading import Thread, Event
+from threading import Thread, Event, Lock
+from collections import deque
+import asyncio
 import time
-import subprocess
 import argparse
 import traceback
 import logging
 
-import RPi.GPIO as GPIO
-from RPLCD.i2c import CharLCD
 
 from resources import Resources
 from wifiscanner import WifiScanner
-from radioevents import WifiEvent, StationButtonEvent, VolumeButtonEvent, PowerButtonEvent
+from radioevents import WifiEvent, WifiScanEvent, StationButtonEvent, VolumeButtonEvent, PowerButtonEvent
+from radioevents import ConfigChangedEvent, PlaylistSyncEvent, StopEvent
 from radiocontext import RadioContext
 from onstate import OnState
 from offstate import OffState
 from bluetoothstate import BluetoothState
 from powerbutton import PowerButton
 from encoder import RotaryEncoder
+from mpdclient import MpdClient, MpdError
+from display import ShadowDisplay
+from displayworker import DisplayWorker, DisplayPriority, display_priority
+from scheduler import Scheduler, BlockingCaller
+from asyncradio import AsyncEventQueue, AsyncScheduler, AsyncPoller, AsyncBlockingCaller
+from eventqueue import CoalescingQueue
+from volumeapplier import VolumeApplier
+from scancache import ScanCache
+from playlistsync import sync_playlist
+from startupprofiler import StartupProfiler
+from hardware import RaspberryHardware, SoundCard
+
+WIFI_PERIOD = 5
+# The volume knob goes faster when turned fast. The station knob does not:
+# the playlist is short and overshooting a station is annoying
+VOLUME_MAX_ACCELERATION = 4
+# Period of the check of the modification of the configuration file
+CONFIG_CHECK_PERIOD = 2
+# Delay between two attempts to send the playlist to an unreachable mpd
+PLAYLIST_RETRY_PERIOD = 30
+
+
+def measure_wifi(scanner, scan_cache=None):
+    """ Returns a WifiEvent giving the quality of the connected wifi cell.
+        The quality is read from the kernel statistics, the full wifi scan
+        is done only if they are not available.
+    """
+    # the interface is the connected one, given by iwgetid
+    quality = scanner.measure_link_quality(scanner.interface)
+    if quality is None:
+        scanner.scan_wifi(current_only=True)
+        if scanner.current_cell is None:
+            quality = 0
+            # the scan went to the end : all the cells are known
+            if scan_cache is not None:
+                scan_cache.update(scanner.cells, scanner.essid)
+        else:
+            quality = scanner.current_cell.quality
+    return WifiEvent(quality)
+
 
 class WifiThread(Thread):
     """ A thread used to regulary check the wifi signal level
     """
-    def __init__(self, callback):
+    def __init__(self, callback, scan_cache=None, scanner_factory=WifiScanner):
         Thread.__init__(self)
         self._callback = callback
+        self._scan_cache = scan_cache
+        self._scanner_factory = scanner_factory
         self._stop = False
         self._pause = Event()
+        self._stopping = Event()
 
     def stop(self):
-        """ Stops the thread
+        """ Stops the thread, even if it is paused
         """
         self._stop = True
+        self._stopping.set()
+        self._pause.set()
 
     def pause(self):
         """ Pauses the thread
@@ -52,15 +96,13 @@ class WifiThread(Thread):
         self._pause.set()
 
     def run(self):
-        scanner = WifiScanner()
+        scanner = self._scanner_factory()
         while not self._stop:
             self._pause.wait()
-            scanner.scan_wifi()
-
-            quality = 0 if scanner.current_cell is None else scanner.current_cell.quality
-            event = WifiEvent(quality)
-            self._callback(event)
-            time.sleep(5)
+            if self._stop:
+                break
+            self._callback(measure_wifi(scanner, self._scan_cache))
+            self._stopping.wait(WIFI_PERIOD)
 
 
 class MamemasRadio:
@@ -77,60 +119,161 @@ class MamemasRadio:
     def _wifi_callback(self, event):
         self._event_queue.put(event)
 
-    def _station_callback(self, originator, event_type):
-        event = StationButtonEvent(event_type)
+    def _scan_callback(self, scan_cache):
+        self._event_queue.put(WifiScanEvent(scan_cache.cells))
+
+    def _check_config(self):
+        # called by the scheduler : the file is read and parsed by the
+        # blocking caller, out of the asyncio event loop
+        self._caller.call(self._rsc.reload_if_changed, callback=self._config_checked)
+
+    def _config_checked(self, previous):
+        if previous is not None:
+            self._event_queue.put(ConfigChangedEvent(previous))
+        elif not self._playlist_synced and time.monotonic() >= self._next_sync_retry:
+            # mpd could not be reached until now : the playlist is sent by
+            # the event loop, never by the scheduler thread
+            self._next_sync_retry = time.monotonic() + PLAYLIST_RETRY_PERIOD
+            self._event_queue.put(PlaylistSyncEvent())
+
+    def _station_callback(self, originator, event_type, steps=0):
+        event = StationButtonEvent(event_type, steps)
         self._event_queue.put(event)
 
-    def _volume_callback(self, originator, event_type):
-        event = VolumeButtonEvent(event_type)
+    def _volume_callback(self, originator, event_type, steps=0):
+        event = VolumeButtonEvent(event_type, steps)
         self._event_queue.put(event)
 
-    def __init__(self, conf_path):
+    def __init__(self, conf_path, use_asyncio=False, profiler=None, hardware=None):
+        """ If use_asyncio is True, the events, the timeouts and the periodic
+            tasks are handled by an asyncio event loop instead of threads.
+            profiler is a StartupProfiler measuring the initialisation phases
+            hardware gives the gpio, lcd, processes and mpd server to use :
+            the Raspberry Pi ones by default, or a SimulatedHardware
+        """
         self.logger = logging.getLogger(type(self).__name__)
+        self._hardware = hardware if hardware is not None else RaspberryHardware()
+        self._profiler = profiler if profiler is not None else StartupProfiler(enabled=False)
+        phase = self._profiler.phase
+        # latencies of the last handled events, in seconds
+        self.latencies = deque(maxlen=1000)
 
         # Context initialisation
 
-        self._rsc = Resources(conf_path)
-        self._event_queue = Queue()
-        self._init_playlist()
-        self._init_soundcard()
-        lcd = self._init_lcd()
-        power_button = PowerButton(self._rsc.power_switch, self._rsc.power_led, None)
-        power_button.callback = self._power_callback
-        station_gpios = self._rsc.station_button
-        self._station_button = RotaryEncoder(station_gpios[0],
-                                             station_gpios[1],
-                                             station_gpios[2],
-                                             callback=self._station_callback)
-        volume_gpios = self._rsc.volume_button
-        self._volume_button = RotaryEncoder(volume_gpios[0],
-                                            volume_gpios[1],
-                                            volume_gpios[2],
-                                            callback=self._volume_callback)
-
-        self._wifi_thread = WifiThread(self._wifi_callback)
+        with phase("resources"):
+            self._rsc = Resources(conf_path)
+        with phase("event loop"):
+            if use_asyncio:
+                self._loop = asyncio.new_event_loop()
+                asyncio.set_event_loop(self._loop)
+                self._event_queue = AsyncEventQueue(self._loop)
+                self._scheduler = AsyncScheduler(self._loop)
+                self._caller = AsyncBlockingCaller(self._loop)
+            else:
+                self._loop = None
+                self._event_queue = CoalescingQueue()
+                self._scheduler = Scheduler()
+                self._caller = BlockingCaller()
+        with phase("mpd playlist"):
+            mpd_host, mpd_port = self._hardware.mpd_address(self._rsc)
+            self._mpd = MpdClient(mpd_host, mpd_port)
+            self._playlist_synced = False
+            self._sync_lock = Lock()
+            # a synchronisation is queued in the caller, not started yet
+            self._sync_queued = False
+            self._queued_lock = Lock()
+            self._next_sync_retry = 0
+            self._init_playlist()
+            self._volume_applier = VolumeApplier(self._mpd.clone())
+        self._scan_cache = ScanCache(self._scan_callback, self._rsc.wifi_scan_ttl,
+                                     self._hardware.create_wifi_scanner)
+        with phase("soundcard"):
+            self._soundcard = SoundCard(self._hardware.gpio, self._rsc.mute_gpio)
+            self._soundcard.setup()
+        with phase("lcd"):
+            # the lcd is written by its own thread : the event loop never
+            # waits for the i2c bus. The backlight effects go through it too
+            lcd = DisplayWorker(ShadowDisplay(self._init_lcd()), scheduler=self._scheduler)
+            lcd.start()
+        with phase("buttons"):
+            gpio = self._hardware.gpio
+            power_button = PowerButton(gpio, self._rsc.power_switch, self._rsc.power_led, None)
+            power_button.callback = self._power_callback
+            station_gpios = self._rsc.station_button
+            self._station_button = RotaryEncoder(gpio,
+                                                 station_gpios[0],
+                                                 station_gpios[1],
+                                                 station_gpios[2],
+                                                 callback=self._station_callback,
+                                                 scheduler=self._scheduler)
+            volume_gpios = self._rsc.volume_button
+            self._volume_button = RotaryEncoder(gpio,
+                                                volume_gpios[0],
+                                                volume_gpios[1],
+                                                volume_gpios[2],
+                                                callback=self._volume_callback,
+                                                scheduler=self._scheduler,
+                                                max_acceleration=VOLUME_MAX_ACCELERATION)
+
+        if use_asyncio:
+            scanner = self._hardware.create_wifi_scanner()
+            self._wifi_thread = AsyncPoller(self._loop,
+                                            lambda: measure_wifi(scanner, self._scan_cache),
+                                            self._wifi_callback, WIFI_PERIOD)
+        else:
+            self._wifi_thread = WifiThread(self._wifi_callback, self._scan_cache,
+                                           self._hardware.create_wifi_scanner)
         self._ctxt = RadioContext(self._rsc, lcd, power_button,
                                   self._station_button,
                                   self._volume_button,
                                   self._wifi_thread,
-                                  self._event_queue)
-
-        self._on_state = OnState(self._ctxt, self)
-        self._off_state = OffState(self._ctxt, self)
-        self._bt_state = BluetoothState(self._ctxt, self)
+                                  self._event_queue,
+                                  self._mpd,
+                                  self._scheduler,
+                                  self._volume_applier,
+                                  self._scan_cache,
+                                  self._hardware,
+                                  self._soundcard,
+                                  self._caller)
+
+        # Only the off state is needed at startup : the on and bluetooth
+        # states, with their threads and subprocesses, are built on first use
+        self._states = {}
+        with phase("off state"):
+            self._get_state(OffState)
         self._state = None
-        # set callbacks
+        self._running = False
+        self._started = Event()
+        self._config_task = self._scheduler.schedule_periodic(CONFIG_CHECK_PERIOD,
+                                                              self._check_config,
+                                                              paused=True)
+
+    def _get_state(self, state_class):
+        state = self._states.get(state_class)
+        if state is None:
+            state = state_class(self._ctxt, self)
+            self._states[state_class] = state
+        return state
+
+    _on_state = property(fget=lambda self: self._get_state(OnState))
+    _off_state = property(fget=lambda self: self._get_state(OffState))
+    _bt_state = property(fget=lambda self: self._get_state(BluetoothState))
+    # the DisplayWorker sending the commands to the lcd
+    display = property(fget=lambda self: self._ctxt.lcd)
 
     def switch_radio(self, value):
         """ This method is called when the power button is pressed.
             The result is switching on or off the radio
         """
-        if self._state is self._on_state and value:
+        if value and self._state is self._on_state:
             self.logger.error("Switch on when switched on should not happen")
         elif self._state is self._off_state and not value:
             self.logger.error("Switch off when switched off should not happen")
         else:
             self._state.leave_state()
+            if value and not self._playlist_synced:
+                # sent before the play command of the on state
+                self._request_sync()
             self._state = self._on_state if value else self._off_state
             self._state.enter_state()
             
@@ -146,18 +289,47 @@ class MamemasRadio:
             self._state.enter_state()
 
     def _init_playlist(self):
-        subprocess.call(["mpc", "clear"])
-        playlist = self._rsc.playlist
-        for entry, url in playlist:
-            subprocess.call(["mpc", "add", url])
+        # the queue left by the previous run is kept : only the stations
+        # that changed since are sent to mpd, in a single command list.
+        # If mpd is not started yet, the playlist is sent on the first
+        # switch on or on the next configuration check
+        self._sync_playlist()
+
+    def _config_changed(self, event):
+        """ Applies the new configuration without restarting the radio
+        """
+        previous = event.value
+        if previous.playlist != self._rsc.playlist or not self._playlist_synced:
+            self._request_sync()
+        # the states not built yet will read the new configuration
+        for state in self._states.values():
+            state.config_changed(previous)
+
+    def _request_sync(self):
+        """ Queues a synchronisation of the playlist in the caller, unless
+            one is already queued : it will read the current playlist
+        """
+        with self._queued_lock:
+            if self._sync_queued:
+                return
+            self._sync_queued = True
+        self._caller.call(self._sync_playlist)
+
+    def _sync_playlist(self):
+        # two synchronisations would both add the missing stations
+        with self._sync_lock:
+            with self._queued_lock:
+                self._sync_queued = False
+            try:
+                # only the stations that changed are sent to mpd
+                sync_playlist(self._mpd, [url for entry, url in self._rsc.playlist])
+                self._playlist_synced = True
+            except (OSError, EOFError, MpdError) as error:
+                self._playlist_synced = False
+                self.logger.error("Playlist synchronisation failed : %s", error)
 
     def _init_lcd(self):
-        lcd = CharLCD(i2c_expander='PCF8574', address=self._rsc.lcd_address,
-                      port=1,
-                      cols=20, rows=4, dotsize=8,
-                      charmap='A00',
-                      auto_linebreaks=True,
-                      backlight_enabled=False)
+        lcd = self._hardware.create_lcd(self._rsc.lcd_address)
         #self._lcd.backlight_enabled = False
         lcd.cursor_mode = "hide"
         wifi_char = (
@@ -196,41 +368,107 @@ class MamemasRadio:
         lcd.create_char(2, enter_char)
         return lcd
 
-    def _init_soundcard(self):
-        mute_gpio = self._rsc.mute_gpio
-        print("MamemasRadio, mute_gpio = ", mute_gpio)
-        if(mute_gpio != 0):
-            GPIO.setmode(GPIO.BCM)
-            GPIO.setup(mute_gpio, GPIO.OUT, initial=GPIO.LOW)
+    def wait_started(self, timeout=None):
+        """ Waits until start() has displayed the sleep screen and is ready
+            to handle the events. Returns False in case of timeout
+        """
+        return self._started.wait(timeout)
+
+    def post_event(self, event):
+        """ Queues an event for the event loop, as the buttons do.
+            May be called from any thread
+        """
+        self._event_queue.put(event)
+
+    def stop(self):
+        """ Ends start(), once the events already queued are handled.
+            May be called from any thread
+        """
+        self.post_event(StopEvent())
 
     def start(self):
-        """ This starts all the state model of the radio
+        """ This starts all the state model of the radio.
+            It returns when the radio is stopped
         """
-        self._state = self._off_state
-        self._state.enter_state()
+        with self._profiler.phase("sleep screen"):
+            self._state = self._off_state
+            self._state.enter_state()
+            self._ctxt.lcd.flush()
+        self._profiler.report()
         self._wifi_thread.start()
-        stopped = False
-        while not stopped:
+        self._volume_applier.start()
+        self._config_task.resume(delay=CONFIG_CHECK_PERIOD)
+        self._running = True
+        self._started.set()
+        try:
+            if self._loop is None:
+                while self._running:
+                    self._handle_event(self._event_queue.get())
+            else:
+                self._loop.run_until_complete(self._async_loop())
+        except BaseException:
+            self.logger.error("Stopped")
+            self.logger.error(traceback.format_exc())
+        self._cleanup()
+
+    async def _async_loop(self):
+        while self._running:
+            event = await self._event_queue.get()
+            self._handle_event(event)
+
+    def _handle_event(self, event):
+        self.logger.info("Got event %s", event)
+        if type(event) is StopEvent:
+            self._running = False
+        elif type(event) is ConfigChangedEvent:
+            self._config_changed(event)
+        elif type(event) is PlaylistSyncEvent:
+            if not self._playlist_synced:
+                self._request_sync()
+        else:
+            self._ctxt.lcd.priority = display_priority(event)
             try:
-                event = self._event_queue.get()
-                self.logger.info("Got event %s", event)
                 self._state.handle_event(event)
-                self._event_queue.task_done()
-            except BaseException:
-                self.logger.error("Stopped")
-                self.logger.error(traceback.format_exc())
-                self._wifi_thread.stop()
-                self._ctxt.lcd.backlight_enabled = False
-                self._ctxt.lcd.clear()
-                self._ctxt.power_button.clear()
-                self._ctxt.station_button.clear()
-                self._ctxt.volume_button.clear()
-                GPIO.setup(self._rsc.mute_gpio, GPIO.OUT, initial=GPIO.HIGH)
-                GPIO.setup(self._rsc.mute_gpio, GPIO.IN)
-                GPIO.cleanup()
-                self._on_state.cleanup()
-                self._off_state.cleanup()
-                stopped = True
+            finally:
+                self._ctxt.lcd.priority = DisplayPriority.USER
+        self._event_queue.task_done()
+        event.handled = time.monotonic()
+        latency = event.handled - event.timestamp
+        self.latencies.append(latency)
+        self.logger.debug("Event handled in %.1f ms", latency * 1000)
+
+    def _cleanup(self):
+        if self.latencies:
+            ordered = sorted(self.latencies)
+            self.logger.info("Event latency : median %.1f ms, max %.1f ms",
+                             ordered[len(ordered) // 2] * 1000, ordered[-1] * 1000)
+        self.logger.info("Event queue statistics : %s", self._event_queue.stats)
+        self.logger.info("Lcd statistics : %s", self._ctxt.lcd.stats)
+        self._wifi_thread.stop()
+        self._ctxt.lcd.backlight_enabled = False
+        self._ctxt.lcd.clear()
+        self._ctxt.power_button.clear()
+        self._ctxt.station_button.clear()
+        self._ctxt.volume_button.clear()
+        self._soundcard.cleanup()
+        self._hardware.gpio.cleanup()
+        # the pending mpd and D-Bus calls are done before the states are cleaned
+        self._caller.stop()
+        for state in self._states.values():
+            state.cleanup()
+        self._config_task.cancel()
+        self._scheduler.stop()
+        self._ctxt.lcd.stop()
+        self._ctxt.lcd.join()
+        self._volume_applier.stop()
+        self._mpd.close()
+        self._hardware.close()
+        if self._loop is not None:
+            tasks = asyncio.all_tasks(self._loop)
+            for task in tasks:
+                task.cancel()
+            self._loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+            self._loop.close()
 
 
 if __name__ == "__main__":
@@ -245,6 +483,10 @@ if __name__ == "__main__":
                             default="info")
     arg_parser.add_argument("-lf", "--logfile",
                             help="define the logfile, console if none")
+    arg_parser.add_argument("--asyncio", action="store_true",
+                            help="run the radio on an asyncio event loop")
+    arg_parser.add_argument("--profile-startup", action="store_true",
+                            help="print the duration of the initialisation phases")
     # TODO : check how to use the logfile argument
     args = arg_parser.parse_args()
 
@@ -260,5 +502,6 @@ if __name__ == "__main__":
 
     logging.info("Arguments : %s", args)
 
-    radio = MamemasRadio(args.config)
+    profiler = StartupProfiler(enabled=args.profile_startup)
+    radio = MamemasRadio(args.config, use_asyncio=args.asyncio, profiler=profiler)
     radio.start()
@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Client of the mpd protocol, on a persistent connection
+"""
+
+import socket
+import select
+import logging
+from threading import RLock
+
+# The commands giving the same result when mpd executes them twice : they
+# are sent again when their answer is lost
+RETRY_SAFE_COMMANDS = frozenset(["status", "currentsong", "playlistinfo", "ping",
+                                 "play", "stop", "pause", "setvol", "clear",
+                                 "command_list_begin", "command_list_end"])
+
+class MpdError(Exception):
+    """ Raised when mpd answers a command with an ACK line
+    """
+    def __init__(self, ack_line):
+        Exception.__init__(self, ack_line)
+        self.ack_line = ack_line
+
+
+class MpdClient:
+    """ A small client for the mpd text protocol.
+
+        A single connection is kept open for the whole life of the radio,
+        instead of forking a 'mpc' process for each command.
+        The connection is opened at the first command and reopened
+        transparently if mpd closed it (timeout, restart of the daemon...).
+        All the commands are serialized with a lock, so the client may be
+        shared between the states and the threads of the radio.
+
+        If host starts with a '/', it is used as the path of a unix socket.
+
+        Usage :
+            mpd = MpdClient("localhost", 6600)
+            mpd.play(0)
+            print(mpd.currentsong().get("Title"))
+    """
+
+    def __init__(self, host="localhost", port=6600, timeout=10):
+        self.logger = logging.getLogger(type(self).__name__)
+        self._host = host
+        self._port = port
+        self._timeout = timeout
+        self._sock = None
+        self._file = None
+        self._lock = RLock()
+        self._idle_pending = False
+        self.mpd_version = ""
+
+    def clone(self):
+        """ Returns a new client, with its own connection to the same mpd.
+            A dedicated client is needed to wait for idle notifications
+        """
+        return MpdClient(self._host, self._port, self._timeout)
+
+    def connect(self):
+        """ Opens the connection to mpd, if not already done
+        """
+        with self._lock:
+            if self._sock is not None:
+                return
+            if self._host.startswith("/"):
+                sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                address = self._host
+            else:
+                sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                address = (self._host, self._port)
+            sock.settimeout(self._timeout)
+            try:
+                sock.connect(address)
+            except OSError:
+                sock.close()
+                raise
+            self._sock = sock
+            self._file = sock.makefile("rb")
+            greeting = self._read_line()
+            if not greeting.startswith("OK MPD "):
+                self.close()
+                raise MpdError("Unexpected greeting : {}".format(greeting))
+            self.mpd_version = greeting[len("OK MPD "):]
+            self.logger.debug("Connected to mpd %s", self.mpd_version)
+
+    def close(self):
+        """ Closes the connection. It will be reopened by the next command
+        """
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            if self._sock is not None:
+                self._sock.close()
+                self._sock = None
+
+    def command(self, name, *args):
+        """ Sends a command and returns the answer as a list of (key, value)
+        """
+        return self.command_lines([_format_command(name, args)])
+
+    def command_list(self, commands):
+        """ Sends a batch of commands in a single round trip.
+            commands is a list of tuples (name, arg1, arg2...)
+        """
+        if not commands:
+            return []
+        lines = ["command_list_begin"]
+        lines.extend(_format_command(cmd[0], cmd[1:]) for cmd in commands)
+        lines.append("command_list_end")
+        return self.command_lines(lines)
+
+    def command_lines(self, lines):
+        """ Sends already formatted command lines and reads one answer.
+            The lines are sent again on a new connection if they could not
+            be written, or if they are all RETRY_SAFE_COMMANDS : the others
+            (add, delete, move...) may have been applied by mpd before the
+            connection was lost, and are not applied twice.
+        """
+        payload = "\n".join(lines)
+        with self._lock:
+            # mpd closes the connections that stay idle too long
+            if self._sock is not None and self._closed_by_mpd():
+                self.logger.info("Connection closed by mpd, reconnecting")
+                self.close()
+            written = False
+            try:
+                self.connect()
+                self._write(payload)
+                written = True
+                return self._read_answer()
+            except (OSError, EOFError) as error:
+                self.close()
+                if written and not _retry_safe(lines):
+                    raise
+                self.logger.info("Connection to mpd lost (%s), reconnecting", error)
+                self.connect()
+                self._write(payload)
+                return self._read_answer()
+
+    def play(self, position=None):
+        """ Plays the entry at the given position of the queue.
+            Be carefull, mpd positions start at 0, 'mpc play' ones start at 1
+        """
+        if position is None:
+            self.command("play")
+        else:
+            self.command("play", position)
+
+    def stop(self):
+        self.command("stop")
+
+    def clear(self):
+        self.command("clear")
+
+    def add(self, uri):
+        self.command("add", uri)
+
+    def setvol(self, volume):
+        self.command("setvol", int(volume))
+
+    def status(self):
+        return dict(self.command("status"))
+
+    def currentsong(self):
+        return dict(self.command("currentsong"))
+
+    def playlistinfo(self):
+        """ Returns the queue as a list of dicts, one per song
+        """
+        return _split_objects(self.command("playlistinfo"), "file")
+
+    def send_idle(self, *subsystems):
+        """ Asks mpd to notify the next change of the given subsystems
+            ('player', 'mixer'...). The answer is read with fetch_idle().
+            Once idle, the connection cannot be used for other commands :
+            the client shall be dedicated to the waiting thread.
+        """
+        with self._lock:
+            self.connect()
+            self._write(_format_command("idle", subsystems))
+            self._idle_pending = True
+
+    def fetch_idle(self):
+        """ Blocks until mpd notifies a change, or until noidle() is called.
+            Returns the list of the changed subsystems
+        """
+        with self._lock:
+            self._sock.settimeout(None)
+            try:
+                pairs = self._read_answer()
+            finally:
+                self._idle_pending = False
+                if self._sock is not None:
+                    self._sock.settimeout(self._timeout)
+        return [value for key, value in pairs if key == "changed"]
+
+    def idle(self, *subsystems):
+        self.send_idle(*subsystems)
+        return self.fetch_idle()
+
+    def noidle(self):
+        """ Wakes up the thread blocked in fetch_idle().
+            This is the only method that can be called from another thread
+            while the client is idle.
+        """
+        sock = self._sock
+        if self._idle_pending and sock is not None:
+            sock.sendall(b"noidle\n")
+
+    def _closed_by_mpd(self):
+        """ True if the connection was closed by mpd : outside of a
+            command, the socket has nothing to read until it is closed
+        """
+        try:
+            readable, _, _ = select.select([self._sock], [], [], 0)
+            return bool(readable) and not self._sock.recv(1, socket.MSG_PEEK)
+        except OSError:
+            return True
+
+    def _write(self, text):
+        self._sock.sendall((text + "\n").encode("utf-8"))
+
+    def _read_line(self):
+        line = self._file.readline()
+        if not line:
+            raise EOFError("Connection closed by mpd")
+        return line.decode("utf-8").rstrip("\n")
+
+    def _read_answer(self):
+        pairs = []
+        while True:
+            line = self._read_line()
+            if line == "OK":
+                return pairs
+            if line.startswith("ACK "):
+                raise MpdError(line)
+            key, sep, value = line.partition(": ")
+            if sep:
+                pairs.append((key, value))
+            elif line == "list_OK":
+                continue
+            else:
+                self.logger.warning("Unexpected line from mpd : %s", line)
+
+
+def _retry_safe(lines):
+    return all(line.split(" ", 1)[0] in RETRY_SAFE_COMMANDS for line in lines)
+
+
+def _quote(arg):
+    text = str(arg)
+    return '"' + text.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def _format_command(name, args):
+    return " ".join([name] + [_quote(arg) for arg in args])
+
+
+def _split_objects(pairs, first_key):
+    """ Splits a flat (key, value) answer into a list of dicts,
+        a new dict being started each time first_key is found
+    """
+    objects = []
+    for key, value in pairs:
+        if key == first_key or not objects:
+            objects.append({})
+        objects[-1][key] = value
+    return objects
+
+
+if __name__ == "__main__":
+    import time
+    import subprocess
+
+    client = MpdClient()
+    t0 = time.perf_counter()
+    for i in range(20):
+        client.status()
+    t1 = time.perf_counter()
+    for i in range(20):
+        subprocess.call(["mpc", "volume"], stdout=subprocess.DEVNULL)
+    t2 = time.perf_counter()
+    print("MpdClient status : {:.2f} ms".format((t1 - t0) / 20 * 1000))
+    print("mpc volume       : {:.2f} ms".format((t2 - t1) / 20 * 1000))
@@ -6,19 +6,17 @@ Created on Sat Apr 18 17:28:02 2020
 @author: Sebastien Roy
 """
 #import random
-import subprocess
 import os.path
 import os
 import re
 from shutil import copyfile
 import logging
 
-import RPi.GPIO as GPIO
-
 from radiostate import RadioState
 from essidstate import EssidState, PasswdState
 from sleepstate import SleepState
 from resources import Resources
+from mpdclient import MpdError
 
 class OffState(RadioState):
     """ This class defines the behaviour of the off state
@@ -37,16 +35,19 @@ class OffState(RadioState):
     def enter_state(self):
         self.logger.debug("Entering state")
         self._ctxt.power_button.led = False
-        proc = subprocess.Popen(["mpc", "stop"], stdout=subprocess.PIPE, universal_newlines=True)
-        out, err = proc.communicate()
+        self._ctxt.caller.call(self._stop_mpd)
         # switch off the soundcard
-        mute_gpio = self._ctxt.rsc.mute_gpio
-        if mute_gpio != 0:
-            GPIO.output(mute_gpio, GPIO.LOW)
+        self._ctxt.soundcard.enabled = False
 
         self._sub_state = self._sleep_state
         self._sub_state.enter_state()
 
+    def _stop_mpd(self):
+        try:
+            self._ctxt.mpd.stop()
+        except (OSError, EOFError, MpdError) as error:
+            self.logger.error("Cannot stop mpd : %s", error)
+
     def switch_radio(self, state):
         self._owner.switch_radio(state)
 
@@ -85,7 +86,7 @@ class OffState(RadioState):
         lcd.write_string(reboot)
         # The reboot shall be written in the config file
         reboot_cmd = self._ctxt.rsc.wifi_post_validate
-        subprocess.call(reboot_cmd.split(" "))
+        self._ctxt.caller.call(self._ctxt.hardware.processes.call, reboot_cmd.split(" "))
 
     def cleanup(self):
         self.logger.debug("deleting off state")
@@ -7,16 +7,14 @@ Created on Mon Sep 17 20:02:03 2018
 """
 
 import random
-import subprocess
 import logging
 
-import RPi.GPIO as GPIO
-
 from playingstate import PlayingState
 from choosestationstate import ChooseStationState
 from volumestate import VolumeState
 from powerbutton import PowerEvent
 from radiostate import RadioState
+from mpdclient import MpdError
 from radioevents import ChooseTimeoutEvent, PowerButtonEvent, VolumeButtonEvent, VolumeTimeoutEvent
 
 
@@ -31,9 +29,11 @@ class OnState(RadioState):
         self._choosing_state = ChooseStationState(self._ctxt, self)
         self._volume_state = VolumeState(self._ctxt, self)
         self._sub_state = None
+        self._active = False
 
     def enter_state(self):
         self.logger.debug("Entering state")
+        self._active = True
         random_msg = self._ctxt.rsc.today_msg
         if not random_msg:
             random_msg = random.choice(self._ctxt.rsc.random_msgs)
@@ -46,16 +46,15 @@ class OnState(RadioState):
         self._ctxt.wifi_thread.resume()
 
         # switch on the soundcard
-        mute_gpio = self._ctxt.rsc.mute_gpio
-        if mute_gpio != 0:
-            GPIO.output(mute_gpio, GPIO.HIGH)
+        self._ctxt.soundcard.enabled = True
 
-        subprocess.call(["mpc", "play", str(self._track_nb)])
+        self._play()
 
         self._sub_state.enter_state()
 
     def leave_state(self):
         self.logger.debug("Leaving state")
+        self._active = False
         self._ctxt.wifi_thread.pause()
         self._sub_state.leave_state()
 
@@ -81,7 +80,7 @@ class OnState(RadioState):
         if self._sub_state == self._volume_state:
             self._sub_state.handle_event(event)
         else:
-            self._volume_state.increment(event.value)
+            self._volume_state.increment(event.steps)
             self._sub_state.leave_state()
             self._sub_state = self._volume_state
             self._sub_state.enter_state()
@@ -91,20 +90,47 @@ class OnState(RadioState):
         """
         self._sub_state.leave_state()
         if status:
-            if track_nb < 1:
-                track_nb = len(self._ctxt.rsc.playlist)
-            elif track_nb > len(self._ctxt.rsc.playlist):
-                track_nb = 1
+            track_nb = (track_nb - 1) % len(self._ctxt.rsc.playlist) + 1
             self._choosing_state.target_nb = track_nb
             self._sub_state = self._choosing_state
         else:
             if track_nb != 0:
                 self._track_nb = track_nb
                 self._playing_state.track_nb = track_nb
-                subprocess.call(["mpc", "play", str(self._track_nb)])
+                self._play()
             self._sub_state = self._playing_state
         self._sub_state.enter_state()
 
+    def _play(self):
+        # mpd positions start at 0
+        self._ctxt.caller.call(self._send_play, self._track_nb - 1)
+
+    def _send_play(self, position):
+        """ Plays the station at the given position. The radio keeps running
+            when mpd cannot be reached
+        """
+        try:
+            self._ctxt.mpd.play(position)
+        except (OSError, EOFError, MpdError) as error:
+            self.logger.error("Cannot play station %s : %s", position + 1, error)
+
+    def config_changed(self, previous):
+        """ Keeps the same station selected if it is still in the playlist
+        """
+        urls = [url for name, url in self._ctxt.rsc.playlist]
+        old_url = None
+        if self._track_nb <= len(previous.playlist):
+            name, old_url = previous.playlist[self._track_nb - 1]
+        if old_url in urls:
+            self._track_nb = urls.index(old_url) + 1
+        else:
+            self._track_nb = 1
+            if self._active and urls:
+                # the station played was removed
+                self._play()
+        self._playing_state.track_nb = self._track_nb
+        self._playing_state.config_changed(previous)
+
     def cleanup(self):
         self._playing_state.cleanup()
         self._choosing_state.cleanup()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Supervision of the bluealsa-aplay process
+"""
+
+from threading import Thread, Event, Lock
+from enum import Enum
+import subprocess
+import time
+import logging
+
+# The player of the bluetooth audio streams, for all the devices
+BLUEALSA_APLAY = ["bluealsa-aplay", "00:00:00:00:00:00"]
+# Delay before restarting a player which stopped, doubled at each failure
+MIN_BACKOFF = 1
+MAX_BACKOFF = 30
+# A player running for this time is considered healthy : the delay
+# before its next restart is reset
+STABLE_TIME = 10
+
+
+class PlayerStatus(Enum):
+    STARTED = 0
+    DIED = 1
+    SPAWN_FAILED = 2
+
+
+class PlayerSupervisor(Thread):
+    """ A thread keeping a player process running, so that it is started
+        once and not for each use.
+
+        When the process stops, or cannot be started, it is restarted
+        after a delay, from MIN_BACKOFF doubled at each consecutive failure
+        up to MAX_BACKOFF.
+        The callback is called with (supervisor, PlayerStatus) at each
+        start and each failure, from the thread of the supervisor.
+
+        processes is the subprocess module, or a simulation of it.
+    """
+
+    def __init__(self, processes, command=BLUEALSA_APLAY, callback=None,
+                 min_backoff=MIN_BACKOFF, max_backoff=MAX_BACKOFF, stable_time=STABLE_TIME):
+        Thread.__init__(self, name="PlayerSupervisor", daemon=True)
+        self.logger = logging.getLogger(type(self).__name__)
+        self._processes = processes
+        self._command = list(command)
+        self._callback = callback
+        self._min_backoff = min_backoff
+        self._max_backoff = max_backoff
+        self._stable_time = stable_time
+        self._lock = Lock()
+        self._stopping = Event()
+        self._process = None
+        self.start_count = 0
+
+    def stop(self):
+        """ Stops the supervision and kills the player
+        """
+        with self._lock:
+            self._stopping.set()
+            process = self._process
+        if process is not None and process.poll() is None:
+            process.kill()
+
+    def run(self):
+        backoff = self._min_backoff
+        while True:
+            with self._lock:
+                if self._stopping.is_set():
+                    break
+                try:
+                    self._process = self._processes.Popen(self._command)
+                except OSError as error:
+                    self._process = None
+                    self.logger.error("Cannot start %s : %s", self._command[0], error)
+                    status = PlayerStatus.SPAWN_FAILED
+                else:
+                    self.start_count += 1
+                    status = PlayerStatus.STARTED
+                process = self._process
+            self._notify(status)
+            if process is not None:
+                start = time.monotonic()
+                returncode = process.wait()
+                if self._stopping.is_set():
+                    break
+                self.logger.warning("%s stopped with code %s", self._command[0], returncode)
+                self._notify(PlayerStatus.DIED)
+                if time.monotonic() - start >= self._stable_time:
+                    backoff = self._min_backoff
+            self._stopping.wait(backoff)
+            backoff = min(backoff * 2, self._max_backoff)
+        self._process = None
+        self.logger.debug("Player supervisor stopped")
+
+    def _notify(self, status):
+        if self._callback is not None:
+            self._callback(self, status)
+
+    def _is_running(self):
+        with self._lock:
+            return self._process is not None and self._process.poll() is None
+
+    running = property(fget=_is_running)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.DEBUG)
+    supervisor = PlayerSupervisor(subprocess,
+                                  callback=lambda originator, status: print(status))
+    supervisor.start()
+    input("Press enter to stop...")
+    supervisor.stop()
+    supervisor.join()
@@ -5,9 +5,7 @@ Created on Sat Sep 15 14:59:22 2018
 
 @author: Sebastien Roy
 """
-from RPLCD.i2c import CharLCD
 from resources import Resources
-import subprocess
 import logging
 import datetime
 
@@ -15,6 +13,7 @@ from radioevents import WifiEvent, TextUpdateEvent, TextFieldType, StationButton
 from encoder import EncoderEvent
 from scrollingtext import ScrollingText
 from radiostate import RadioState
+from trackwatcher import TrackWatcher
 
 class PlayingState(RadioState):
     """ This class defines the behaviour of the webradio when it is
@@ -30,29 +29,37 @@ class PlayingState(RadioState):
         self._rsc = ctxt.rsc
         self._wifi_level = 0
         self.random_msg = ""
+        self._track_watcher = None
         self._random_msg_display = ScrollingText(self._random_msg, self._random_msg_callback,
                                            display_size=20, refresh_rate=0,
                                            scroll_begin_delay=self._rsc.scroll_begin,
                                            scroll_end_delay=self._rsc.scroll_end,
-                                           scroll_rate=self._rsc.scroll_rate)
+                                           scroll_rate=self._rsc.scroll_rate,
+                                           scheduler=ctxt.scheduler)
         self._random_msg_display.pause()
         self._random_msg_display.start()
-        # The name of the radio is not updated automatically when setting refresh_rate = 0
+        # The name of the radio is refreshed by the track watcher, no need of refresh_rate
         self._name_display = ScrollingText(self._radio_name, self._radio_name_callback,
                                            display_size=20, refresh_rate=0,
                                            scroll_begin_delay=self._rsc.scroll_begin,
                                            scroll_end_delay=self._rsc.scroll_end,
-                                           scroll_rate=self._rsc.scroll_rate)
+                                           scroll_rate=self._rsc.scroll_rate,
+                                           scheduler=ctxt.scheduler)
         self._name_display.pause()
         self._name_display.start()
-        # The title of the track is updated automatically every 5 seconds
+        # The title is refreshed every second only for the clock displayed when
+        # there is no title. The title itself is cached by the track watcher
         self._title_display = ScrollingText(self._track_title, self._track_title_callback,
                                             display_size=20, refresh_rate=1,
                                            scroll_begin_delay=self._rsc.scroll_begin,
                                            scroll_end_delay=self._rsc.scroll_end,
-                                           scroll_rate=self._rsc.scroll_rate)
+                                           scroll_rate=self._rsc.scroll_rate,
+                                           scheduler=ctxt.scheduler)
         self._title_display.pause()
         self._title_display.start()
+        # The name and the title are pushed by mpd when they change
+        self._track_watcher = TrackWatcher(ctxt.mpd.clone(), self._song_changed)
+        self._track_watcher.start()
 
     def enter_state(self):
         self.logger.debug("Entering state")
@@ -97,23 +104,23 @@ class PlayingState(RadioState):
     def _random_msg(self):
         return self.random_msg
 
+    def config_changed(self, previous):
+        # the name of the station may have changed
+        self._name_display.refresh()
+
+    def _song_changed(self, originator, song):
+        self._name_display.refresh()
+        self._title_display.refresh()
+
     def _radio_name(self):
-        self.logger.debug("Radio name computation")
-        proc = subprocess.Popen(["mpc", "--format=%name%", "current"],
-                                stdout=subprocess.PIPE, universal_newlines=True)
-        out, err = proc.communicate()
-        self.logger.debug("Out = %s",out)
-        if out.strip():
-            name = out.strip()
-        else:
+        name = self._track_watcher.radio_name if self._track_watcher is not None else ""
+        self.logger.debug("Radio name = %s", name)
+        if not name:
             name, url = self._rsc.playlist[self.track_nb - 1]
         return name
 
     def _track_title(self):
-        proc = subprocess.Popen(["mpc", "--format=%title%", "current"],
-                                stdout=subprocess.PIPE, universal_newlines=True)
-        out, err = proc.communicate()
-        title = out.strip()
+        title = self._track_watcher.title if self._track_watcher is not None else ""
         if len(title) > 0:
             return title
         else:
@@ -140,10 +147,8 @@ class PlayingState(RadioState):
             self._lcd.write_string(event.value.ljust(20))
         elif type(event) is StationButtonEvent:
             self.logger.debug("Event received : %s", event)
-            if event.value == EncoderEvent.CW_ROTATION:
-                self._owner.enter_choosing(True, self.track_nb + 1)
-            elif event.value == EncoderEvent.CCW_ROTATION:
-                self._owner.enter_choosing(True, self.track_nb - 1)
+            if event.value in (EncoderEvent.CW_ROTATION, EncoderEvent.CCW_ROTATION):
+                self._owner.enter_choosing(True, self.track_nb + event.steps)
         return
 
     def cleanup(self):
@@ -151,9 +156,11 @@ class PlayingState(RadioState):
         self._random_msg_display.stop()
         self._name_display.stop()
         self._title_display.stop()
+        self._track_watcher.stop()
 
 
 if __name__ == "__main__":
+    from RPLCD.i2c import CharLCD
     # Resourcecs initialization
     rsc = Resources("/home/pi/python/webradio/conf.txt")
     # lcd initialization
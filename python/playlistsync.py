@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Synchronisation of the mpd queue with the playlist of the configuration
+"""
+
+from collections import Counter
+import logging
+
+
+def _common_subsequence(current, target):
+    """ Returns the positions in current of a longest common subsequence
+        of current and target. The playlists are short : the classic
+        quadratic algorithm is fine.
+    """
+    lengths = [[0] * (len(target) + 1) for i in range(len(current) + 1)]
+    for i in range(len(current) - 1, -1, -1):
+        for j in range(len(target) - 1, -1, -1):
+            if current[i] == target[j]:
+                lengths[i][j] = lengths[i + 1][j + 1] + 1
+            else:
+                lengths[i][j] = max(lengths[i + 1][j], lengths[i][j + 1])
+    positions = set()
+    i = j = 0
+    while i < len(current) and j < len(target):
+        if current[i] == target[j]:
+            positions.add(i)
+            i += 1
+            j += 1
+        elif lengths[i + 1][j] >= lengths[i][j + 1]:
+            i += 1
+        else:
+            j += 1
+    return positions
+
+
+def playlist_commands(current, target):
+    """ Returns the mpd commands (delete, move, addid) changing the queue
+        holding the current uris into the target uris.
+
+        The entries that are in both lists and in the same order are not
+        touched, so that mpd keeps playing the current station when the
+        playlist is edited around it. The entries that only changed of
+        place are moved, not deleted and added again.
+    """
+    kept = _common_subsequence(current, target)
+    missing = Counter(target) - Counter(current[i] for i in kept)
+    commands = []
+    working = list(current)
+    # from the end, so that the positions of the next ones stay valid
+    for pos in range(len(current) - 1, -1, -1):
+        if pos in kept:
+            continue
+        uri = current[pos]
+        if missing[uri] > 0:
+            # still needed, at another place
+            missing[uri] -= 1
+        else:
+            commands.append(("delete", pos))
+            del working[pos]
+    for pos, uri in enumerate(target):
+        if pos < len(working) and working[pos] == uri:
+            continue
+        try:
+            source = working.index(uri, pos + 1)
+        except ValueError:
+            commands.append(("addid", uri, pos))
+            working.insert(pos, uri)
+        else:
+            commands.append(("move", source, pos))
+            working.insert(pos, working.pop(source))
+    return commands
+
+
+def sync_playlist(mpd, uris):
+    """ Makes the queue of mpd hold the given uris, in one round trip
+        for the reading and one for the changes.
+        Returns the list of the commands sent.
+    """
+    current = [song.get("file", "") for song in mpd.playlistinfo()]
+    commands = playlist_commands(current, list(uris))
+    if commands:
+        logging.getLogger(__name__).info("Playlist synchronisation : %s", commands)
+        mpd.command_list(commands)
+    return commands
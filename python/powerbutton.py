@@ -7,7 +7,6 @@ Created on Tue Sep 18 20:42:50 2018
 """
 
 from enum import Enum
-import RPi.GPIO as GPIO
 import time
 
 class PowerEvent(Enum) :
@@ -15,16 +14,19 @@ class PowerEvent(Enum) :
     SWITCH_RELEASED = 1
 
 class PowerButton:
-    def __init__(self, switch_pin, led_pin, callback):
+    def __init__(self, gpio, switch_pin, led_pin, callback):
+        """ gpio is the RPi.GPIO module, or a simulation of it
+        """
+        self._gpio = gpio
         self._switch_pin = switch_pin
         self._led_pin = led_pin
         self._callback = callback
 
-        GPIO.setmode(GPIO.BCM)
-        GPIO.setup(self._switch_pin, GPIO.IN, pull_up_down=GPIO.PUD_UP)
-        GPIO.setup(self._led_pin, GPIO.OUT, initial=GPIO.LOW)
+        self._gpio.setmode(self._gpio.BCM)
+        self._gpio.setup(self._switch_pin, self._gpio.IN, pull_up_down=self._gpio.PUD_UP)
+        self._gpio.setup(self._led_pin, self._gpio.OUT, initial=self._gpio.LOW)
 
-        GPIO.add_event_detect(self._switch_pin, GPIO.BOTH, callback=self._switch_callback, bouncetime=50)
+        self._gpio.add_event_detect(self._switch_pin, self._gpio.BOTH, callback=self._switch_callback, bouncetime=50)
         return
 
     def _set_callback(self, callback):
@@ -33,20 +35,20 @@ class PowerButton:
 
     def _switch_callback(self, pin):
         time.sleep(0.01) # let edge time to complete before reading value
-        event = PowerEvent.SWITCH_PRESSED if GPIO.input(self._switch_pin) == 0 else PowerEvent.SWITCH_RELEASED
+        event = PowerEvent.SWITCH_PRESSED if self._gpio.input(self._switch_pin) == 0 else PowerEvent.SWITCH_RELEASED
         if self._callback is not None:
             self._callback(self, event)
 
     def __del__(self):
-        GPIO.remove_event_detect(self._switch_pin)
+        self._gpio.remove_event_detect(self._switch_pin)
 
     def clear(self):
-        GPIO.remove_event_detect(self._switch_pin)
+        self._gpio.remove_event_detect(self._switch_pin)
 
 
     def _set_led(self, value):
-        state = GPIO.HIGH if value else GPIO.LOW
-        GPIO.output(self._led_pin, state)
+        state = self._gpio.HIGH if value else self._gpio.LOW
+        self._gpio.output(self._led_pin, state)
 
     led = property(fset=_set_led)
     callback = property(fset=_set_callback)
@@ -61,10 +63,12 @@ def my_test_callback(originator, event):
         originator.led = status
 
 if __name__ == "__main__":
+    from hardware import RaspberryHardware
     status = False
-    button = PowerButton(25, 26, my_test_callback)
+    gpio = RaspberryHardware().gpio
+    button = PowerButton(gpio, 25, 26, my_test_callback)
     print("Clickez sur le power button")
     input("Appuyez sur entree pour quitter")
     del button
-    GPIO.cleanup()
+    gpio.cleanup()
 
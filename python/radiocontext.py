@@ -9,10 +9,15 @@ Created on Mon Sep 17 20:07:30 2018
 
 class RadioContext:
     """ This class holds all the context elements needed by the radio soft :
-        lcd, resources, etc
+        lcd, resources, mpd client, etc
+        The hardware gives the gpio and the processes used by the states,
+        either the real ones or simulated ones
+        The blocking calls of the states (mpd, processes, D-Bus) are made
+        through the caller, which keeps them out of the asyncio event loop
         """
     def __init__(self, rsc, lcd, power_button, station_button, volume_button, wifi_thread,
-                 event_queue):
+                 event_queue, mpd, scheduler, volume_applier, scan_cache,
+                 hardware, soundcard, caller):
         self.rsc = rsc
         self.lcd = lcd
         self.power_button = power_button
@@ -20,6 +25,13 @@ class RadioContext:
         self.station_button =station_button
         self.wifi_thread = wifi_thread
         self.event_queue = event_queue
+        self.mpd = mpd
+        self.scheduler = scheduler
+        self.volume_applier = volume_applier
+        self.scan_cache = scan_cache
+        self.hardware = hardware
+        self.soundcard = soundcard
+        self.caller = caller
         return
 
 
@@ -7,11 +7,16 @@ Created on Sun Sep 16 19:16:11 2018
 """
 
 from enum import Enum
+import time
 
 class RadioEvent:
     def __init__(self, value = None, originator = None):
         self.value = value
         self.originator = originator
+        # used to mesure the latency of the event handling
+        self.timestamp = time.monotonic()
+        # set when the event loop has handled the event
+        self.handled = None
 
     def __repr__(self):
         return "RadioEvent: Value={} Originator={}".format(self.value, self.originator)
@@ -25,12 +30,22 @@ class WifiEvent(RadioEvent):
     def __repr__(self):
         return "WifiEvent: Value={}".format(self.value)
 
+class WifiScanEvent(RadioEvent):
+    # The value is the list of the WifiCell found by the last full scan
+    def __init__(self, value):
+        RadioEvent.__init__(self, value=value)
+
+    def __repr__(self):
+        return "WifiScanEvent: {} cells".format(len(self.value))
+
 class TextFieldType(Enum):
     RANDOM_MSG = 1
     RADIO_NAME = 2
     TRACK_TITLE = 3
     SLEEP_CLOCK = 4
     BT_CLOCK = 5
+    BT_DEVICE = 6
+    BT_TRACK = 7
 
 class TextUpdateEvent(RadioEvent):
     def __init__(self, value, text_field):
@@ -42,20 +57,48 @@ class TextUpdateEvent(RadioEvent):
 class StationButtonEvent(RadioEvent):
     # In StationButtonEvent, no need of the originator.
     #   because there is only one Station button
-    def __init__(self, value):
+    # For the rotations, steps is the signed number of steps (positive clockwise)
+    def __init__(self, value, steps=0):
         RadioEvent.__init__(self, value=value)
+        self.steps = steps
 
     def __repr__(self):
-        return "StationButtonEvent: value = {}".format(self.value)
+        return "StationButtonEvent: value = {}, steps = {}".format(self.value, self.steps)
 
 class VolumeButtonEvent(RadioEvent):
     # In StationButtonEvent, no need of the originator.
     #   because there is only one Station button
+    def __init__(self, value, steps=0):
+        RadioEvent.__init__(self, value=value)
+        self.steps = steps
+
+    def __repr__(self):
+        return "VolumeButtonEvent: value = {}, steps = {}".format(self.value, self.steps)
+
+class BluetoothDeviceEvent(RadioEvent):
+    # The value is True when the device connects, False when it disconnects
+    # The originator is the name of the device
+    def __init__(self, value, name):
+        RadioEvent.__init__(self, value=value, originator=name)
+
+    def __repr__(self):
+        return "BluetoothDeviceEvent: {} connected={}".format(self.originator, self.value)
+
+class PlayerStatusEvent(RadioEvent):
+    # The value is the PlayerStatus reported by the player supervisor
     def __init__(self, value):
         RadioEvent.__init__(self, value=value)
 
     def __repr__(self):
-        return "VolumeButtonEvent: value = {}".format(self.value)
+        return "PlayerStatusEvent: {}".format(self.value)
+
+class StopEvent(RadioEvent):
+    # Ends the event loop of the radio
+    def __init__(self):
+        RadioEvent.__init__(self)
+
+    def __repr__(self):
+        return "StopEvent"
 
 class PowerButtonEvent(RadioEvent):
     # In StationButtonEvent, no need of the originator.
@@ -75,6 +118,20 @@ class VolumeTimeoutEvent(RadioEvent):
     def __init__(self):
         RadioEvent.__init__(self)
 
+class DiscoverableTimeoutEvent(RadioEvent):
+    def __init__(self):
+        RadioEvent.__init__(self)
+
+class ConfigChangedEvent(RadioEvent):
+    # The value is the ResourcesSnapshot before the reload
+    def __init__(self, previous):
+        RadioEvent.__init__(self, value=previous)
+
+class PlaylistSyncEvent(RadioEvent):
+    # The playlist could not be sent to mpd until now
+    def __init__(self):
+        RadioEvent.__init__(self)
+
 if __name__ == "__main__":
     event = TextUpdateEvent("Hello", TextFieldType.RADIO_NAME)
 
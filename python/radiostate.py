@@ -21,5 +21,11 @@ class RadioState:
     def handle_event(self, event):
         return
 
+    def config_changed(self, previous):
+        """ Called when the configuration file was reloaded, whether the state
+            is active or not. previous is the former ResourcesSnapshot
+        """
+        return
+
     def cleanup(self):
         return
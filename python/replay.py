@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Replays recorded sequences of button events into the radio running on the
+simulated hardware, and reports for each scenario the event handling
+latency, the bytes written to the lcd, the processes spawned and the
+number of threads :
+    python3 replay.py [-c configuration file] [scenario file ...]
+
+A scenario is a text with one event per line :
+    <time in seconds> <power|station|volume> <pressed|released|cw|ccw> [steps]
+The lines starting with # are comments.
+"""
+
+from threading import Thread
+import argparse
+import threading
+import time
+import math
+import logging
+
+from radioevents import PowerButtonEvent, StationButtonEvent, VolumeButtonEvent
+from powerbutton import PowerEvent
+from encoder import EncoderEvent
+from hardware import SimulatedHardware
+from mamemasradio import MamemasRadio
+
+# Time given to the radio to handle the last events of a scenario, in seconds
+SETTLE_TIME = 1.0
+STARTUP_TIMEOUT = 10
+
+_BUTTONS = {"power": PowerButtonEvent,
+            "station": StationButtonEvent,
+            "volume": VolumeButtonEvent}
+
+SCENARIOS = {
+    "power on": """
+        0.0 power pressed
+        0.1 power released
+        """,
+    "station surf": """
+        0.0 power pressed
+        0.1 power released
+        1.0 station cw
+        1.3 station cw
+        1.5 station cw 2
+        1.7 station ccw
+        2.0 station pressed
+        2.1 station released
+        """,
+    "volume spin": """
+        0.0 power pressed
+        0.1 power released
+        1.0 volume cw
+        1.05 volume cw 2
+        1.1 volume cw 4
+        1.15 volume cw 4
+        1.5 volume ccw 3
+        1.55 volume ccw 4
+        1.6 volume ccw
+        """,
+    "bluetooth blink": """
+        0.0 station pressed
+        0.1 station released
+        1.0 station pressed
+        1.1 station released
+        3.2 station pressed
+        3.3 station released
+        """,
+    }
+
+
+def parse_scenario(text):
+    """ Returns the list of the (time, event class, value, steps) described
+        by the text of a scenario, ordered by time.
+        Raises ValueError if a line is malformed
+    """
+    entries = []
+    for line in text.split("\n"):
+        fields = line.split()
+        if not fields or fields[0].startswith("#"):
+            continue
+        if len(fields) not in (3, 4) or fields[1] not in _BUTTONS:
+            raise ValueError("Malformed scenario line : {}".format(line.strip()))
+        offset = float(fields[0])
+        event_class = _BUTTONS[fields[1]]
+        action = fields[2]
+        steps = int(fields[3]) if len(fields) == 4 else 1
+        if action in ("pressed", "released"):
+            if event_class is PowerButtonEvent:
+                value = PowerEvent.SWITCH_PRESSED if action == "pressed" \
+                    else PowerEvent.SWITCH_RELEASED
+            else:
+                value = EncoderEvent.SWITCH_PRESSED if action == "pressed" \
+                    else EncoderEvent.SWITCH_RELEASED
+            steps = 0
+        elif action in ("cw", "ccw") and event_class is not PowerButtonEvent:
+            value = EncoderEvent.CW_ROTATION if action == "cw" else EncoderEvent.CCW_ROTATION
+            steps = steps if action == "cw" else -steps
+        else:
+            raise ValueError("Malformed scenario line : {}".format(line.strip()))
+        entries.append((offset, event_class, value, steps))
+    entries.sort(key=lambda entry: entry[0])
+    return entries
+
+
+def _create_event(event_class, value, steps):
+    if event_class is PowerButtonEvent:
+        return PowerButtonEvent(value)
+    return event_class(value, steps)
+
+
+def percentile(values, ratio):
+    """ Returns the value at the given ratio (0.5 for the median) of the
+        values, by the nearest rank method. None if there is no value
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(ratio * len(ordered)))
+    return ordered[rank - 1]
+
+
+def replay(conf_path, entries, settle_time=SETTLE_TIME):
+    """ Starts a radio on a new simulated hardware, replays the entries
+        of a scenario at their time, and returns the measures in a
+        dictionary :
+            latency_p50, latency_p99 : delay between the queuing of the
+                events replayed and the end of their handling, in seconds
+            display_p50, display_p99 : delay between the queuing of the
+                events and the end of the sending of the last display
+                command of their handling, in seconds
+            display_queue_depth : the highest number of pending display
+                commands
+            lcd_bytes : bytes sent on the i2c bus during the scenario
+            spawns : processes spawned during the scenario
+            threads : threads running at the end of the scenario
+    """
+    hardware = SimulatedHardware()
+    radio = MamemasRadio(conf_path, hardware=hardware)
+    thread = Thread(target=radio.start, name="Radio")
+    thread.start()
+    try:
+        if not radio.wait_started(STARTUP_TIMEOUT):
+            raise RuntimeError("The radio did not start")
+        recorder = hardware.recorder
+        start = time.monotonic()
+        events = []
+        for offset, event_class, value, steps in entries:
+            delay = start + offset - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            event = _create_event(event_class, value, steps)
+            events.append(event)
+            radio.post_event(event)
+        time.sleep(settle_time)
+        threads = threading.active_count()
+        display_stats = radio.display.stats
+        commands = list(radio.display.history)
+    finally:
+        radio.stop()
+        thread.join()
+
+    latencies = []
+    display_latencies = []
+    lcd_records = recorder.records("i2c", since=start)
+    for event in events:
+        if event.handled is None:
+            continue
+        latencies.append(event.handled - event.timestamp)
+        # the display commands are sent by the display worker, after the
+        # handling of the event
+        writes = [command.done for command in commands
+                  if event.timestamp <= command.queued <= event.handled]
+        if writes:
+            display_latencies.append(max(writes) - event.timestamp)
+    return {"events": len(events),
+            "handled": len(latencies),
+            "latency_p50": percentile(latencies, 0.5),
+            "latency_p99": percentile(latencies, 0.99),
+            "display_p50": percentile(display_latencies, 0.5),
+            "display_p99": percentile(display_latencies, 0.99),
+            "display_queue_depth": display_stats["max_queue_depth"],
+            "lcd_bytes": sum(record.size for record in lcd_records),
+            "spawns": recorder.count("process", since=start),
+            "threads": threads}
+
+
+def _ms(value):
+    return "{:8.2f}".format(value * 1000) if value is not None else "       -"
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument("-c", "--config",
+                            help="pathname of configuration file",
+                            default="webradio.cfg")
+    arg_parser.add_argument("scenarios", nargs="*",
+                            help="scenario files, the built-in scenarios if none")
+    args = arg_parser.parse_args()
+    logging.basicConfig(level=logging.ERROR)
+
+    if args.scenarios:
+        scenarios = {}
+        for path in args.scenarios:
+            with open(path) as scenario_file:
+                scenarios[path] = scenario_file.read()
+    else:
+        scenarios = SCENARIOS
+
+    print("{:20s} {:>6s} {:>8s} {:>8s} {:>8s} {:>8s} {:>9s} {:>5s} {:>6s} {:>7s}".format(
+          "scenario", "events", "p50 ms", "p99 ms", "lcd p50", "lcd p99",
+          "lcd bytes", "queue", "spawns", "threads"))
+    for name, text in scenarios.items():
+        result = replay(args.config, parse_scenario(text))
+        print("{:20s} {:6d} {} {} {} {} {:9d} {:5d} {:6d} {:7d}".format(
+              name[:20], result["events"],
+              _ms(result["latency_p50"]), _ms(result["latency_p99"]),
+              _ms(result["display_p50"]), _ms(result["display_p99"]),
+              result["lcd_bytes"], result["display_queue_depth"],
+              result["spawns"], result["threads"]))
@@ -6,9 +6,101 @@ Created on Sat Sep 15 12:34:19 2018
 @author: Sebastien Roy
 """
 
+from types import MappingProxyType
 import configparser
 import datetime
 import logging
+import operator
+import os
+import random
+
+_MISSING = object()
+
+
+def _int_auto(value):
+    return int(value, 0)
+
+
+def _int_tuple(value):
+    return tuple(int(val.strip()) for val in value.split(","))
+
+
+def _parse_date(text):
+    """ Returns (day, month, year) from DD/MM or DD/MM/YYYY. year is None
+        for the dates of every year
+    """
+    fields = text.strip().split("/")
+    if len(fields) not in (2, 3):
+        raise ValueError("Invalid date : {}".format(text))
+    day, month = int(fields[0]), int(fields[1])
+    year = int(fields[2]) if len(fields) == 3 else None
+    # checks the date, with a leap year when it comes every year
+    datetime.date(2000 if year is None else year, month, day)
+    return day, month, year
+
+
+def _parse_dated_key(key):
+    """ Returns the (month, day, year) days given by a key of the dated
+        messages section. The key is a date (DD/MM, or DD/MM/YYYY for a
+        single year), or a range of dates (DD/MM-DD/MM), optionally followed
+        by a label so that several messages can be given for the same day.
+        Examples : "25/12", "25/12 grandma", "24/12-26/12", "01/06/2027"
+    """
+    dates = key.split()[0].split("-")
+    if len(dates) == 1:
+        day, month, year = _parse_date(dates[0])
+        return [(month, day, year)]
+    if len(dates) != 2:
+        raise ValueError("Invalid date range : {}".format(key))
+    first_day, first_month, first_year = _parse_date(dates[0])
+    last_day, last_month, last_year = _parse_date(dates[1])
+    if (first_year is None) != (last_year is None):
+        raise ValueError("Both dates of a range shall have a year, or none : {}".format(key))
+    if first_year is None:
+        # every year, the range may go over the new year
+        first = datetime.date(2000, first_month, first_day)
+        last = datetime.date(2000, last_month, last_day)
+        if last < first:
+            last = last.replace(year=2001)
+    else:
+        first = datetime.date(first_year, first_month, first_day)
+        last = datetime.date(last_year, last_month, last_day)
+        if last < first:
+            raise ValueError("The range ends before it begins : {}".format(key))
+    days = []
+    date = first
+    while date <= last:
+        days.append((date.month, date.day, None if first_year is None else date.year))
+        date += datetime.timedelta(days=1)
+    return days
+
+
+def _snapshot_property(name):
+    return property(fget=operator.attrgetter("_snapshot." + name))
+
+
+class ResourcesSnapshot:
+    """ The values of the configuration file, parsed and converted once.
+        A snapshot cannot be modified : the lists are given as tuples.
+    """
+
+    __slots__ = ("welcome_msg", "lcd_address", "random_msgs", "dated_msgs",
+                 "power_switch", "power_led", "sleep_lines", "clock_format",
+                 "wifi_filename", "wifi_template", "wifi_post_validate",
+                 "wifi_scan_ttl", "scroll_rate", "scroll_begin", "scroll_end",
+                 "choose_timeout", "volume_timeout", "bt_discoverable_timeout",
+                 "volume_increment", "playlist", "station_button",
+                 "volume_button", "mute_gpio", "mpd_host", "mpd_port", "i18n")
+
+    def __init__(self, **values):
+        for name in ResourcesSnapshot.__slots__:
+            object.__setattr__(self, name, values[name])
+
+    def __setattr__(self, name, value):
+        raise AttributeError("The configuration snapshot is read only")
+
+    def __delattr__(self, name):
+        raise AttributeError("The configuration snapshot is read only")
 
 
 class Resources:
@@ -29,6 +121,8 @@ class Resources:
     WIFI_FILENAME_ENTRY = "filename"
     WIFI_TEMPLATE_ENTRY = "template"
     POST_VALIDATE_ENTRY = "post_validate"
+    SCAN_TTL_ENTRY = "scan_ttl"
+    DEFAULT_SCAN_TTL = 60
 
     I18N_SECTION = "i18n"
     NO_TITLE_ENTRY = "no_title_msg"
@@ -42,6 +136,10 @@ class Resources:
     PRESS_ENTER_ENTRY = "press_enter"
     REBOOT_ENTRY = "reboot"
     VOLUME_MSG_ENTRY = "volume"
+    I18N_ENTRIES = (NO_TITLE_ENTRY, BT_PLAYBACK_ENTRY, CHANGE_STATION_ENTRY,
+                    CONFIRM_CHANGE_ENTRY, NETWORK_CHOICE_ENTRY, PLEASE_TURN_ENTRY,
+                    PLEASE_PRESS_ENTRY, ENTER_PWD_ENTRY, PRESS_ENTER_ENTRY,
+                    REBOOT_ENTRY, VOLUME_MSG_ENTRY)
 
     RANDOM_MSG_SECTION = "random_messages"
     DATED_MSG_SECTION = "dated_messages"
@@ -63,200 +161,232 @@ class Resources:
     CLOCK_SECTION = "clock"
     CLOCK_FORMAT_ENTRY = "format"
 
+    MPD_SECTION = "mpd"
+    MPD_HOST_ENTRY = "host"
+    MPD_PORT_ENTRY = "port"
+    DEFAULT_MPD_HOST = "localhost"
+    DEFAULT_MPD_PORT = 6600
+
     def __init__(self, config_file_path):
+        """ The configuration file is read and parsed once : the properties
+            only return the values of an immutable ResourcesSnapshot.
+            Raises ValueError if a value has not the expected type, or if
+            a required entry or section is missing.
+        """
         self.logger = logging.getLogger(type(self).__name__)
         self._configParser = configparser.RawConfigParser()
         self._config_file_path = config_file_path
-        self._welcome_msg = ""
-        try:
-            self._configParser.read(config_file_path, encoding='utf-8')
-            self._welcome_msg = self._configParser.get(Resources.GENERAL_SECTION,
-                                                       Resources.WELCOME_ENTRY)
-
-            entries = self._configParser.items(Resources.RANDOM_MSG_SECTION)
-            self._msgs = [y for x, y in entries]
-            sleep_entries = self._configParser.items(Resources.SLEEP_SECTION)
-            self._sleep_lines = [y.strip("\"") for x, y in sleep_entries]
-            if len(self._sleep_lines) > 4:
-                self._sleep_lines = self._sleep_lines[:4]
-
-        except configparser.NoSectionError as nosection:
-            self.logger.error("Error: %s in configuration file: %s",
-                              nosection,
-                              self._config_file_path)
-        except configparser.NoOptionError as nosection:
-            self.logger.error("Error: %s in configuration file: %s",
-                              nosection,
-                              self._config_file_path)
+        self._file_stamp = self._get_file_stamp()
+        self._configParser.read(config_file_path, encoding='utf-8')
+        self._snapshot = self._parse()
+        # the messages of the day, with the snapshot and the day
+        # they were computed for
+        self._today_cache = (None, None, ())
         return
 
+    def _get_file_stamp(self):
+        try:
+            stat = os.stat(self._config_file_path)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def reload_if_changed(self):
+        """ Reads the configuration file again if it changed since it was
+            last read. The properties then give the new values : the whole
+            snapshot is replaced at once, so a reader never sees a mix of old
+            and new values.
+            Returns the previous snapshot if the configuration changed,
+            else None. An invalid file is logged and ignored.
+        """
+        file_stamp = self._get_file_stamp()
+        if file_stamp == self._file_stamp:
+            return None
+        self._file_stamp = file_stamp
+        previous_parser = self._configParser
+        self._configParser = configparser.RawConfigParser()
+        try:
+            self._configParser.read(self._config_file_path, encoding='utf-8')
+            snapshot = self._parse()
+        except (ValueError, configparser.Error) as error:
+            self.logger.error("Configuration file %s not reloaded : %s",
+                              self._config_file_path, error)
+            self._configParser = previous_parser
+            return None
+        previous = self._snapshot
+        self._snapshot = snapshot
+        self.logger.info("Configuration file %s reloaded", self._config_file_path)
+        return previous
+
+    def _get(self, section, entry, convert=str, fallback=_MISSING):
+        """ Returns the converted value of the entry.
+            If the entry is missing, returns the fallback of an optional
+            entry, or raises ValueError for a required one (no fallback).
+        """
+        try:
+            raw = self._configParser.get(section, entry)
+        except (configparser.NoSectionError, configparser.NoOptionError) as error:
+            if fallback is not _MISSING:
+                return fallback
+            raise ValueError("Missing {} in section [{}] of {}".format(
+                entry, section, self._config_file_path)) from error
+        try:
+            return convert(raw)
+        except (ValueError, IndexError) as error:
+            raise ValueError("Invalid value '{}' for {} in section [{}] of {}".format(
+                raw, entry, section, self._config_file_path)) from error
+
+    def _items(self, section, required=True):
+        """ Returns the (key, value) of the section. A required section
+            shall be present and not empty, else ValueError is raised
+        """
+        try:
+            items = self._configParser.items(section)
+        except configparser.NoSectionError:
+            items = []
+        if required and not items:
+            raise ValueError("Missing or empty section [{}] in {}".format(
+                section, self._config_file_path))
+        return items
+
+    def _parse_i18n(self):
+        i18n = dict(self._items(Resources.I18N_SECTION))
+        for entry in Resources.I18N_ENTRIES:
+            if entry not in i18n:
+                raise ValueError("Missing {} in section [{}] of {}".format(
+                    entry, Resources.I18N_SECTION, self._config_file_path))
+        return MappingProxyType(i18n)
+
+    def _parse_dated_msgs(self):
+        index = {}
+        for key, msg in self._items(Resources.DATED_MSG_SECTION, required=False):
+            try:
+                days = _parse_dated_key(key)
+            except (ValueError, IndexError) as error:
+                raise ValueError("Invalid date '{}' in section [{}] of {}".format(
+                    key, Resources.DATED_MSG_SECTION, self._config_file_path)) from error
+            for month, day, year in days:
+                index.setdefault((month, day), []).append((year, msg))
+        return MappingProxyType({day: tuple(msgs) for day, msgs in index.items()})
+
+    def _parse(self):
+        welcome_msg = self._get(Resources.GENERAL_SECTION, Resources.WELCOME_ENTRY, fallback="")
+        if not welcome_msg:
+            welcome_msg = Resources.DEFAULT_WELCOME_MSG
+        sleep_lines = tuple(y.strip("\"") for x, y in self._items(Resources.SLEEP_SECTION,
+                                                                   required=False))
+        general = Resources.GENERAL_SECTION
+        hardware = Resources.HARDWARE_SECTION
+        wifi = Resources.WIFI_SECTION
+        return ResourcesSnapshot(
+            welcome_msg=welcome_msg[0: Resources.WELCOME_MSG_MAX_SIZE],
+            # let it guess the base from the format
+            lcd_address=self._get(hardware, Resources.LCD_ADDRESS_ENTRY, _int_auto, 0x27),
+            random_msgs=tuple(y for x, y in self._items(Resources.RANDOM_MSG_SECTION)),
+            dated_msgs=self._parse_dated_msgs(),
+            power_switch=self._get(hardware, Resources.POWER_SWITCH_ENTRY, _int_auto),
+            power_led=self._get(hardware, Resources.POWER_LED_ENTRY, _int_auto),
+            sleep_lines=sleep_lines[:4],
+            clock_format=self._get(Resources.CLOCK_SECTION, Resources.CLOCK_FORMAT_ENTRY),
+            wifi_filename=self._get(wifi, Resources.WIFI_FILENAME_ENTRY),
+            wifi_template=self._get(wifi, Resources.WIFI_TEMPLATE_ENTRY),
+            wifi_post_validate=self._get(wifi, Resources.POST_VALIDATE_ENTRY),
+            wifi_scan_ttl=self._get(wifi, Resources.SCAN_TTL_ENTRY, float,
+                                    float(Resources.DEFAULT_SCAN_TTL)),
+            scroll_rate=self._get(general, Resources.SCROLL_RATE_ENTRY, float),
+            scroll_begin=self._get(general, Resources.SCROLL_BEGIN_ENTRY, float),
+            scroll_end=self._get(general, Resources.SCROLL_END_ENTRY, float),
+            choose_timeout=self._get(general, Resources.CHOOSE_TIMEOUT_ENTRY, float),
+            volume_timeout=self._get(general, Resources.VOLUME_TIMEOUT_ENTRY, float),
+            bt_discoverable_timeout=self._get(general, Resources.BT_DISCOVERABLE_TIMEOUT_ENTRY, float),
+            volume_increment=self._get(general, Resources.VOLUME_INCREMENT_ENTRY, float),
+            playlist=tuple(self._items(Resources.PLAYLIST_SECTION)),
+            station_button=self._get(hardware, Resources.STATION_BUTTON_ENTRY, _int_tuple),
+            volume_button=self._get(hardware, Resources.VOLUME_BUTTON_ENTRY, _int_tuple),
+            mute_gpio=self._get(hardware, Resources.MUTE_ENTRY, int),
+            mpd_host=self._get(Resources.MPD_SECTION, Resources.MPD_HOST_ENTRY,
+                               fallback=Resources.DEFAULT_MPD_HOST),
+            mpd_port=self._get(Resources.MPD_SECTION, Resources.MPD_PORT_ENTRY, int,
+                               Resources.DEFAULT_MPD_PORT),
+            i18n=self._parse_i18n())
+
     def get_i18n(self, entry):
-        return self._configParser.get(Resources.I18N_SECTION, entry)
+        return self._snapshot.i18n[entry]
 
-    def _get_lcd_address(self):
-        address = ""
-        try:
-            address = self._configParser.get(Resources.HARDWARE_SECTION,
-                                             Resources.LCD_ADDRESS_ENTRY)
-        except:
-            address = "0x27"
-        return int(address, 0)  # let it guess the base from the format
-
-    def _get_welcome_msg(self):
-        msg = self._welcome_msg if self._welcome_msg \
-                        else Resources.DEFAULT_WELCOME_MSG
-        return msg if len(msg) <= Resources.WELCOME_MSG_MAX_SIZE \
-                        else msg[0: Resources.WELCOME_MSG_MAX_SIZE]
+    def _get_today_msgs(self):
+        today = datetime.date.today()
+        snapshot = self._snapshot
+        cached_snapshot, cached_date, msgs = self._today_cache
+        if cached_date != today or cached_snapshot is not snapshot:
+            # first call of the day, or the configuration was reloaded
+            msgs = tuple(msg for year, msg in snapshot.dated_msgs.get((today.month, today.day), ())
+                         if year is None or year == today.year)
+            self._today_cache = (snapshot, today, msgs)
+        return msgs
 
     def _get_today_msg(self):
-        today_msg = ""
-        today = datetime.date.today()
-        dated_msgs = self._configParser.items(Resources.DATED_MSG_SECTION)
-        for key, msg in dated_msgs:
-            day_month = key.split("/")
-            day = int(day_month[0])
-            month = int(day_month[1])
-            if day == today.day and month == today.month:
-                today_msg = msg
-                break
-        return today_msg;
-
-    def _get_msgs(self):
-        return self._msgs
-
-    def _get_power_switch(self):
-        str = self._configParser.get(Resources.HARDWARE_SECTION, Resources.POWER_SWITCH_ENTRY)
-        return int(str, 0)
-
-    def _get_power_led(self):
-        str = self._configParser.get(Resources.HARDWARE_SECTION, Resources.POWER_LED_ENTRY)
-        return int(str, 0)
-
-    def _get_sleep_lines(self):
-        return self._sleep_lines
-
-    def _get_clock_format(self):
-        return self._configParser.get(Resources.CLOCK_SECTION,
-                                      Resources.CLOCK_FORMAT_ENTRY)
-
-    def _get_wifi_filename(self):
-        return self._configParser.get(Resources.WIFI_SECTION,
-                                      Resources.WIFI_FILENAME_ENTRY)
-
-    def _get_wifi_template(self):
-        return self._configParser.get(Resources.WIFI_SECTION,
-                                      Resources.WIFI_TEMPLATE_ENTRY)
-
-    def _get_wifi_post_validate(self):
-        return self._configParser.get(Resources.WIFI_SECTION,
-                                      Resources.POST_VALIDATE_ENTRY)
-
-    def _get_scroll_rate(self):
-        return float(self._configParser.get(Resources.GENERAL_SECTION,
-                                            Resources.SCROLL_RATE_ENTRY))
-
-    def _get_scroll_begin(self):
-        return float(self._configParser.get(Resources.GENERAL_SECTION,
-                                            Resources.SCROLL_BEGIN_ENTRY))
-
-    def _get_scroll_end(self):
-        return float(self._configParser.get(Resources.GENERAL_SECTION,
-                                            Resources.SCROLL_END_ENTRY))
-
-    def _get_choose_timeout(self):
-        return float(self._configParser.get(Resources.GENERAL_SECTION,
-                                            Resources.CHOOSE_TIMEOUT_ENTRY))
-
-    def _get_volume_timeout(self):
-        return float(self._configParser.get(Resources.GENERAL_SECTION,
-                                            Resources.VOLUME_TIMEOUT_ENTRY))
-
-    def _get_bt_discoverable_timeout(self):
-        return float(self._configParser.get(Resources.GENERAL_SECTION,
-                                            Resources.BT_DISCOVERABLE_TIMEOUT_ENTRY))
-
-    def _get_volume_increment(self):
-        return float(self._configParser.get(Resources.GENERAL_SECTION,
-                                            Resources.VOLUME_INCREMENT_ENTRY))
-
-    def _get_playlist(self):
-        return self._configParser.items(Resources.PLAYLIST_SECTION)
-
-    def _get_station_button(self):
-        str = self._configParser.get(Resources.HARDWARE_SECTION, Resources.STATION_BUTTON_ENTRY)
-        return [int(val.strip()) for val in str.split(",")]
-
-    def _get_volume_button(self):
-        str = self._configParser.get(Resources.HARDWARE_SECTION, Resources.VOLUME_BUTTON_ENTRY)
-        return [int(val.strip()) for val in str.split(",")]
-
-    def _get_mute_gpio(self):
-        return int(self._configParser.get(Resources.HARDWARE_SECTION,
-                                      Resources.MUTE_ENTRY))
-
-    welcome_msg = property(fget=_get_welcome_msg)
-    lcd_address = property(fget=_get_lcd_address)
-    random_msgs = property(fget=_get_msgs)
+        msgs = self._get_today_msgs()
+        return random.choice(msgs) if msgs else ""
+
+    def _get_snapshot(self):
+        return self._snapshot
+
+    snapshot = property(fget=_get_snapshot)
+    welcome_msg = _snapshot_property("welcome_msg")
+    lcd_address = _snapshot_property("lcd_address")
+    random_msgs = _snapshot_property("random_msgs")
+    today_msgs = property(fget=_get_today_msgs)
     today_msg = property(fget=_get_today_msg)
-    power_switch = property(fget=_get_power_switch)
-    power_led = property(fget=_get_power_led)
-    sleep_lines = property(fget=_get_sleep_lines)
-    clock_format = property(fget=_get_clock_format)
-    wifi_filename = property(fget=_get_wifi_filename)
-    wifi_template = property(fget=_get_wifi_template)
-    wifi_post_validate = property(fget=_get_wifi_post_validate)
-    scroll_rate = property(fget=_get_scroll_rate)
-    scroll_begin = property(fget=_get_scroll_begin)
-    scroll_end = property(fget=_get_scroll_end)
-    choose_timeout = property(fget=_get_choose_timeout)
-    volume_timeout = property(fget=_get_volume_timeout)
-    bt_discoverable_timeout = property(fget=_get_bt_discoverable_timeout)
-    volume_increment = property(fget=_get_volume_increment)
-    playlist = property(fget=_get_playlist)
-    station_button = property(fget=_get_station_button)
-    volume_button = property(fget=_get_volume_button)
-    mute_gpio = property(fget=_get_mute_gpio)
+    power_switch = _snapshot_property("power_switch")
+    power_led = _snapshot_property("power_led")
+    sleep_lines = _snapshot_property("sleep_lines")
+    clock_format = _snapshot_property("clock_format")
+    wifi_filename = _snapshot_property("wifi_filename")
+    wifi_template = _snapshot_property("wifi_template")
+    wifi_post_validate = _snapshot_property("wifi_post_validate")
+    wifi_scan_ttl = _snapshot_property("wifi_scan_ttl")
+    scroll_rate = _snapshot_property("scroll_rate")
+    scroll_begin = _snapshot_property("scroll_begin")
+    scroll_end = _snapshot_property("scroll_end")
+    choose_timeout = _snapshot_property("choose_timeout")
+    volume_timeout = _snapshot_property("volume_timeout")
+    bt_discoverable_timeout = _snapshot_property("bt_discoverable_timeout")
+    volume_increment = _snapshot_property("volume_increment")
+    playlist = _snapshot_property("playlist")
+    station_button = _snapshot_property("station_button")
+    volume_button = _snapshot_property("volume_button")
+    mute_gpio = _snapshot_property("mute_gpio")
+    mpd_host = _snapshot_property("mpd_host")
+    mpd_port = _snapshot_property("mpd_port")
 
 
 if __name__ == "__main__":
+    import sys
+
+    # the configuration file of the radio, unless another one is given
+    path = sys.argv[1] if len(sys.argv) > 1 else \
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), "webradio.cfg")
+
     print("Test 1")
-    rsc = Resources("/home/pi/python/webradio/conf.txt")
+    rsc = Resources(path)
     print(rsc.welcome_msg)
 
     print("Test 2")
-    rsc = Resources("unknown.txt")
-    print(rsc.welcome_msg)
+    # a missing file lacks the required entries
+    try:
+        Resources("unknown.txt")
+    except ValueError as error:
+        print("unknown.txt rejected :", error)
 
     print("Test 3")
-    rsc = Resources("/home/pi/python/webradio/conf_test3.txt")
-    print(rsc.welcome_msg)
-
-    print("Test 4")
-    rsc = Resources("/home/pi/python/webradio/conf_test4.txt")
-    print(rsc.welcome_msg)
-
-    print("Test 5")
-    rsc = Resources("/home/pi/python/webradio/conf.txt")
     print("Lcd address found in file = {}".format(rsc.lcd_address))
-
-    print("Test 6")
-    rsc = Resources("unknown.txt")
-    print("Lcd address NOT found in file = {}".format(rsc.lcd_address))
-
-    print("Test 7")
-    rsc = Resources("/home/pi/python/webradio/conf.txt")
     print("Random messages :", rsc.random_msgs)
 
-    print("Test 8")
-    print(rsc._configParser["playlist"])
-    for key, value in enumerate(rsc._configParser["playlist"]):
-        print("key={} ; value={} ; value2={}".format(key, value,
-                                                     rsc._configParser["playlist"][value]))
+    print("Test 4")
+    for number, (name, url) in enumerate(rsc.playlist, 1):
+        print("station {} : {} ; {}".format(number, name, url))
 
-    print("Test 9")
-    print("Playlist", rsc._configParser.items("playlist"))
-    x, y = rsc._configParser.items("playlist")[5]
-    print(x)
+    print("Test 5")
     print("Station buttons :", rsc.station_button)
     print("Sleep lines :", rsc.sleep_lines)
     print("Today msg :", rsc.today_msg)
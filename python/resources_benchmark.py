@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Measures the cost of an access to the Resources properties used on the
+hot paths, compared with the former way of querying the configparser
+and converting the string at each access :
+    python3 resources_benchmark.py [configuration file]
+"""
+import sys
+import timeit
+
+from resources import Resources
+
+
+def legacy_getters(parser):
+    """ The getters of the previous version of Resources
+    """
+    return {
+        "clock_format": lambda: parser.get(Resources.CLOCK_SECTION,
+                                           Resources.CLOCK_FORMAT_ENTRY),
+        "scroll_rate": lambda: float(parser.get(Resources.GENERAL_SECTION,
+                                                Resources.SCROLL_RATE_ENTRY)),
+        "mute_gpio": lambda: int(parser.get(Resources.HARDWARE_SECTION,
+                                            Resources.MUTE_ENTRY)),
+        "station_button": lambda: [int(val.strip()) for val in parser.get(
+            Resources.HARDWARE_SECTION, Resources.STATION_BUTTON_ENTRY).split(",")],
+        "playlist": lambda: parser.items(Resources.PLAYLIST_SECTION),
+    }
+
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else "webradio.cfg"
+    rsc = Resources(path)
+    count = 10000
+    print("Cost of one access, in microseconds :")
+    for name, legacy in legacy_getters(rsc._configParser).items():
+        if legacy() != getattr(rsc, name) and list(legacy()) != list(getattr(rsc, name)):
+            print("ERROR : {} differs".format(name))
+            sys.exit(1)
+        legacy_time = min(timeit.repeat(legacy, number=count, repeat=3)) / count
+        snapshot_time = min(timeit.repeat(lambda: getattr(rsc, name), number=count,
+                                          repeat=3)) / count
+        print("  {:15s} : configparser {:8.3f}, snapshot {:6.3f}".format(
+              name, legacy_time * 1e6, snapshot_time * 1e6))
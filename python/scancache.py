@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Wifi scan shared by the wifi thread and the essid state
+"""
+
+from threading import Thread, Lock
+import time
+import logging
+
+from wifiscanner import WifiScanner
+
+DEFAULT_TTL = 60
+
+
+class ScanCache:
+    """ Keeps the result of the last full wifi scan, so that the list of the
+        wifi cells can be displayed at once, without waiting for iwlist.
+
+        The scan is done by a background thread, started by refresh().
+        When it completes, the callback is called with the cache as argument,
+        from that thread.
+        The result is considered stale after ttl seconds.
+    """
+
+    def __init__(self, callback=None, ttl=DEFAULT_TTL, scanner_factory=WifiScanner):
+        self.logger = logging.getLogger(type(self).__name__)
+        self._callback = callback
+        self._ttl = ttl
+        self._scanner_factory = scanner_factory
+        self._lock = Lock()
+        self._cells = []
+        self._essid = ""
+        self._timestamp = None
+        self._thread = None
+
+    def update(self, cells, essid):
+        """ Stores the result of a full scan, and calls the callback
+        """
+        with self._lock:
+            self._cells = list(cells)
+            self._essid = essid
+            self._timestamp = time.monotonic()
+        if self._callback is not None:
+            self._callback(self)
+
+    def is_fresh(self):
+        with self._lock:
+            return self._timestamp is not None \
+                and time.monotonic() - self._timestamp < self._ttl
+
+    def refresh(self):
+        """ Starts a scan in the background, unless one is already running
+        """
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = Thread(target=self._scan, name="ScanCache", daemon=True)
+            self._thread.start()
+
+    def refresh_if_stale(self):
+        if not self.is_fresh():
+            self.refresh()
+
+    def join(self, timeout=None):
+        """ Waits for the end of the running scan, if any
+        """
+        with self._lock:
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def _scan(self):
+        try:
+            scanner = self._scanner_factory()
+            scanner.scan_wifi()
+        except Exception:
+            self.logger.exception("Wifi scan failed")
+            return
+        self.update(scanner.cells, scanner.essid)
+
+    def _get_cells(self):
+        with self._lock:
+            return list(self._cells)
+
+    def _get_essid(self):
+        with self._lock:
+            return self._essid
+
+    cells = property(fget=_get_cells)
+    essid = property(fget=_get_essid)
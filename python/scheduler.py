@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Scheduler shared by the timeouts, the scrolling texts and the periodic tasks
+"""
+
+from threading import Thread, Condition, Lock
+import heapq
+import itertools
+import math
+import time
+import logging
+
+
+class PeriodicTask:
+    """ A task registered in a Scheduler. Its callback is called every
+        period seconds until it is paused or cancelled.
+        Use the Scheduler.schedule_periodic() method to create it.
+        A task with a period of None is called only once, see call_later()
+    """
+
+    def __init__(self, scheduler, period, callback):
+        self._scheduler = scheduler
+        self.period = period
+        self.callback = callback
+        # Each pause/resume changes the generation, so that the entries
+        # of the heap pushed before are ignored
+        self.generation = 0
+        self.paused = True
+        self.cancelled = False
+
+    def pause(self):
+        """ The callback is not called any more until resume().
+            A paused task costs nothing to the scheduler
+        """
+        self._scheduler._pause(self)
+
+    def resume(self, delay=0):
+        """ The callback is called after delay seconds (immediately by default),
+            and then every period
+        """
+        self._scheduler._resume(self, delay)
+
+    def cancel(self):
+        """ Definitively removes the task from the scheduler
+        """
+        self._scheduler._cancel(self)
+
+
+class Scheduler:
+    """ A single thread calling the callbacks of all the periodic tasks
+        of the radio : scrolling texts, clocks, blinkers...
+
+        The tasks are kept in a heap ordered by their next deadline, and the
+        thread sleeps until the nearest one. The deadlines are computed
+        from the monotonic clock, the next one being the previous deadline
+        plus the period : the time spent in the callbacks does not make
+        the tasks drift.
+        The callbacks are called from the scheduler thread, they shall
+        be short.
+
+        Usage :
+            scheduler = Scheduler()
+            task = scheduler.schedule_periodic(0.5, my_callback)
+            ...
+            task.pause()
+            task.resume()
+            ...
+            scheduler.stop()
+    """
+
+    _default = None
+    _default_lock = Lock()
+
+    def __init__(self):
+        self.logger = logging.getLogger(type(self).__name__)
+        self._heap = []
+        self._counter = itertools.count()
+        self._condition = Condition()
+        self._thread = None
+        self._stopped = False
+
+    @staticmethod
+    def default():
+        """ Returns the scheduler shared by the objects that are not
+            given one explicitly
+        """
+        with Scheduler._default_lock:
+            if Scheduler._default is None:
+                Scheduler._default = Scheduler()
+            return Scheduler._default
+
+    def schedule_periodic(self, period, callback, paused=False, delay=0):
+        """ Registers a callback to be called every period seconds.
+            If paused is True, the task shall be resumed to start.
+            Returns a PeriodicTask.
+        """
+        if period <= 0:
+            raise ValueError("The period shall be positive")
+        task = PeriodicTask(self, period, callback)
+        if not paused:
+            task.resume(delay)
+        return task
+
+    def call_later(self, delay, callback):
+        """ Calls the callback once, after delay seconds.
+            Returns a task that may be cancelled
+        """
+        task = PeriodicTask(self, None, callback)
+        task.resume(delay)
+        return task
+
+    def stop(self):
+        """ Stops the scheduler thread. The tasks are not called any more
+        """
+        with self._condition:
+            self._stopped = True
+            self._heap = []
+            self._condition.notify()
+
+    def _start_thread(self):
+        # called with the condition acquired
+        if self._thread is None and not self._stopped:
+            self._thread = Thread(target=self._run, name="Scheduler", daemon=True)
+            self._thread.start()
+
+    def _push(self, task, deadline):
+        heapq.heappush(self._heap, (deadline, next(self._counter), task.generation, task))
+        self._condition.notify()
+
+    def _pause(self, task):
+        with self._condition:
+            task.generation += 1
+            task.paused = True
+
+    def _resume(self, task, delay):
+        with self._condition:
+            if task.cancelled:
+                return
+            task.generation += 1
+            task.paused = False
+            self._push(task, time.monotonic() + delay)
+            self._start_thread()
+
+    def _cancel(self, task):
+        with self._condition:
+            task.generation += 1
+            task.paused = True
+            task.cancelled = True
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while True:
+                    if self._stopped:
+                        return
+                    if not self._heap:
+                        self._condition.wait()
+                        continue
+                    deadline, count, generation, task = self._heap[0]
+                    if generation != task.generation:
+                        # paused or resumed since this entry was pushed
+                        heapq.heappop(self._heap)
+                        continue
+                    now = time.monotonic()
+                    if deadline > now:
+                        self._condition.wait(deadline - now)
+                        continue
+                    heapq.heappop(self._heap)
+                    break
+            try:
+                task.callback()
+            except Exception:
+                self.logger.exception("Error in periodic task %s", task.callback)
+            with self._condition:
+                if generation != task.generation:
+                    # paused or resumed by the callback itself
+                    pass
+                elif task.period is None:
+                    task.paused = True
+                else:
+                    # skip the periods that could not be honoured in time
+                    now = time.monotonic()
+                    late = max(0, math.floor((now - deadline) / task.period))
+                    self._push(task, deadline + (late + 1) * task.period)
+
+
+class BlockingCaller:
+    """ Runs the blocking calls of the states : mpd commands, processes,
+        D-Bus methods. This one calls them at once, in the thread of the
+        event loop ; asyncradio.AsyncBlockingCaller has the same interface
+        and runs them out of the asyncio event loop.
+
+        The callback, if any, is called with the result of the function.
+        An exception raised by the function is logged.
+    """
+
+    def __init__(self):
+        self.logger = logging.getLogger(type(self).__name__)
+
+    def call(self, function, *args, callback=None):
+        try:
+            result = function(*args)
+        except Exception:
+            self.logger.exception("Error in blocking call %s", function)
+            return
+        if callback is not None:
+            callback(result)
+
+    def stop(self):
+        return
@@ -5,10 +5,11 @@ Created on Thu Sep 20 20:52:52 2018
 
 @author: Sebastien ROY
 """
-from threading import Thread, RLock, Event
-import time
+from threading import RLock
 import logging
 
+from scheduler import Scheduler
+
 class ScrollingText:
     """ Tool class that manages a string that scrolls into a given frame.
         The Scrolling text is initialized using a text function, a text callback,
@@ -19,46 +20,23 @@ class ScrollingText:
         the text function
         The scrolling text may be used for instance to manage the text displayed
         on a 4x20 LCD screen.
+        The refresh and the scroll are periodic tasks of a Scheduler,
+        shared with the other scrolling texts, clocks...
         stop() function should be used in order to free resources
     """
 
-    class TimerThread(Thread):
-        def __init__(self, period, callback):
-            Thread.__init__(self)
-            self._period = period
-            self._callback = callback
-            self._stop = False
-            self._pause = Event()
-            self._pause.set()
-
-        def stop(self):
-            self._stop = True
-
-        def run(self):
-            while not self._stop:
-                self._pause.wait()
-                self._callback()
-
-                time.sleep(self._period)
-
-        def pause(self):
-            self._pause.clear()
-
-        #should just resume the thread
-        def resume(self):
-            self._pause.set()
-
-
     def __init__(self, text_function, update_callback, display_size, refresh_rate=0,
-                 scroll_begin_delay=3, scroll_end_delay=3, scroll_rate=0.5):
+                 scroll_begin_delay=3, scroll_end_delay=3, scroll_rate=0.5,
+                 scheduler=None):
         self.logger = logging.getLogger(type(self).__name__)
         self._text_function = text_function
         self._update_callback = update_callback
         self._display_size = display_size
         self._refresh_rate = refresh_rate
         self._scroll_rate = scroll_rate
-        self._update_thread = ScrollingText.TimerThread(refresh_rate, self._update_text)
-        self._scroll_thread = ScrollingText.TimerThread(scroll_rate, self._scroll_text)
+        self._scheduler = scheduler if scheduler is not None else Scheduler.default()
+        self._update_task = None
+        self._scroll_task = None
         self.text = ""
         # The delay is currently computed as a number of refreshs
         self._scroll_begin_delay = scroll_begin_delay // scroll_rate \
@@ -79,19 +57,25 @@ class ScrollingText:
         """
         self.text = self._text_function()
         self._send_update(self.text)
-        if self._refresh_rate > 0:
-            self._update_thread.start()
-        self._scroll_thread.start()
+        with self._lock:
+            if self._refresh_rate > 0:
+                self._update_task = self._scheduler.schedule_periodic(self._refresh_rate,
+                                                                      self._update_text,
+                                                                      paused=self._paused)
+            self._scroll_task = self._scheduler.schedule_periodic(self._scroll_rate,
+                                                                  self._scroll_text,
+                                                                  paused=self._paused)
         self.logger.debug("Scrolling text %s started with text \"%s\"", self, self.text)
 
     def stop(self):
         """ Be carefull, one stopped, the scrolling text cannot be restarted
             Use pause() and resume() instead.
         """
-        self._paused = True
-        self._scroll_thread.stop()
-        if self._refresh_rate > 0:
-            self._update_thread.stop()
+        with self._lock:
+            self._paused = True
+            for task in (self._scroll_task, self._update_task):
+                if task is not None:
+                    task.cancel()
         self.logger.debug("Scrolling text %s stopped", self)
 
 
@@ -101,9 +85,9 @@ class ScrollingText:
         """
         with self._lock:
             self._paused = True
-            self._scroll_thread.pause()
-            if self._refresh_rate > 0:
-                self._update_thread.pause()
+            for task in (self._scroll_task, self._update_task):
+                if task is not None:
+                    task.pause()
             self.logger.debug("Scrolling text %s paused with current position = %d",
                               self, self._scroll_position)
 
@@ -118,12 +102,19 @@ class ScrollingText:
             self._scroll_position = 0
             self._begin_counter = self._scroll_begin_delay
             self._end_counter = self._scroll_end_delay
-            self._scroll_thread.resume()
-            if self._refresh_rate > 0:
-                self._update_thread.resume()
+            for task in (self._scroll_task, self._update_task):
+                if task is not None:
+                    task.resume()
             self.logger.debug("Scrolling text %s resumed with text \"%s\"",
                               self, self.text)
 
+    def refresh(self):
+        """ Asks the text function for a new text, without waiting for the
+            next refresh. Used when the text changes are notified
+            rather than polled
+        """
+        self._update_text()
+
     def _send_update(self, value):
         if len(value) <= self._display_size:
             self._update_callback(self, value)
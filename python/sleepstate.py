@@ -7,7 +7,6 @@ Created on Sat Apr 18 17:45:12 2020
 """
 
 
-import subprocess
 import logging
 import datetime
 
@@ -41,7 +40,8 @@ class SleepState(RadioState):
         self._clock_rolling_text = ScrollingText(self._get_time_text,
                                                  self._time_callback,
                                                  display_size=20,
-                                                 refresh_rate=1)
+                                                 refresh_rate=1,
+                                                 scheduler=self._ctxt.scheduler)
         self._clock_rolling_text.start()
         self._clock_rolling_text.pause()
 
@@ -60,6 +60,7 @@ class SleepState(RadioState):
         self._clock_rolling_text.resume()
 
     def leave_state(self):
+        self._ip_displayed = False
         self._clock_rolling_text.pause()
 
     def handle_event(self, event):
@@ -85,16 +86,26 @@ class SleepState(RadioState):
 
 
     def display_ip(self):
-        ip = ""
         if self._ip_displayed:
-            proc = subprocess.Popen(["hostname", "-I"],
-                                    stdout=subprocess.PIPE, universal_newlines=True)
-            out, err = proc.communicate()
-            ip = "IP : {}".format(out).ljust(20)
+            self._ctxt.caller.call(self._read_ip, callback=self._show_ip)
         else:
-            ip = "".ljust(20)
+            self._ctxt.lcd.cursor_pos=(0, 0)
+            self._ctxt.lcd.write_string("".ljust(20))
+
+    def _read_ip(self):
+        processes = self._ctxt.hardware.processes
+        proc = processes.Popen(["hostname", "-I"],
+                               stdout=processes.PIPE, universal_newlines=True)
+        out, err = proc.communicate()
+        # the output ends with a line break
+        return out.strip()
+
+    def _show_ip(self, address):
+        if not self._ip_displayed:
+            # hidden again, or the state left, meanwhile
+            return
         self._ctxt.lcd.cursor_pos=(0, 0)
-        self._ctxt.lcd.write_string(ip)
+        self._ctxt.lcd.write_string("IP : {}".format(address).ljust(20))
 
     def cleanup(self):
         self.logger.debug("SleepState cleaned up")
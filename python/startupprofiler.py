@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Measures the duration of the initialisation phases of the radio
+"""
+
+from contextlib import contextmanager
+import time
+
+
+class StartupProfiler:
+    """ Measures the duration of the phases of the radio initialisation.
+
+        Usage :
+            profiler = StartupProfiler()
+            with profiler.phase("lcd"):
+                ...
+            profiler.report()
+
+        A disabled profiler measures nothing and reports nothing, so the
+        phases can stay in the code.
+    """
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.start_time = time.perf_counter()
+        self.phases = []
+
+    @contextmanager
+    def phase(self, name):
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - start))
+
+    def elapsed(self):
+        """ Returns the time since the creation of the profiler, in seconds
+        """
+        return time.perf_counter() - self.start_time
+
+    def report_lines(self):
+        lines = ["Startup phases :"]
+        for name, duration in self.phases:
+            lines.append("  {:24s} {:8.1f} ms".format(name, duration * 1000))
+        lines.append("  {:24s} {:8.1f} ms".format("total", self.elapsed() * 1000))
+        return lines
+
+    def report(self):
+        """ Prints the duration of each phase, and the total time
+        """
+        if self.enabled:
+            print("\n".join(self.report_lines()))
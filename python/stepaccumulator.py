@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Accumulation and acceleration of the rotary encoder detents
+"""
+
+from threading import Lock
+import time
+
+# Duration during which the detents of a rotary encoder are accumulated
+ACCUMULATION_WINDOW = 0.05
+# A detent following the previous one, in the same direction, within this
+# interval (in seconds) increases the acceleration
+ACCELERATION_INTERVAL = 0.05
+# Increase of the multiplication of the steps for each fast detent
+ACCELERATION_RAMP = 0.1
+
+
+class StepAccumulator:
+    """ Accumulates the detents of a rotary encoder during a short window,
+        and then gives the net signed step count to the callback in a single
+        call : spinning the knob fast does not flood the event queue.
+
+        When max_acceleration is greater than 1, the detents are multiplied
+        according to the time since the previous detent : each fast detent
+        weighs ACCELERATION_RAMP more than the previous one, up to
+        max_acceleration, and a slow one weighs 1 again. A short flick of
+        the knob thus stays close to its detent count, while a long fast
+        rotation goes up to max_acceleration times faster.
+
+        add() may be called from any thread (GPIO callbacks). The callback is
+        called from the scheduler thread, or directly by add() when there is
+        no scheduler.
+    """
+
+    def __init__(self, callback, scheduler=None, window=ACCUMULATION_WINDOW,
+                 max_acceleration=1):
+        self._callback = callback
+        self._scheduler = scheduler
+        self._window = window
+        self._max_acceleration = max_acceleration
+        self._lock = Lock()
+        self._steps = 0
+        self._flush_task = None
+        # the current multiplication of the detents
+        self._factor = 1
+        self._last_detent = None
+        self._last_direction = 0
+
+    def add(self, detents):
+        """ Adds the given signed number of detents (+1 clockwise, -1 counter
+            clockwise)
+        """
+        if self._scheduler is None or self._window <= 0:
+            self._callback(detents)
+            return
+        now = time.monotonic()
+        with self._lock:
+            self._steps += self._accelerate(detents, now)
+            if self._flush_task is None:
+                self._flush_task = self._scheduler.call_later(self._window, self.flush)
+
+    def flush(self):
+        """ Gives the accumulated steps to the callback, if any
+        """
+        with self._lock:
+            steps = int(round(self._steps))
+            self._steps = 0
+            self._flush_task = None
+        if steps != 0:
+            self._callback(steps)
+
+    def _accelerate(self, detents, now):
+        # called with the lock acquired, returns the weight of the detents
+        if self._max_acceleration <= 1:
+            return detents
+        direction = 1 if detents > 0 else -1
+        if self._last_detent is not None and now - self._last_detent < ACCELERATION_INTERVAL \
+                and direction == self._last_direction:
+            self._factor = min(self._max_acceleration, self._factor + ACCELERATION_RAMP)
+        else:
+            self._factor = 1
+        self._last_detent = now
+        self._last_direction = direction
+        return detents * self._factor
+
+    def cancel(self):
+        with self._lock:
+            if self._flush_task is not None:
+                self._flush_task.cancel()
+                self._flush_task = None
+            self._steps = 0
+            self._factor = 1
+            self._last_detent = None
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Unitary tests of the asyncio runtime of the radio
+"""
+
+import unittest
+import asyncio
+import threading
+import time
+
+from asyncradio import AsyncEventQueue, AsyncScheduler, AsyncPoller, AsyncBlockingCaller
+
+
+class test_AsyncRadio(unittest.TestCase):
+    """ Unitary tests of the asyncio replacements of the queue, the scheduler
+        and the wifi thread
+    """
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.calls = []
+
+    def tearDown(self):
+        self.loop.close()
+        asyncio.set_event_loop(None)
+
+    def callback(self, value=None):
+        self.calls.append((time.monotonic(), threading.current_thread()))
+
+    def test_queue_from_thread(self):
+        queue = AsyncEventQueue(self.loop)
+
+        async def consume():
+            thread = threading.Thread(target=lambda: [queue.put(i) for i in range(5)])
+            thread.start()
+            events = [await queue.get() for i in range(5)]
+            thread.join()
+            return events
+        self.assertEqual(self.loop.run_until_complete(consume()), [0, 1, 2, 3, 4])
+
+    def test_scheduler(self):
+        scheduler = AsyncScheduler(self.loop)
+        task = scheduler.schedule_periodic(0.01, self.callback)
+        timeout = scheduler.call_later(0.02, self.callback)
+        timeout.cancel()
+        self.loop.run_until_complete(asyncio.sleep(0.105))
+        task.pause()
+        count = len(self.calls)
+        self.assertGreaterEqual(count, 10)
+        # all the callbacks are called by the loop thread
+        self.assertEqual({thread for t, thread in self.calls}, {threading.current_thread()})
+        self.loop.run_until_complete(asyncio.sleep(0.03))
+        self.assertEqual(len(self.calls), count)
+
+        scheduler.call_later(0.01, self.callback)
+        self.loop.run_until_complete(asyncio.sleep(0.03))
+        self.assertEqual(len(self.calls), count + 1)
+
+    def test_poller(self):
+        results = []
+        poller = AsyncPoller(self.loop, threading.current_thread, results.append, 0.01)
+        poller.start()
+        self.loop.run_until_complete(asyncio.sleep(0.03))
+        self.assertEqual(results, [])
+        poller.resume()
+        self.loop.run_until_complete(asyncio.sleep(0.035))
+        poller.stop()
+        self.loop.run_until_complete(asyncio.sleep(0.01))
+        self.assertGreaterEqual(len(results), 2)
+        # the function is called in the executor, not in the loop thread
+        self.assertNotIn(threading.current_thread(), results)
+
+    def test_blocking_caller(self):
+        caller = AsyncBlockingCaller(self.loop)
+        calls = []
+
+        def blocking(value):
+            time.sleep(0.01)
+            calls.append((value, threading.current_thread()))
+            return value * 2
+
+        def failing():
+            raise OSError("mpd is down")
+
+        async def run():
+            results = []
+            for value in range(3):
+                caller.call(blocking, value,
+                            callback=lambda result: results.append(
+                                (result, threading.current_thread())))
+            caller.call(failing, callback=results.append)
+            # the loop is not blocked while the calls run
+            self.assertEqual(calls, [])
+            await asyncio.sleep(0.1)
+            return results
+        results = self.loop.run_until_complete(run())
+        caller.stop()
+        # in order, out of the loop thread, the callbacks in the loop thread
+        self.assertEqual([value for value, thread in calls], [0, 1, 2])
+        self.assertNotIn(threading.current_thread(), [thread for value, thread in calls])
+        self.assertEqual(results, [(0, threading.current_thread()),
+                                   (2, threading.current_thread()),
+                                   (4, threading.current_thread())])
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Unitary tests of BluetoothController
+"""
+
+import unittest
+import importlib.util
+
+from bluetoothcontroller import BluezBus, BluetoothController, BluetoothError, AGENT_CAPABILITY
+from fakebluez import FakeBluezBus
+
+
+class test_BluetoothController(unittest.TestCase):
+    """ Unitary tests of BluetoothController, against the stand-in of bluetoothd
+    """
+
+    def setUp(self):
+        self.bus = FakeBluezBus()
+        self.phone = self.bus.add_device("00:11:22:33:44:55", "My phone")
+        self.events = []
+        self.controller = BluetoothController(self.bus, self.device_callback)
+
+    def device_callback(self, originator, name, connected):
+        self.events.append((name, connected))
+
+    def test_adapter_properties(self):
+        self.controller.setup()
+        self.controller.powered = True
+        self.controller.discoverable = True
+        adapter = self.bus.adapter
+        self.assertTrue(adapter["Powered"])
+        self.assertTrue(adapter["Pairable"])
+        self.assertTrue(adapter["Discoverable"])
+        self.assertEqual(self.bus.agent_capability, AGENT_CAPABILITY)
+        self.controller.discoverable = False
+        self.assertFalse(self.bus.adapter["Discoverable"])
+
+    def test_device_connection(self):
+        self.bus.set_device_properties(self.phone, Connected=True)
+        # a change of another property is not a connection
+        self.bus.set_device_properties(self.phone, RSSI=-60)
+        self.assertEqual(self.controller.connected_devices, ["My phone"])
+        self.bus.set_device_properties(self.phone, Connected=False)
+        self.assertEqual(self.events, [("My phone", True), ("My phone", False)])
+        self.assertEqual(self.controller.connected_devices, [])
+
+    def test_new_device(self):
+        # a device paired after the start of the controller
+        tablet = self.bus.add_device("66:77:88:99:AA:BB", "Tablet")
+        self.bus.set_device_properties(tablet, Connected=True)
+        self.assertEqual(self.events, [("Tablet", True)])
+
+    def test_errors(self):
+        self.bus.objects.pop(self.bus.adapter_path)
+        with self.assertRaises(BluetoothError):
+            self.controller.powered = True
+        with self.assertRaises(BluetoothError):
+            BluetoothController(self.bus)
+
+    @unittest.skipIf(importlib.util.find_spec("dbus") and importlib.util.find_spec("gi"),
+                     "dbus-python is installed")
+    def test_no_dbus(self):
+        with self.assertRaises(BluetoothError):
+            BluezBus()
+
+
+if __name__ == '__main__':
+    unittest.main()
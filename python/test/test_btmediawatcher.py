@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Unitary tests of BtMediaWatcher
+"""
+
+import unittest
+
+from btmediawatcher import BtMediaWatcher, track_text
+from fakebluez import FakeBluezBus
+
+
+class test_BtMediaWatcher(unittest.TestCase):
+    """ Unitary tests of BtMediaWatcher, with the signals of the stand-in
+        of bluetoothd
+    """
+
+    def setUp(self):
+        self.bus = FakeBluezBus()
+        self.phone = self.bus.add_device("00:11:22:33:44:55", "My phone")
+        self.changes = []
+        self.watcher = BtMediaWatcher(self.bus, self.media_callback)
+
+    def media_callback(self, watcher):
+        self.changes.append((watcher.device_name, watcher.track_title))
+
+    def test_track_text(self):
+        self.assertEqual(track_text({"Title": "Song", "Artist": "Singer"}), "Singer - Song")
+        self.assertEqual(track_text({"Title": "Song"}), "Song")
+        self.assertEqual(track_text({}), "")
+
+    def test_connection_and_track(self):
+        self.bus.set_device_properties(self.phone, Connected=True)
+        player = self.bus.add_player(self.phone)
+        self.bus.set_track(player, Title="Song", Artist="Singer", Album="Album")
+        # no change of the displayed texts : no callback
+        self.bus.set_track(player, Title="Song", Artist="Singer", Album="Other album")
+        self.bus.set_device_properties(self.phone, Connected=False)
+        self.assertEqual(self.changes, [("My phone", ""),
+                                        ("My phone", "Singer - Song"),
+                                        ("", "")])
+
+    def test_player_added_and_removed(self):
+        self.bus.set_device_properties(self.phone, Connected=True)
+        # the first track comes with the player, without PropertiesChanged
+        player = self.bus.add_player(self.phone, Title="Song", Artist="Singer")
+        self.assertEqual(self.watcher.track_title, "Singer - Song")
+        self.bus.remove_object(player)
+        self.assertEqual(self.watcher.track_title, "")
+        self.bus.remove_object(self.phone)
+        self.assertEqual(self.changes, [("My phone", ""),
+                                        ("My phone", "Singer - Song"),
+                                        ("My phone", ""),
+                                        ("", "")])
+
+    def test_already_connected(self):
+        self.bus.set_device_properties(self.phone, Connected=True)
+        player = self.bus.add_player(self.phone)
+        self.bus.set_track(player, Title="Song")
+        watcher = BtMediaWatcher(self.bus)
+        self.assertEqual(watcher.device_name, "My phone")
+        self.assertEqual(watcher.track_title, "Song")
+
+    def test_last_connected_device(self):
+        tablet = self.bus.add_device("66:77:88:99:AA:BB", "Tablet")
+        self.bus.set_device_properties(self.phone, Connected=True)
+        self.bus.set_device_properties(tablet, Connected=True)
+        self.assertEqual(self.watcher.device_name, "Tablet")
+        self.bus.set_device_properties(tablet, Connected=False)
+        self.assertEqual(self.watcher.device_name, "My phone")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Unitary tests of ShadowDisplay and of the backlight effects
+"""
+
+import unittest
+
+from display import ShadowDisplay, blink_pattern, fade_pattern
+
+
+class LcdMockup:
+    """ LcdMockup replaces RPLCD CharLCD for testing purpose.
+        It records the calls and keeps the content of the screen
+    """
+    def __init__(self):
+        self.calls = []
+        self.lines = [[" "] * 20 for i in range(4)]
+        self._pos = (0, 0)
+        self.backlight_enabled = False
+        self.cursor_mode = "hide"
+
+    def _get_cursor_pos(self):
+        return self._pos
+
+    def _set_cursor_pos(self, pos):
+        self.calls.append(("cursor_pos", pos))
+        self._pos = pos
+
+    def write_string(self, text):
+        self.calls.append(("write_string", text))
+        row, col = self._pos
+        for char in text:
+            self.lines[row][col] = char
+            col += 1
+            if col >= 20:
+                row, col = (row + 1) % 4, 0
+        self._pos = (row, col)
+
+    def clear(self):
+        self.calls.append(("clear",))
+        self.lines = [[" "] * 20 for i in range(4)]
+        self._pos = (0, 0)
+
+    def content(self, row):
+        return "".join(self.lines[row])
+
+    cursor_pos = property(_get_cursor_pos, _set_cursor_pos)
+
+
+class SchedulerMockup:
+    """ Keeps the delayed calls, which are run by the test with step()
+    """
+    def __init__(self):
+        self.pending = []
+
+    def call_later(self, delay, callback):
+        task = SchedulerMockup.Task(delay, callback)
+        self.pending.append(task)
+        return task
+
+    def step(self):
+        """ Runs the next pending call, returns its delay
+        """
+        task = self.pending.pop(0)
+        if not task.cancelled:
+            task.callback()
+        return task.delay
+
+    class Task:
+        def __init__(self, delay, callback):
+            self.delay = delay
+            self.callback = callback
+            self.cancelled = False
+
+        def cancel(self):
+            self.cancelled = True
+
+
+class test_ShadowDisplay(unittest.TestCase):
+
+    def setUp(self):
+        self.lcd = LcdMockup()
+        self.display = ShadowDisplay(self.lcd)
+
+    def test_only_changes_are_written(self):
+        self.display.cursor_pos = (3, 0)
+        self.display.write_string("Volume 20".ljust(20))
+        self.assertEqual(self.lcd.content(3), "Volume 20".ljust(20))
+        self.lcd.calls = []
+
+        self.display.cursor_pos = (3, 0)
+        self.display.write_string("Volume 30".ljust(20))
+        self.assertEqual(self.lcd.calls, [("cursor_pos", (3, 7)), ("write_string", "3")])
+        self.assertEqual(self.lcd.content(3), "Volume 30".ljust(20))
+
+        # nothing is sent if nothing changed
+        self.lcd.calls = []
+        self.display.cursor_pos = (3, 0)
+        self.display.write_string("Volume 30".ljust(20))
+        self.assertEqual(self.lcd.calls, [])
+
+    def test_runs(self):
+        self.display.cursor_pos = (1, 0)
+        self.display.write_string("0123456789")
+        self.lcd.calls = []
+        self.display.cursor_pos = (1, 0)
+        # a gap of one unchanged cell is rewritten, a longer gap is skipped
+        self.display.write_string("a1c34567xy")
+        self.assertEqual(self.lcd.calls, [("cursor_pos", (1, 0)), ("write_string", "a1c"),
+                                          ("cursor_pos", (1, 8)), ("write_string", "xy")])
+        self.assertEqual(self.lcd.content(1), "a1c34567xy".ljust(20))
+
+    def test_scrolling(self):
+        text = "This is a text that scrolls on the lcd"
+        for pos in range(len(text) - 20):
+            self.display.cursor_pos = (2, 0)
+            self.display.write_string(text[pos:pos + 20])
+            self.assertEqual(self.lcd.content(2), text[pos:pos + 20])
+        stats = self.display.stats
+        self.assertEqual(stats["requested_bytes"], stats["written_bytes"] + stats["saved_bytes"])
+
+    def test_line_break_and_clear(self):
+        self.display.cursor_pos = (0, 18)
+        self.display.write_string("abcd")
+        self.assertEqual(self.lcd.content(0)[18:], "ab")
+        self.assertEqual(self.lcd.content(1)[:2], "cd")
+        self.assertEqual(self.display.cursor_pos, (1, 2))
+
+        self.display.clear()
+        self.lcd.calls = []
+        self.display.cursor_pos = (0, 0)
+        self.display.write_string("  x")
+        self.assertEqual(self.lcd.calls, [("cursor_pos", (0, 2)), ("write_string", "x")])
+
+    def test_line_breaks(self):
+        self.display.write_string("IP : 10.0.0.2 \n")
+        self.assertEqual(self.lcd.content(0)[:16], "IP : 10.0.0.2   ")
+        self.assertEqual(self.display.cursor_pos, (0, 15))
+        self.display.write_string("x")
+        self.assertEqual(self.lcd.content(0)[:16], "IP : 10.0.0.2  x")
+
+    def test_visible_cursor(self):
+        self.display.write_string("abc")
+        self.display.cursor_mode = "blink"
+        self.assertEqual(self.lcd.cursor_pos, (0, 3))
+        self.display.cursor_pos = (0, 1)
+        self.assertEqual(self.lcd.cursor_pos, (0, 1))
+
+
+class test_BacklightEffects(unittest.TestCase):
+
+    def setUp(self):
+        self.lcd = LcdMockup()
+        self.lcd.backlight_enabled = True
+        self.scheduler = SchedulerMockup()
+        self.display = ShadowDisplay(self.lcd, scheduler=self.scheduler)
+
+    def test_blink_until_stopped(self):
+        self.display.start_effect(blink_pattern(0.5))
+        states = [self.lcd.backlight_enabled]
+        for i in range(4):
+            self.assertEqual(self.scheduler.step(), 0.5)
+            states.append(self.lcd.backlight_enabled)
+        self.assertEqual(states, [False, True, False, True, False])
+        self.assertTrue(self.display.effect_running)
+
+        # the explicit backlight setting ends the effect
+        self.display.backlight_enabled = True
+        self.assertFalse(self.display.effect_running)
+        self.assertTrue(self.lcd.backlight_enabled)
+        self.assertTrue(self.scheduler.pending[-1].cancelled)
+
+    def test_duration(self):
+        self.display.start_effect(blink_pattern(0.5), duration=2)
+        while self.scheduler.pending:
+            self.scheduler.step()
+        self.assertFalse(self.display.effect_running)
+        self.assertTrue(self.lcd.backlight_enabled)
+
+    def test_fade_out(self):
+        self.display.start_effect(fade_pattern(2.0, steps=4), repeat=False, end_backlight=None)
+        total = 0
+        while self.scheduler.pending:
+            total += self.scheduler.step()
+        self.assertAlmostEqual(total, 2.0)
+        self.assertFalse(self.display.effect_running)
+        self.assertFalse(self.lcd.backlight_enabled)
+
+    def test_replaced_effect(self):
+        self.display.start_effect(blink_pattern(0.5))
+        self.display.start_effect(blink_pattern(0.2), duration=0.4)
+        delays = []
+        while self.scheduler.pending:
+            delays.append(self.scheduler.step())
+        self.assertEqual(delays, [0.5, 0.2, 0.2])
+        self.assertTrue(self.lcd.backlight_enabled)
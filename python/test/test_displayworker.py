@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Unitary tests of DisplayWorker
+"""
+
+import unittest
+
+from displayworker import DisplayWorker, DisplayPriority, display_priority
+from display import blink_pattern
+from radioevents import TextUpdateEvent, TextFieldType, VolumeButtonEvent
+from test_display import SchedulerMockup
+
+
+class DisplayMockup:
+    """ Replaces the ShadowDisplay, recording the writes
+    """
+    def __init__(self):
+        self.cursor_pos = (0, 0)
+        self.backlight_enabled = True
+        self.effect_running = False
+        self.writes = []
+        self.stats = {"requested_bytes": 0}
+
+    def write_string(self, text):
+        self.writes.append((self.cursor_pos, text))
+
+    def clear(self):
+        self.writes.append("clear")
+
+
+class test_DisplayWorker(unittest.TestCase):
+
+    def setUp(self):
+        self.display = DisplayMockup()
+        # the commands are queued before the worker is started, so that
+        # their order does not depend on the thread
+        self.worker = DisplayWorker(self.display)
+
+    def tearDown(self):
+        if self.worker.is_alive():
+            self.worker.stop()
+            self.worker.join()
+
+    def write(self, priority, pos, text):
+        self.worker.priority = priority
+        self.worker.cursor_pos = pos
+        self.worker.write_string(text)
+
+    def run_worker(self):
+        self.worker.start()
+        self.assertTrue(self.worker.flush(timeout=5))
+
+    def test_priority(self):
+        self.assertIs(display_priority(TextUpdateEvent("12:00", TextFieldType.SLEEP_CLOCK)),
+                      DisplayPriority.COSMETIC)
+        self.assertIs(display_priority(VolumeButtonEvent(1)), DisplayPriority.USER)
+
+        self.write(DisplayPriority.COSMETIC, (0, 15), "12:00")
+        self.write(DisplayPriority.USER, (3, 0), "Volume")
+        self.assertEqual(self.worker.cursor_pos, (3, 6))
+        self.assertEqual(self.worker.queue_depth, 2)
+        self.run_worker()
+        self.assertEqual(self.display.writes, [((3, 0), "Volume"), ((0, 15), "12:00")])
+        self.assertEqual(self.worker.queue_depth, 0)
+
+    def test_superseded_cosmetic_writes(self):
+        for text in ("Radio one   ", "adio one   R", "dio one   Ra"):
+            self.write(DisplayPriority.COSMETIC, (1, 0), text)
+        self.write(DisplayPriority.COSMETIC, (2, 0), "Track")
+        self.run_worker()
+        self.assertEqual(self.display.writes, [((1, 0), "dio one   Ra"), ((2, 0), "Track")])
+        self.assertEqual(self.worker.stats["discarded_commands"], 2)
+
+    def test_overlapping_user_write(self):
+        # the cosmetic write is sent first, else it would hide the user one
+        self.write(DisplayPriority.COSMETIC, (1, 0), "Radio one")
+        self.write(DisplayPriority.USER, (1, 2), "XY")
+        self.write(DisplayPriority.COSMETIC, (2, 0), "Track")
+        self.run_worker()
+        self.assertEqual(self.display.writes,
+                         [((1, 0), "Radio one"), ((1, 2), "XY"), ((2, 0), "Track")])
+        self.assertEqual(self.worker.stats["promoted_commands"], 1)
+
+    def test_backlight(self):
+        # read back at once, before the command is sent
+        self.worker.backlight_enabled = False
+        self.assertFalse(self.worker.backlight_enabled)
+        self.assertTrue(self.display.backlight_enabled)
+        self.run_worker()
+        self.assertFalse(self.display.backlight_enabled)
+
+    def test_effect_steps(self):
+        scheduler = SchedulerMockup()
+        self.worker = DisplayWorker(self.display, scheduler=scheduler)
+        self.worker.start_effect(blink_pattern(0.5))
+        scheduler.step()
+        scheduler.step()
+        self.write(DisplayPriority.USER, (3, 0), "Volume")
+        # only the last step of the effect is pending, after the user write
+        self.assertEqual(self.worker.queue_depth, 2)
+        self.assertTrue(self.worker.effect_running)
+        self.run_worker()
+        self.assertEqual(self.display.writes, [((3, 0), "Volume")])
+        self.assertEqual([record.priority for record in self.worker.history],
+                         [DisplayPriority.USER, DisplayPriority.COSMETIC])
+        self.assertFalse(self.display.backlight_enabled)
+        # the backlight set explicitly ends the effect
+        self.worker.backlight_enabled = True
+        self.assertFalse(self.worker.effect_running)
+        self.assertTrue(self.worker.flush(timeout=5))
+        self.assertTrue(self.display.backlight_enabled)
+        self.assertTrue(scheduler.pending[-1].cancelled)
+
+    def test_clear(self):
+        self.write(DisplayPriority.COSMETIC, (1, 0), "Radio one")
+        self.worker.priority = DisplayPriority.USER
+        self.worker.clear()
+        self.assertEqual(self.worker.cursor_pos, (0, 0))
+        self.run_worker()
+        self.assertEqual(self.display.writes, ["clear"])
+
+    def test_stats(self):
+        self.worker.start()
+        self.write(DisplayPriority.USER, (0, 0), "Hello")
+        self.worker.backlight_enabled = False
+        self.write(DisplayPriority.COSMETIC, (1, 0), "World")
+        self.assertTrue(self.worker.flush(timeout=5))
+        self.assertFalse(self.display.backlight_enabled)
+        stats = self.worker.stats
+        self.assertEqual(stats["requested_bytes"], 0)
+        self.assertEqual(stats["queue_depth"], 0)
+        self.assertGreaterEqual(stats["max_queue_depth"], 1)
+        self.assertEqual(stats["user_commands"], 2)
+        self.assertEqual(stats["cosmetic_commands"], 1)
+        self.assertGreaterEqual(stats["user_latency_max"], stats["user_latency_median"])
+        for record in self.worker.history:
+            self.assertLessEqual(record.queued, record.started)
+            self.assertLessEqual(record.started, record.done)
+
+        self.worker.stop()
+        self.worker.join(timeout=5)
+        self.assertFalse(self.worker.is_alive())
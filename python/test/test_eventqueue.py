@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Unitary tests of CoalescingQueue
+"""
+
+import unittest
+import queue
+import threading
+
+from eventqueue import CoalescingQueue
+from radioevents import TextUpdateEvent, TextFieldType, WifiEvent, StationButtonEvent
+
+
+class test_CoalescingQueue(unittest.TestCase):
+
+    def setUp(self):
+        self.queue = CoalescingQueue()
+
+    def drain(self):
+        events = []
+        while not self.queue.empty():
+            events.append(self.queue.get())
+        return events
+
+    def test_text_events_merged(self):
+        for i in range(10):
+            self.queue.put(TextUpdateEvent("title {}".format(i), TextFieldType.TRACK_TITLE))
+            self.queue.put(TextUpdateEvent("clock {}".format(i), TextFieldType.SLEEP_CLOCK))
+        self.queue.put(WifiEvent(0.2))
+        self.queue.put(WifiEvent(0.5))
+        events = self.drain()
+        self.assertEqual([event.value for event in events], ["title 9", "clock 9", 0.5])
+        self.assertEqual(self.queue.stats, {"put": 22, "merged": 19, "delivered": 3,
+                                            "pending": 0})
+
+    def test_button_order(self):
+        button1 = StationButtonEvent(1)
+        button2 = StationButtonEvent(1)
+        old_text = TextUpdateEvent("old", TextFieldType.RADIO_NAME)
+        new_text = TextUpdateEvent("new", TextFieldType.RADIO_NAME)
+        self.queue.put(old_text)
+        self.queue.put(button1)
+        self.queue.put(button2)
+        self.queue.put(new_text)
+        # the button events are never merged, and the newest text comes
+        # after the buttons pressed before it
+        self.assertEqual(self.drain(), [button1, button2, new_text])
+        self.assertEqual(self.queue.stats["merged"], 1)
+
+    def test_blocking_get(self):
+        with self.assertRaises(queue.Empty):
+            self.queue.get(timeout=0.01)
+        event = WifiEvent(1)
+        timer = threading.Timer(0.02, self.queue.put, args=[event])
+        timer.start()
+        self.assertIs(self.queue.get(timeout=1), event)
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Unitary tests of the simulated hardware
+"""
+
+import unittest
+
+from hardware import SimulatedHardware, SimulatedGpio, SoundCard, SIMULATED_ESSID
+from display import ShadowDisplay
+from powerbutton import PowerButton, PowerEvent
+from encoder import RotaryEncoder, EncoderEvent
+
+
+class test_SimulatedHardware(unittest.TestCase):
+
+    def setUp(self):
+        self.hardware = SimulatedHardware()
+        self.events = []
+
+    def callback(self, originator, event, steps=0):
+        self.events.append((event, steps))
+
+    def test_edge_detection(self):
+        gpio = self.hardware.gpio
+        gpio.setup(5, gpio.IN, pull_up_down=gpio.PUD_UP)
+        gpio.add_event_detect(5, gpio.FALLING, callback=lambda pin: self.events.append(pin))
+        self.assertEqual(gpio.input(5), gpio.HIGH)
+        gpio.set_input(5, gpio.LOW)
+        gpio.set_input(5, gpio.LOW)
+        gpio.set_input(5, gpio.HIGH)
+        self.assertEqual(self.events, [5])
+        gpio.remove_event_detect(5)
+        gpio.set_input(5, gpio.LOW)
+        self.assertEqual(self.events, [5])
+
+    def test_power_button(self):
+        button = PowerButton(self.hardware.gpio, 25, 26, self.callback)
+        self.hardware.press(25)
+        self.hardware.release(25)
+        self.assertEqual(self.events, [(PowerEvent.SWITCH_PRESSED, 0),
+                                       (PowerEvent.SWITCH_RELEASED, 0)])
+        button.led = True
+        self.assertEqual(self.hardware.gpio.input(26), SimulatedGpio.HIGH)
+        button.clear()
+
+    def test_rotary_encoder(self):
+        # without scheduler, the callback is called for each detent
+        encoder = RotaryEncoder(self.hardware.gpio, 5, 6, 4, callback=self.callback)
+        self.hardware.turn(5, 6, 2)
+        self.hardware.turn(5, 6, -1)
+        self.hardware.press(4)
+        self.assertEqual(self.events, [(EncoderEvent.CW_ROTATION, 1),
+                                       (EncoderEvent.CW_ROTATION, 1),
+                                       (EncoderEvent.CCW_ROTATION, -1),
+                                       (EncoderEvent.SWITCH_PRESSED, 0)])
+        encoder.clear()
+
+    def test_soundcard(self):
+        soundcard = SoundCard(self.hardware.gpio, 17)
+        soundcard.setup()
+        self.assertEqual(self.hardware.gpio.input(17), SimulatedGpio.LOW)
+        soundcard.enabled = True
+        self.assertEqual(self.hardware.gpio.input(17), SimulatedGpio.HIGH)
+
+    def test_lcd_traffic(self):
+        lcd = ShadowDisplay(self.hardware.create_lcd(0x27))
+        recorder = self.hardware.recorder
+        lcd.cursor_pos = (1, 2)
+        lcd.write_string("Hello")
+        self.assertEqual(self.hardware.lcd.lines[1], "  Hello             ")
+        # a cursor move and 5 characters
+        self.assertEqual(recorder.bytes_written("i2c"), 6 * ShadowDisplay.I2C_WRITES_PER_BYTE)
+        since = recorder.records("i2c")[-1].timestamp
+        lcd.cursor_pos = (1, 2)
+        lcd.write_string("Hallo")
+        self.assertEqual(recorder.count("i2c", "write_string", since=since), 2)
+        self.assertEqual(self.hardware.lcd.lines[1], "  Hallo             ")
+
+    def test_processes(self):
+        processes = self.hardware.processes
+        self.assertEqual(processes.call(["bluetoothctl", "power", "on"]), 0)
+        player = processes.Popen(["bluealsa-aplay", "00:00:00:00:00:00"])
+        self.assertIsNone(player.poll())
+        player.kill()
+        self.assertIsNotNone(player.poll())
+        self.assertEqual(self.hardware.recorder.count("process"), 2)
+
+    def test_wifi_scanner(self):
+        scanner = self.hardware.create_wifi_scanner()
+        self.assertAlmostEqual(scanner.measure_link_quality(), 56 / 70)
+        scanner.scan_wifi()
+        self.assertEqual(scanner.essid, SIMULATED_ESSID)
+        self.assertEqual(len(scanner.cells), 1)
+        # iwgetid for the interface, then iwgetid and iwlist for the scan
+        self.assertEqual(self.hardware.recorder.count("process", "popen"), 3)
+        # the interface is known : the measure spawns nothing more
+        scanner.measure_link_quality()
+        self.assertEqual(self.hardware.recorder.count("process", "popen"), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Unitary tests of MpdClient, against the fake mpd server
+"""
+
+import unittest
+import time
+import subprocess
+
+from mpdclient import MpdClient, MpdError
+from fakempd import FakeMpdServer
+
+
+class test_MpdClient(unittest.TestCase):
+    """ Unitary tests of MpdClient, against a local fake mpd server
+    """
+
+    def setUp(self):
+        self.server = FakeMpdServer()
+        self.server.start()
+        self.client = MpdClient(self.server.host, self.server.port)
+
+    def tearDown(self):
+        self.client.close()
+        self.server.stop()
+
+    def test_commands(self):
+        self.client.clear()
+        self.client.add("http://radio.example/stream one.mp3")
+        self.client.add("http://radio.example/two.mp3")
+        self.client.play(1)
+        self.client.setvol(42)
+        status = self.client.status()
+        self.assertEqual(status["volume"], "42")
+        self.assertEqual(status["state"], "play")
+        self.assertEqual(status["song"], "1")
+        self.assertEqual(self.server.queue[0], "http://radio.example/stream one.mp3")
+        # a single connection is used for all the commands
+        self.assertEqual(self.server.connections, 1)
+
+    def test_quoting(self):
+        self.client.add('a "quoted" \\ uri')
+        self.assertEqual(self.server.queue, ['a "quoted" \\ uri'])
+
+    def test_currentsong(self):
+        self.server.queue = ["http://radio.example/stream.mp3"]
+        self.server.tags = {"Name": "Radio Example", "Title": "Some title"}
+        self.assertEqual(self.client.currentsong(), {})
+        self.client.play(0)
+        song = self.client.currentsong()
+        self.assertEqual(song["Name"], "Radio Example")
+        self.assertEqual(song["Title"], "Some title")
+
+    def test_command_list(self):
+        self.client.command_list([("clear",), ("add", "uri1"), ("add", "uri2")])
+        self.assertEqual(self.server.queue, ["uri1", "uri2"])
+        songs = self.client.playlistinfo()
+        self.assertEqual([song["file"] for song in songs], ["uri1", "uri2"])
+
+    def test_error(self):
+        with self.assertRaises(MpdError):
+            self.client.play(3)
+        # the connection is still usable after an error
+        self.assertEqual(self.client.status()["state"], "stop")
+
+    def test_reconnect(self):
+        self.client.setvol(10)
+        self.server.drop_connections()
+        time.sleep(0.05)
+        self.client.setvol(30)
+        self.assertEqual(self.server.volume, 30)
+        self.assertEqual(self.server.connections, 2)
+
+    def test_lost_answer(self):
+        # a command changing the queue is not applied twice
+        self.server.lost_answers = 1
+        with self.assertRaises((OSError, EOFError)):
+            self.client.add("uri1")
+        self.assertEqual(self.server.queue, ["uri1"])
+        # the others are sent again
+        self.server.lost_answers = 1
+        self.client.setvol(30)
+        self.assertEqual(self.server.commands[-2:], ["setvol 30", "setvol 30"])
+        self.assertEqual(self.server.connections, 3)
+
+    def test_latency(self):
+        """ Mesures the cost of a command through the persistent connection,
+            and compares it with the spawn of a process
+        """
+        count = 50
+        t0 = time.perf_counter()
+        for i in range(count):
+            self.client.status()
+        t1 = time.perf_counter()
+        for i in range(count):
+            subprocess.call(["true"])
+        t2 = time.perf_counter()
+        client_ms = (t1 - t0) / count * 1000
+        spawn_ms = (t2 - t1) / count * 1000
+        print("MpdClient command : {:.3f} ms, process spawn : {:.3f} ms".format(client_ms,
+                                                                               spawn_ms))
+        self.assertLess(client_ms, spawn_ms)
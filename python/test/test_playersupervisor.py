@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Unitary tests of PlayerSupervisor
+"""
+
+import unittest
+from threading import Condition
+
+from hardware import BusRecorder, SimulatedProcessRunner
+from playersupervisor import PlayerSupervisor, PlayerStatus
+
+
+class FailingRunner(SimulatedProcessRunner):
+    """ A process runner which cannot find the command
+    """
+    def Popen(self, args, stdout=None, **kwargs):
+        raise FileNotFoundError(args[0])
+
+
+class test_PlayerSupervisor(unittest.TestCase):
+
+    def setUp(self):
+        self.condition = Condition()
+        self.statuses = []
+
+    def callback(self, originator, status):
+        with self.condition:
+            self.statuses.append(status)
+            self.condition.notify_all()
+
+    def wait_statuses(self, count):
+        with self.condition:
+            return self.condition.wait_for(lambda: len(self.statuses) >= count, 5)
+
+    def test_restart(self):
+        runner = SimulatedProcessRunner(BusRecorder())
+        supervisor = PlayerSupervisor(runner, callback=self.callback,
+                                      min_backoff=0.01, max_backoff=0.05)
+        supervisor.start()
+        self.assertTrue(self.wait_statuses(1))
+        self.assertTrue(supervisor.running)
+        # the player dies : it is started again
+        runner.processes[0].kill()
+        self.assertTrue(self.wait_statuses(3))
+        self.assertEqual(self.statuses[:3], [PlayerStatus.STARTED, PlayerStatus.DIED,
+                                             PlayerStatus.STARTED])
+        self.assertEqual(supervisor.start_count, 2)
+        supervisor.stop()
+        supervisor.join(5)
+        self.assertFalse(supervisor.is_alive())
+        self.assertIsNotNone(runner.processes[-1].poll())
+        self.assertEqual(len(runner.processes), 2)
+
+    def test_spawn_failure(self):
+        supervisor = PlayerSupervisor(FailingRunner(BusRecorder()), callback=self.callback,
+                                      min_backoff=0.01, max_backoff=0.02)
+        supervisor.start()
+        self.assertTrue(self.wait_statuses(3))
+        supervisor.stop()
+        supervisor.join(5)
+        self.assertEqual(set(self.statuses), {PlayerStatus.SPAWN_FAILED})
+        self.assertEqual(supervisor.start_count, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
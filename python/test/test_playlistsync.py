@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Unitary tests of the playlist synchronisation
+"""
+
+import unittest
+import random
+
+from mpdclient import MpdClient
+from fakempd import FakeMpdServer
+from playlistsync import playlist_commands, sync_playlist
+
+
+def apply_commands(current, commands):
+    queue = list(current)
+    for command in commands:
+        if command[0] == "delete":
+            del queue[command[1]]
+        elif command[0] == "addid":
+            queue.insert(command[2], command[1])
+        elif command[0] == "move":
+            queue.insert(command[2], queue.pop(command[1]))
+    return queue
+
+
+class test_PlaylistSync(unittest.TestCase):
+
+    def test_unchanged(self):
+        self.assertEqual(playlist_commands(["a", "b", "c"], ["a", "b", "c"]), [])
+
+    def test_minimal_commands(self):
+        self.assertEqual(playlist_commands(["a", "b", "c"], ["a", "x", "c"]),
+                         [("delete", 1), ("addid", "x", 1)])
+        self.assertEqual(playlist_commands(["a", "b", "c"], ["a", "b", "c", "d"]),
+                         [("addid", "d", 3)])
+        self.assertEqual(playlist_commands(["a", "b", "c", "d"], ["d", "a", "b", "c"]),
+                         [("move", 3, 0)])
+
+    def test_random_playlists(self):
+        generator = random.Random(42)
+        for i in range(500):
+            current = [generator.choice("abcdefg") for j in range(generator.randint(0, 8))]
+            target = [generator.choice("abcdefg") for j in range(generator.randint(0, 8))]
+            self.assertEqual(apply_commands(current, playlist_commands(current, target)),
+                             target)
+
+    def test_sync_keeps_playing(self):
+        server = FakeMpdServer()
+        server.start()
+        self.addCleanup(server.stop)
+        client = MpdClient(server.host, server.port)
+        self.addCleanup(client.close)
+        server.queue = ["a", "b", "c", "d"]
+        client.play(2)
+        commands = sync_playlist(client, ["x", "a", "c", "d", "e"])
+        self.assertEqual(len(commands), 3)
+        self.assertEqual(server.queue, ["x", "a", "c", "d", "e"])
+        # "c" is still played, at its new position
+        self.assertEqual(server.state, "play")
+        self.assertEqual(server.song_pos, 2)
+        self.assertEqual(sync_playlist(client, ["x", "a", "c", "d", "e"]), [])
+
+    def test_startup_unchanged(self):
+        server = FakeMpdServer()
+        server.start()
+        self.addCleanup(server.stop)
+        client = MpdClient(server.host, server.port)
+        self.addCleanup(client.close)
+        stations = ["http://radio{}.example/stream".format(i) for i in range(200)]
+        server.queue = list(stations)
+        self.assertEqual(sync_playlist(client, stations), [])
+        # the queue is only read
+        self.assertEqual(server.commands, ["playlistinfo"])
+        server.commands = []
+        sync_playlist(client, stations[:100] + ["http://new.example/stream"] + stations[100:])
+        self.assertEqual(server.commands,
+                         ["playlistinfo", "addid http://new.example/stream 100"])
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Unitary tests of the scenario replay
+"""
+
+import unittest
+import threading
+
+from radioevents import PowerButtonEvent, VolumeButtonEvent
+from powerbutton import PowerEvent
+from encoder import EncoderEvent
+from replay import parse_scenario, percentile, replay, SCENARIOS
+
+
+class test_Replay(unittest.TestCase):
+
+    def test_parse_scenario(self):
+        entries = parse_scenario("""
+            # power on, then turn the volume down
+            0.5 volume ccw 3
+            0.0 power pressed
+            """)
+        self.assertEqual(entries, [(0.0, PowerButtonEvent, PowerEvent.SWITCH_PRESSED, 0),
+                                   (0.5, VolumeButtonEvent, EncoderEvent.CCW_ROTATION, -3)])
+        for scenario in SCENARIOS.values():
+            self.assertTrue(parse_scenario(scenario))
+
+    def test_malformed_scenario(self):
+        for text in ("0.0 power cw", "0.0 mute pressed", "0.0 volume", "soon power pressed"):
+            with self.assertRaises(ValueError):
+                parse_scenario(text)
+
+    def test_percentile(self):
+        self.assertIsNone(percentile([], 0.5))
+        self.assertEqual(percentile([3, 1, 2, 4], 0.5), 2)
+        self.assertEqual(percentile(list(range(1, 101)), 0.99), 99)
+
+    def test_replay_power_on(self):
+        threads = threading.active_count()
+        result = replay("webradio.cfg", parse_scenario(SCENARIOS["power on"]),
+                        settle_time=0.3)
+        self.assertEqual(result["handled"], 2)
+        self.assertGreater(result["lcd_bytes"], 0)
+        self.assertIsNotNone(result["latency_p99"])
+        # the radio stopped all its threads
+        self.assertEqual(threading.active_count(), threads)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Unitary tests of Resources
+"""
+
+import unittest
+import configparser
+import tempfile
+import os
+import datetime
+
+from resources import Resources
+
+CONFIG_PATH = os.path.join(os.path.dirname(__file__), "..", "webradio.cfg")
+
+class test_Resources(unittest.TestCase):
+    """ Unitary tests of Resources, with the configuration file of the radio
+    """
+
+    def setUp(self):
+        self.rsc = Resources(CONFIG_PATH)
+
+    def write_config(self, content="", removed=(), path=None):
+        """ Writes the configuration file of the radio, updated with the
+            entries of content. removed holds the (section, entry) to
+            remove, or (section,) for a whole section.
+            Returns the path of the file
+        """
+        parser = configparser.RawConfigParser()
+        parser.read(CONFIG_PATH, encoding="utf-8")
+        for removal in removed:
+            if len(removal) == 1:
+                parser.remove_section(removal[0])
+            else:
+                parser.remove_option(*removal)
+        changes = configparser.RawConfigParser()
+        changes.read_string(content)
+        for section in changes.sections():
+            if not parser.has_section(section):
+                parser.add_section(section)
+            for entry, value in changes.items(section):
+                parser.set(section, entry, value)
+        if path is None:
+            config = tempfile.NamedTemporaryFile("w", suffix=".cfg", delete=False)
+            path = config.name
+            config.close()
+            self.addCleanup(os.remove, path)
+        with open(path, "w", encoding="utf-8") as config:
+            parser.write(config)
+        return path
+
+    def test_types(self):
+        self.assertEqual(self.rsc.welcome_msg, "Hello, folks!")
+        self.assertEqual(self.rsc.lcd_address, 0x27)
+        self.assertEqual(self.rsc.station_button, (27, 4, 17))
+        self.assertEqual(self.rsc.mute_gpio, 16)
+        self.assertEqual(self.rsc.scroll_rate, 0.7)
+        self.assertEqual(self.rsc.mpd_port, 6600)
+        self.assertEqual(self.rsc.clock_format, "%H:%M")
+        self.assertEqual(self.rsc.get_i18n(Resources.VOLUME_MSG_ENTRY), "Volume {}")
+        self.assertEqual(len(self.rsc.playlist), 20)
+        self.assertEqual(self.rsc.playlist[1],
+                         ("radio en construction", "http://str0.creacast.com/rec"))
+        self.assertEqual(len(self.rsc.sleep_lines), 3)
+
+    def test_immutable(self):
+        with self.assertRaises(AttributeError):
+            self.rsc.snapshot.mute_gpio = 0
+        with self.assertRaises(TypeError):
+            self.rsc.snapshot.i18n["volume"] = ""
+        with self.assertRaises(AttributeError):
+            self.rsc.mute_gpio = 0
+
+    def test_invalid_value(self):
+        path = self.write_config("[hardware]\nstation_button: 27, 4, seventeen\n")
+        with self.assertRaises(ValueError):
+            Resources(path)
+
+    def test_defaults(self):
+        path = self.write_config("[general]\nwelcome_msg: A very long welcome message\n",
+                                 removed=[("hardware", "lcd_address"), ("mpd",), ("sleep",),
+                                          ("dated_messages",)])
+        rsc = Resources(path)
+        self.assertEqual(rsc.welcome_msg, "A very long welc")
+        self.assertEqual(rsc.lcd_address, 0x27)
+        self.assertEqual(rsc.mpd_host, Resources.DEFAULT_MPD_HOST)
+        self.assertEqual(rsc.sleep_lines, ())
+        self.assertEqual(len(rsc.snapshot.dated_msgs), 0)
+
+    def test_missing_entries(self):
+        for removal in [("general", "volume_increment"), ("hardware", "mute"),
+                        ("i18n", "volume"), ("playlist",), ("random_messages",)]:
+            with self.assertRaises(ValueError):
+                Resources(self.write_config(removed=[removal]))
+
+    def test_dated_msgs(self):
+        today = datetime.date.today()
+        tomorrow = today + datetime.timedelta(days=1)
+        path = self.write_config("""[dated_messages]
+{d:%d/%m}: every year
+{d:%d/%m} grandma: happy birthday
+{d:%d/%m}/{next_year}: next year only
+{d:%d/%m}/{d.year}: this year only
+{t:%d/%m}: tomorrow
+""".format(d=today, t=tomorrow, next_year=today.year + 1), removed=[("dated_messages",)])
+        rsc = Resources(path)
+        self.assertEqual(set(rsc.today_msgs),
+                         {"every year", "happy birthday", "this year only"})
+        self.assertIn(rsc.today_msg, rsc.today_msgs)
+
+    def test_date_ranges(self):
+        path = self.write_config("""[dated_messages]
+24/12-02/01: holidays
+01/06/2027-03/06/2027: trip
+""", removed=[("dated_messages",)])
+        index = Resources(path).snapshot.dated_msgs
+        self.assertEqual(index[(12, 31)], ((None, "holidays"),))
+        self.assertEqual(index[(1, 2)], ((None, "holidays"),))
+        self.assertNotIn((1, 3), index)
+        self.assertEqual(index[(6, 2)], ((2027, "trip"),))
+
+    def test_invalid_date(self):
+        with self.assertRaises(ValueError):
+            Resources(self.write_config("[dated_messages]\n31/02: never\n"))
+
+    def test_reload(self):
+        path = self.write_config("[general]\nwelcome_msg: Hello\n")
+        rsc = Resources(path)
+        self.assertIsNone(rsc.reload_if_changed())
+        snapshot = rsc.snapshot
+        self.write_config("[general]\nwelcome_msg: Good morning\n", path=path)
+        os.utime(path, ns=(0, 1))
+        self.assertIs(rsc.reload_if_changed(), snapshot)
+        self.assertEqual(rsc.welcome_msg, "Good morning")
+        # an invalid file is ignored
+        self.write_config("[hardware]\nmute: none\n", path=path)
+        os.utime(path, ns=(0, 2))
+        self.assertIsNone(rsc.reload_if_changed())
+        self.assertEqual(rsc.welcome_msg, "Good morning")
+        # as well as a file missing required entries
+        snapshot = rsc.snapshot
+        for times, removal in [(3, ("general", "volume_increment")), (4, ("playlist",))]:
+            self.write_config(removed=[removal], path=path)
+            os.utime(path, ns=(0, times))
+            self.assertIsNone(rsc.reload_if_changed())
+            self.assertIs(rsc.snapshot, snapshot)
+            self.assertEqual(len(rsc.playlist), 20)
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Unitary tests of ScanCache
+"""
+
+import unittest
+import time
+
+from scancache import ScanCache
+from wifiscanner import WifiScanner
+from test_wifiscanner import ProbeMockup
+
+
+class test_ScanCache(unittest.TestCase):
+
+    def setUp(self):
+        self.scan_count = 0
+        self.notified = []
+
+    def scanner_factory(self):
+        self.scan_count += 1
+        return WifiScanner(ProbeMockup())
+
+    def test_refresh(self):
+        cache = ScanCache(self.notified.append, ttl=60, scanner_factory=self.scanner_factory)
+        self.assertFalse(cache.is_fresh())
+        self.assertEqual(cache.cells, [])
+        cache.refresh_if_stale()
+        cache.join(1)
+        self.assertTrue(cache.is_fresh())
+        self.assertEqual([cell.essid for cell in cache.cells], ["My Wifi Network", "Ouaisouais"])
+        self.assertEqual(cache.essid, "My Wifi Network")
+        self.assertEqual(self.notified, [cache])
+        # the result is reused until the ttl expires
+        cache.refresh_if_stale()
+        cache.join(1)
+        self.assertEqual(self.scan_count, 1)
+
+    def test_ttl(self):
+        cache = ScanCache(ttl=0.05, scanner_factory=self.scanner_factory)
+        cache.update([], "")
+        self.assertTrue(cache.is_fresh())
+        time.sleep(0.06)
+        self.assertFalse(cache.is_fresh())
+        cache.refresh_if_stale()
+        cache.join(1)
+        self.assertEqual(self.scan_count, 1)
+        self.assertEqual(len(cache.cells), 2)
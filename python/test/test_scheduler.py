@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Unitary tests of Scheduler
+"""
+
+import unittest
+import time
+import threading
+
+from scheduler import Scheduler
+
+
+class test_Scheduler(unittest.TestCase):
+    """ Unitary tests of the Scheduler
+    """
+
+    def setUp(self):
+        self.scheduler = Scheduler()
+        self.calls = []
+
+    def tearDown(self):
+        self.scheduler.stop()
+
+    def callback(self):
+        self.calls.append(time.monotonic())
+
+    def test_no_drift(self):
+        """ The callbacks follow the deadlines, even if they take time
+        """
+        def slow_callback():
+            self.callback()
+            time.sleep(0.005)
+        self.scheduler.schedule_periodic(0.02, slow_callback)
+        time.sleep(0.21)
+        self.assertGreaterEqual(len(self.calls), 10)
+        total = self.calls[10] - self.calls[0]
+        self.assertAlmostEqual(total, 0.2, delta=0.01)
+
+    def test_pause_resume(self):
+        task = self.scheduler.schedule_periodic(0.01, self.callback)
+        time.sleep(0.05)
+        task.pause()
+        count = len(self.calls)
+        time.sleep(0.05)
+        self.assertEqual(len(self.calls), count)
+        task.resume(delay=0.03)
+        time.sleep(0.02)
+        self.assertEqual(len(self.calls), count)
+        time.sleep(0.03)
+        self.assertGreater(len(self.calls), count)
+        task.cancel()
+        count = len(self.calls)
+        task.resume()
+        time.sleep(0.03)
+        self.assertEqual(len(self.calls), count)
+
+    def test_pause_from_callback(self):
+        def callback():
+            self.callback()
+            task.pause()
+        task = self.scheduler.schedule_periodic(0.01, callback)
+        time.sleep(0.05)
+        self.assertEqual(len(self.calls), 1)
+
+    def test_single_thread(self):
+        """ All the tasks are called from the same thread, and an error in
+            a callback does not stop the scheduler
+        """
+        threads = set()
+        def failing_callback():
+            raise RuntimeError("Expected error")
+        def callback():
+            threads.add(threading.current_thread())
+        count = threading.active_count()
+        self.scheduler.schedule_periodic(0.01, failing_callback)
+        for i in range(10):
+            self.scheduler.schedule_periodic(0.01, callback)
+        time.sleep(0.05)
+        self.assertEqual(len(threads), 1)
+        self.assertLessEqual(threading.active_count(), count + 1)
@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Unitary tests of StartupProfiler
+"""
+
+import unittest
+import time
+
+from startupprofiler import StartupProfiler
+
+
+class test_StartupProfiler(unittest.TestCase):
+
+    def test_phases(self):
+        profiler = StartupProfiler()
+        with profiler.phase("first"):
+            time.sleep(0.02)
+        with self.assertRaises(ValueError):
+            with profiler.phase("failed"):
+                raise ValueError()
+        self.assertEqual([name for name, duration in profiler.phases], ["first", "failed"])
+        self.assertGreaterEqual(profiler.phases[0][1], 0.02)
+        self.assertGreaterEqual(profiler.elapsed(), 0.02)
+        self.assertEqual(len(profiler.report_lines()), 4)
+
+    def test_disabled(self):
+        profiler = StartupProfiler(enabled=False)
+        with profiler.phase("first"):
+            pass
+        self.assertEqual(profiler.phases, [])
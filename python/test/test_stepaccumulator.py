@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Unitary tests of StepAccumulator
+"""
+
+import unittest
+import time
+
+from stepaccumulator import StepAccumulator
+from scheduler import Scheduler
+
+
+class test_StepAccumulator(unittest.TestCase):
+
+    def setUp(self):
+        self.scheduler = Scheduler()
+        self.steps = []
+
+    def tearDown(self):
+        self.scheduler.stop()
+
+    def test_net_steps(self):
+        accumulator = StepAccumulator(self.steps.append, self.scheduler, window=0.05)
+        for i in range(10):
+            accumulator.add(1)
+        accumulator.add(-1)
+        time.sleep(0.15)
+        self.assertEqual(self.steps, [9])
+
+    def test_no_scheduler(self):
+        accumulator = StepAccumulator(self.steps.append)
+        accumulator.add(1)
+        accumulator.add(-1)
+        self.assertEqual(self.steps, [1, -1])
+
+    def test_acceleration(self):
+        accumulator = StepAccumulator(self.steps.append, self.scheduler, window=0.05,
+                                      max_acceleration=4)
+        # slow rotation : no acceleration
+        for i in range(3):
+            accumulator.add(-1)
+            time.sleep(0.1)
+        self.assertEqual(self.steps, [-1, -1, -1])
+        # long fast rotation : accelerated, up to max_acceleration
+        self.steps.clear()
+        for i in range(60):
+            accumulator.add(1)
+        time.sleep(0.15)
+        self.assertGreater(self.steps[0], 120)
+        self.assertLessEqual(self.steps[0], 240)
+
+    def test_short_flick(self):
+        # with an increment of 10, a fast flick of 3 detents moves the
+        # volume by 30 % at most, not 90 %
+        accumulator = StepAccumulator(self.steps.append, self.scheduler, window=0.05,
+                                      max_acceleration=4)
+        for i in range(3):
+            accumulator.add(-1)
+        time.sleep(0.15)
+        self.assertEqual(self.steps, [-3])
+
+    def test_cancel(self):
+        accumulator = StepAccumulator(self.steps.append, self.scheduler, window=0.05)
+        accumulator.add(1)
+        accumulator.cancel()
+        time.sleep(0.1)
+        self.assertEqual(self.steps, [])
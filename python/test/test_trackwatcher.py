@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Unitary tests of TrackWatcher
+"""
+
+import unittest
+import time
+from threading import Event
+
+from mpdclient import MpdClient
+from fakempd import FakeMpdServer
+from trackwatcher import TrackWatcher
+
+
+class test_TrackWatcher(unittest.TestCase):
+    """ Unitary tests of TrackWatcher, against a local fake mpd server
+    """
+
+    def setUp(self):
+        self.server = FakeMpdServer()
+        self.server.start()
+        self.server.queue = ["http://radio.example/stream.mp3"]
+        self.server.tags = {"Name": "Radio Example"}
+        self.client = MpdClient(self.server.host, self.server.port)
+        self.client.play(0)
+        self.songs = []
+        self.changed = Event()
+
+    def tearDown(self):
+        self.client.close()
+        self.server.stop()
+
+    def song_callback(self, originator, song):
+        self.songs.append(song)
+        self.changed.set()
+
+    def wait_change(self):
+        self.assertTrue(self.changed.wait(1), "The change was not notified")
+        self.changed.clear()
+
+    def test_title_pushed(self):
+        watcher = TrackWatcher(self.client.clone(), self.song_callback)
+        watcher.start()
+        self.wait_change()
+        self.assertEqual(watcher.radio_name, "Radio Example")
+        self.assertEqual(watcher.title, "")
+
+        self.server.set_tags(Name="Radio Example", Title="First title")
+        self.wait_change()
+        self.assertEqual(watcher.title, "First title")
+        self.server.set_tags(Name="Radio Example", Title="Second title")
+        self.wait_change()
+        self.assertEqual(watcher.title, "Second title")
+
+        # nothing is fetched while nothing changes
+        before = self.server.commands.count("currentsong")
+        time.sleep(0.2)
+        self.assertEqual(self.server.commands.count("currentsong"), before)
+        self.assertEqual(len(self.songs), 3)
+
+        watcher.stop()
+        watcher.join(1)
+        self.assertFalse(watcher.is_alive())
+
+    def test_reconnect(self):
+        watcher = TrackWatcher(self.client.clone(), self.song_callback, retry_delay=0.05)
+        watcher.start()
+        self.wait_change()
+        self.server.drop_connections()
+        time.sleep(0.2)
+        self.server.set_tags(Name="Radio Example", Title="After reconnection")
+        self.wait_change()
+        self.assertEqual(watcher.title, "After reconnection")
+        watcher.stop()
+        watcher.join(1)
+        self.assertFalse(watcher.is_alive())
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Unitary tests of VolumeApplier
+"""
+
+import unittest
+import time
+
+from mpdclient import MpdClient
+from fakempd import FakeMpdServer
+from volumeapplier import VolumeApplier
+
+
+class test_VolumeApplier(unittest.TestCase):
+    """ Unitary tests of VolumeApplier, against a local fake mpd server
+    """
+
+    def setUp(self):
+        self.server = FakeMpdServer()
+        self.server.start()
+        self.applier = VolumeApplier(MpdClient(self.server.host, self.server.port),
+                                     min_interval=0.05)
+        self.applier.start()
+
+    def tearDown(self):
+        self.applier.stop()
+        self.applier.join(1)
+        self.server.stop()
+
+    def setvol_count(self):
+        return len([command for command in self.server.commands
+                    if command.startswith("setvol")])
+
+    def test_spin(self):
+        # 100 detents during about 0.2 second
+        start = time.monotonic()
+        for volume in range(100):
+            self.applier.set_volume(volume + 1)
+            time.sleep(0.002)
+        duration = time.monotonic() - start
+        self.assertTrue(self.applier.wait_applied(1))
+        self.assertEqual(self.server.volume, 100)
+        # one command per interval, plus the first and the last one
+        self.assertLessEqual(self.setvol_count(), duration / 0.05 + 2)
+        self.assertLess(self.setvol_count(), 20)
+        self.assertEqual(self.setvol_count(), self.applier.applied_count)
+
+    def test_last_volume_on_stop(self):
+        self.applier.set_volume(10)
+        self.applier.set_volume(42)
+        self.applier.stop()
+        self.applier.join(1)
+        self.assertEqual(self.server.volume, 42)
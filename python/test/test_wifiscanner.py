@@ -80,6 +80,19 @@ class ProbeMockup():
                     IE: Unknown: DD180050F2020101000003A4000027A4000042435E0062322F00\n\
                     IE: Unknown: DD050016328000\n\
                     IE: Unknown: DD080050F21102000000\n"
+    def iter_iwlist(self, interface="wlan0"):
+        self.closed = False
+        self.line_count = 0
+        try:
+            for line in self.get_iwlist(interface).split("\n"):
+                self.line_count += 1
+                yield line
+        finally:
+            self.closed = True
+    def get_wireless_stats(self):
+        return "Inter-| sta-|   Quality        |   Discarded packets               | Missed | WE\n\
+ face | tus | link level noise |  nwid  crypt   frag  retry   misc | beacon | 22\n\
+ wlan0: 0000   51.  -59.  -256        0      0      0      0      0        0\n"
 
 
 class test_WifiScanner(unittest.TestCase):
@@ -121,6 +134,7 @@ class test_WifiScanner(unittest.TestCase):
         probe = WifiProbe()
         self.assertIsNotNone(probe.get_iwgetid())
         self.assertIsNotNone(probe.get_iwlist())
+        self.assertIsNotNone(probe.get_wireless_stats())
 
 
     def test_WifiCell(self):
@@ -153,4 +167,30 @@ class test_WifiScanner(unittest.TestCase):
 
         self.assertTrue(True)
 
+    def test_current_only(self):
+        probe = ProbeMockup()
+        scanner = WifiScanner(probe)
+        scanner.scan_wifi(current_only=True)
+        # the connected cell is the first one : the scan is stopped when
+        # the second one begins
+        self.assertEqual(scanner.current_cell.essid, "My Wifi Network")
+        self.assertEqual(len(scanner.cells), 1)
+        self.assertTrue(probe.closed)
+        self.assertLess(probe.line_count, len(probe.get_iwlist().split("\n")))
+
+    def test_link_quality(self):
+        scanner = WifiScanner(ProbeMockup())
+        self.assertAlmostEqual(scanner.measure_link_quality(), 51./70.)
+        # unknown interface : the caller shall scan
+        self.assertIsNone(scanner.measure_link_quality("wlan1"))
+
+    def test_detected_interface(self):
+        probe = ProbeMockup()
+        probe.get_iwgetid = lambda: "wlan1     ESSID:\"My Wifi Network\""
+        probe.get_wireless_stats = lambda: ProbeMockup.get_wireless_stats(probe).replace(
+            "wlan0:", "wlan1:")
+        scanner = WifiScanner(probe)
+        self.assertEqual(scanner.interface, "wlan1")
+        self.assertAlmostEqual(scanner.measure_link_quality(), 51./70.)
+
 
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Follows the track played by mpd through its idle notifications
+"""
+
+from threading import Thread, Event, Lock
+import logging
+
+from mpdclient import MpdError
+
+
+class TrackWatcher(Thread):
+    """ A thread that waits for the 'player' notifications of mpd and
+        keeps the name of the radio and the title of the current track.
+
+        Nothing is polled : the thread is blocked in the mpd 'idle'
+        command, and the current song is fetched only when mpd tells
+        that something changed.
+        The callback is called with (originator, song) each time the name
+        or the title changes. song is the dict returned by 'currentsong'.
+
+        The mpd client given to the watcher shall be dedicated to it,
+        because an idle connection cannot be used for other commands.
+    """
+
+    def __init__(self, mpd, callback, retry_delay=5):
+        Thread.__init__(self)
+        self.logger = logging.getLogger(type(self).__name__)
+        self._mpd = mpd
+        self._callback = callback
+        self._retry_delay = retry_delay
+        self._lock = Lock()
+        self._stopping = False
+        self._stop_event = Event()
+        self.radio_name = ""
+        self.title = ""
+
+    def stop(self):
+        """ Stops the thread
+        """
+        with self._lock:
+            self._stopping = True
+            self._stop_event.set()
+            try:
+                self._mpd.noidle()
+            except OSError:
+                # the connection is already broken, run() will stop by itself
+                pass
+
+    def run(self):
+        while True:
+            try:
+                self._update(self._mpd.currentsong())
+                with self._lock:
+                    if self._stopping:
+                        break
+                    self._mpd.send_idle("player")
+                self._mpd.fetch_idle()
+            except (OSError, EOFError, MpdError) as error:
+                self.logger.warning("Connection to mpd failed : %s", error)
+                self._mpd.close()
+                if self._stop_event.wait(self._retry_delay):
+                    break
+        self._mpd.close()
+        self.logger.debug("Track watcher stopped")
+
+    def _update(self, song):
+        name = song.get("Name", "").strip()
+        title = song.get("Title", "").strip()
+        if name != self.radio_name or title != self.title:
+            self.radio_name = name
+            self.title = title
+            self.logger.debug("Current song changed : %s / %s", name, title)
+            self._callback(self, song)
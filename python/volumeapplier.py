@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Sends the volume to mpd from a background thread
+"""
+
+from threading import Thread, Condition
+import time
+import logging
+
+from mpdclient import MpdError
+
+# Minimum delay between two volume commands sent to the mixer, in seconds
+MIN_INTERVAL = 0.1
+
+
+class VolumeApplier(Thread):
+    """ A thread sending the volume to mpd, so that the event loop does not
+        wait for the mixer when the volume knob is turned.
+
+        set_volume() only records the target level. The thread sends the
+        latest target, at most once every min_interval seconds : the
+        intermediate levels are never sent, but the last one always is,
+        even when the applier is stopped.
+
+        The mpd client given to the applier should be dedicated to it.
+    """
+
+    def __init__(self, mpd, min_interval=MIN_INTERVAL):
+        Thread.__init__(self, daemon=True)
+        self.logger = logging.getLogger(type(self).__name__)
+        self._mpd = mpd
+        self._min_interval = min_interval
+        self._condition = Condition()
+        self._target = None
+        self._applying = False
+        self._stopping = False
+        self.applied_count = 0
+
+    def set_volume(self, volume):
+        """ Sets the volume to apply, replacing the one not applied yet
+        """
+        with self._condition:
+            self._target = volume
+            self._condition.notify_all()
+
+    def wait_applied(self, timeout=None):
+        """ Waits until the last volume given is sent to the mixer.
+            Returns False in case of timeout
+        """
+        with self._condition:
+            return self._condition.wait_for(
+                lambda: self._target is None and not self._applying, timeout)
+
+    def stop(self):
+        """ Stops the thread, once the pending volume is applied
+        """
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+
+    def run(self):
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._target is not None or self._stopping)
+                if self._target is None:
+                    break
+                volume = self._target
+                self._target = None
+                self._applying = True
+            start = time.monotonic()
+            try:
+                self._mpd.setvol(volume)
+                self.applied_count += 1
+            except (OSError, EOFError, MpdError) as error:
+                self.logger.warning("Cannot set the volume to %s : %s", volume, error)
+            with self._condition:
+                self._applying = False
+                self._condition.notify_all()
+                if not self._stopping:
+                    # rate limit, the target may change meanwhile
+                    self._condition.wait_for(lambda: self._stopping,
+                                             self._min_interval - (time.monotonic() - start))
+        self._mpd.close()
+        self.logger.debug("Volume applier stopped")
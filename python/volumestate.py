@@ -6,21 +6,16 @@ Created on Sun Oct 28 16:46:44 2018
 @author: Sebastien ROY
 """
 
-import subprocess
-from threading import Timer
 import logging
 
 
 from radiostate import RadioState
 from radioevents import VolumeTimeoutEvent, VolumeButtonEvent
-from encoder import EncoderEvent
 from resources import Resources
+from mpdclient import MpdError
 
-
-
-def timeout_callback(event_queue):
-    event = VolumeTimeoutEvent()
-    event_queue.put(event)
+# The volume used when mpd cannot tell it
+DEFAULT_VOLUME = 20
 
 
 class VolumeState(RadioState):
@@ -29,37 +24,62 @@ class VolumeState(RadioState):
         self.logger = logging.getLogger(type(self).__name__)
         # Timeout thread
         self._timeout = None
-        self._timeout_value = ctxt.rsc.volume_timeout
-        self._increment = ctxt.rsc.volume_increment
-        # initialize volume from mpc
+        # the volume is read from mpd when it is first needed
+        self._volume = None
+        # the actions waiting for the volume to be read
+        self._pending = []
+        self._active = False
+
+    def _with_volume(self, action):
+        """ Calls the action once the volume is known. It is read from mpd
+            by the caller of the context, out of the asyncio event loop
+        """
+        if self._volume is not None:
+            action()
+            return
+        self._pending.append(action)
+        if len(self._pending) == 1:
+            self._ctxt.caller.call(self._read_volume, callback=self._volume_read)
+
+    def _read_volume(self):
         try:
-            proc = subprocess.Popen(["mpc", "volume"],
-                                    stdout=subprocess.PIPE,
-                                    universal_newlines=True)
-            out, err = proc.communicate()
-            self._volume = int(out.split(":")[1].strip().strip("%"))
-        except:
-            self._volume = 20
-
+            status = self._ctxt.mpd.status()
+        except (OSError, EOFError, MpdError) as error:
+            self.logger.warning("Cannot read the volume : %s", error)
+            return DEFAULT_VOLUME
+        # without mixer, mpd gives no volume or -1
+        volume = int(status.get("volume", -1))
+        return volume if volume >= 0 else DEFAULT_VOLUME
+
+    def _volume_read(self, volume):
+        self._volume = volume
+        pending, self._pending = self._pending, []
+        for action in pending:
+            action()
 
     def enter_state(self):
         self.logger.debug("Entering state")
-        self.display_volume()
+        self._active = True
+        self._with_volume(self.display_volume)
         self._reset_timer()
         return
 
     def leave_state(self):
         self.logger.debug("Leaving state")
+        self._active = False
         return
 
     def handle_event(self, event):
         if type(event) is VolumeButtonEvent:
-            self.increment(event.value)
-            self.display_volume()
+            self.increment(event.steps)
+            self._with_volume(self.display_volume)
             self._reset_timer()
         return
 
     def display_volume(self):
+        if not self._active:
+            # the volume was read after the state was left
+            return
         # line 2 is empty
         self._ctxt.lcd.cursor_pos = (2, 0)
         self._ctxt.lcd.write_string(" ".ljust(20))
@@ -69,12 +89,12 @@ class VolumeState(RadioState):
         self._ctxt.lcd.write_string(msg.format(int(self._volume)).ljust(20))
         return
 
-    def increment(self, value):
-        # increment or decrement
-        if value == EncoderEvent.CCW_ROTATION :
-            self._volume -= self._increment
-        elif value == EncoderEvent.CW_ROTATION:
-            self._volume += self._increment
+    def increment(self, steps):
+        self._with_volume(lambda: self._increment(steps))
+
+    def _increment(self, steps):
+        # increment or decrement, by the net number of steps of the knob
+        self._volume += steps * self._ctxt.rsc.volume_increment
         # correction if out of bounds
         if self._volume < 0:
             self._volume = 0
@@ -86,15 +106,17 @@ class VolumeState(RadioState):
 
     def set_volume(self):
         vol = int(self._volume)
-        self.logger.debug("Setting volume : %s %s %s", "mpc", "volume", str(vol))
-        subprocess.call(["mpc", "volume", str(vol)])
+        self.logger.debug("Setting volume : %s", vol)
+        # the lcd is updated at once, the mixer by the applier thread
+        self._ctxt.volume_applier.set_volume(vol)
         return
 
     def _reset_timer(self):
         if self._timeout is not None:
             self._timeout.cancel()
-        self._timeout = Timer(self._timeout_value,
-                              timeout_callback,
-                              args=[self._ctxt.event_queue])
-        self._timeout.start()
+        self._timeout = self._ctxt.scheduler.call_later(self._ctxt.rsc.volume_timeout,
+                                                        self._timeout_callback)
+
+    def _timeout_callback(self):
+        self._ctxt.event_queue.put(VolumeTimeoutEvent())
 
@@ -8,10 +8,13 @@ Created on Sat Sep 15 16:36:16 2018
 
 import subprocess
 import re
+import logging
 
 import time
 
 interface = "wlan0"
+# Maximum of the link quality given by the drivers in /proc/net/wireless
+LINK_QUALITY_MAX = 70.0
 
 
 class WifiCell:
@@ -28,13 +31,12 @@ class WifiCell:
             frequency
     """
 
-    _cell_pattern = re.compile("(?<=Cell).*")
-    _address_pattern = re.compile("(?<=Address:).*")
-    _channel_pattern = re.compile("(?<=Channel:).*")
-    _frequency_pattern = re.compile("(?<=Frequency:).*")
-    _quality_pattern = re.compile("(?<=Quality=).*")
-    _signal_pattern = re.compile("(?<=Signal level=).*")
-    _essid_pattern = re.compile("(?<=ESSID:).*")
+    __slots__ = ("_cell_number", "_address", "_essid", "_quality", "_channel",
+                 "_signal_level", "_frequency")
+
+    # The only lines of a cell that are parsed. All the others (the numerous
+    # "IE:" lines, the bit rates...) are skipped with a single test
+    _parsed_prefixes = ("Channel:", "Frequency:", "Quality=", "ESSID:")
 
     def __init__(self,line):
         self._cell_number = 0
@@ -48,19 +50,15 @@ class WifiCell:
         return
 
     def _parse_cell(self, line):
-        m = WifiCell._cell_pattern.search(line)
-        if m is not None:
-            content = m.group(0).split("-")
-            try:
-                self._cell_number = int(content[0])
-                address = content[1].strip();
-                m2 = WifiCell._address_pattern.search(address)
-                if m2 is not None:
-                    self._address = m2.group(0).strip()
-
-            except :
-                #TODO : handle that
-                print("Exception in parsing")
+        # Cell 05 - Address: CA:FB:1E:B1:CA:2F
+        head, separator, address = line.strip().partition(" - ")
+        try:
+            self._cell_number = int(head[len("Cell"):])
+        except ValueError:
+            logging.getLogger(type(self).__name__).warning("Cannot parse cell line : %s", line)
+            return
+        if address.startswith("Address:"):
+            self._address = address[len("Address:"):].strip()
         return
 
     def append_line(self, line):
@@ -71,31 +69,31 @@ class WifiCell:
             Signal level
             ESSID
         """
-        if self._channel == 0 :     # Do not check it twice
-            match = WifiCell._channel_pattern.search(line)
-            if(match is not None):
-                self._channel = int(match.group(0))
-                return
-        if self._frequency == 0.0 :
-            match = WifiCell._frequency_pattern.search(line)
-            if(match is not None):
-                self._frequency = float(match.group(0).split(" ")[0])
-                return
-        if self._quality == 0.0 :
-            match = WifiCell._quality_pattern.search(line)
-            if(match is not None):
-                fraction = match.group(0).split(" ")[0].split("/")
-                self._quality = float(fraction[0])/float(fraction[1])
-            # Signal level is on the same line than Quality
-            match = WifiCell._signal_pattern.search(line)
-            if(match is not None):
-                self._signal_level = int(match.group(0).split(" ")[0])
+        line = line.strip()
+        if not line.startswith(WifiCell._parsed_prefixes):
             return
-        if not self._essid :
-            match = WifiCell._essid_pattern.search(line)
-            if(match is not None):
-                self._essid = match.group(0).strip().strip("\"")
-                return
+        try:
+            if line[0] == "C":
+                if self._channel == 0 :     # Do not check it twice
+                    self._channel = int(line[len("Channel:"):])
+            elif line[0] == "F":
+                if self._frequency == 0.0 :
+                    self._frequency = float(line[len("Frequency:"):].split(" ", 1)[0])
+            elif line[0] == "Q":
+                if self._quality == 0.0 :
+                    # Quality=51/70  Signal level=-59 dBm
+                    fields = line[len("Quality="):].split()
+                    fraction = fields[0].split("/")
+                    self._quality = float(fraction[0])/float(fraction[1])
+                    # Signal level is on the same line than Quality
+                    for field in fields[1:]:
+                        if field.startswith("level="):
+                            self._signal_level = int(field[len("level="):])
+                            break
+            elif not self._essid :
+                self._essid = line[len("ESSID:"):].strip("\"")
+        except (ValueError, IndexError):
+            logging.getLogger(type(self).__name__).warning("Cannot parse cell line : %s", line)
         return
 
 
@@ -128,19 +126,50 @@ class WifiCell:
     essid = property(_get_essid)
 
 
+def iter_cells(lines):
+    """ Parses the lines of the output of 'iwlist scan' in a single pass, and
+        yields each WifiCell as soon as it is complete, that is when the next
+        cell begins or when the lines are exhausted
+    """
+    cell = None
+    parsed_prefixes = WifiCell._parsed_prefixes
+    for line in lines:
+        line = line.lstrip()
+        if line.startswith(parsed_prefixes):
+            if cell is not None:
+                cell.append_line(line)
+        elif line.startswith("Cell "):
+            if cell is not None:
+                yield cell
+            cell = WifiCell(line)
+    if cell is not None:
+        yield cell
+
+
+def parse_cells(lines):
+    """ Returns the list of the WifiCell described by the lines of the
+        output of 'iwlist scan'
+    """
+    return list(iter_cells(lines))
+
+
 class WifiProbe:
     """ This is is a tool class intended to get output strings from the system.
         It is used by WifiScanner
         For testing it may be replaced with test classes
+        The commands are run by processes, the subprocess module by default
     """
 
+    def __init__(self, processes=subprocess):
+        self._processes = processes
+
     def get_iwgetid(self):
         """
             Returns the output of 'iwgetid' command,
             wich contains the interface information and the ESSID information
             from the wifi interface
         """
-        proc = subprocess.Popen(["iwgetid"],stdout=subprocess.PIPE, universal_newlines=True)
+        proc = self._processes.Popen(["iwgetid"],stdout=self._processes.PIPE, universal_newlines=True)
         out, err = proc.communicate()
         return out
 
@@ -149,10 +178,37 @@ class WifiProbe:
             Returns the result of the system command 'iwlist wlan0 scan'
             Wich contains the description of all accessible wifi cells
         """
-        proc = subprocess.Popen(["iwlist", interface, "scan"],stdout=subprocess.PIPE, universal_newlines=True)
+        proc = self._processes.Popen(["iwlist", interface, "scan"],stdout=self._processes.PIPE, universal_newlines=True)
         out, err = proc.communicate()
         return out
 
+    def iter_iwlist(self, interface = "wlan0"):
+        """
+            Yields the lines of the result of 'iwlist wlan0 scan' as they are
+            written by the command, without buffering the whole output.
+            If the generator is closed before the end, the command is killed.
+        """
+        proc = self._processes.Popen(["iwlist", interface, "scan"],stdout=self._processes.PIPE, universal_newlines=True)
+        try:
+            for line in proc.stdout:
+                yield line.rstrip("\n")
+        finally:
+            if proc.poll() is None:
+                proc.kill()
+            proc.stdout.close()
+            proc.wait()
+
+    def get_wireless_stats(self):
+        """
+            Returns the content of /proc/net/wireless, which gives the link
+            quality of the wireless interfaces without any scan,
+            or an empty string if it cannot be read
+        """
+        try:
+            with open("/proc/net/wireless") as stats_file:
+                return stats_file.read()
+        except OSError:
+            return ""
 
 
 class WifiScanner:
@@ -179,12 +235,16 @@ class WifiScanner:
         self._cells = []
         self._essid = ""
         self._probe = probe
-        # self._interface = interface
+        # the wifi interface given by iwgetid, None until it is known
+        self._interface = None
         self._current_cell = None
         return
 
-    def scan_wifi(self):
+    def scan_wifi(self, current_only = False):
         """ scans the wifi
+            The output of iwlist is parsed while the scan goes on. If current_only
+            is True, the scan is stopped as soon as the connected cell is parsed :
+            the other cells may then be missing from the cells property.
         """
         self._current_cell = None
         self._cells = []
@@ -196,29 +256,52 @@ class WifiScanner:
         else:
             self._essid = ""
 
-        wlan = iwid.split()[0]
-        iwlist = self._probe.get_iwlist(wlan)
-
-        cell = None
-        for line in iwlist.split("\n"):
-            cell_match = re.match("^[ ]*Cell ",line)
-            if cell_match is not None:
-                # then create a new cell
-                cell = WifiCell(line)
+        fields = iwid.split()
+        if fields:
+            self._interface = fields[0]
+        wlan = fields[0] if fields else interface
+        lines = self._probe.iter_iwlist(wlan)
+        try:
+            for cell in iter_cells(lines):
                 self._cells.append(cell)
-            elif cell is not None:
-                cell.append_line(line)
-            # check if the previous parsed cell is the used one
-
-        for cell in self._cells:
-            if self._essid and cell.essid == self._essid:
-                self._current_cell = cell
-                break
+                if self._current_cell is None and self._essid and cell.essid == self._essid:
+                    self._current_cell = cell
+                    if current_only:
+                        break
+        finally:
+            # stops the scan if it is not finished
+            lines.close()
+
+    def measure_link_quality(self, interface = None):
+        """ Returns the quality (1 is maximum) of the link of the interface,
+            read from the kernel statistics : this is cheap and does not
+            disturb the connection, contrary to scan_wifi().
+            By default, the interface is the connected one, given by iwgetid.
+            Returns None if the statistics are not available for the interface.
+        """
+        if interface is None:
+            interface = self.interface
+        for line in self._probe.get_wireless_stats().split("\n"):
+            fields = line.split()
+            if len(fields) >= 3 and fields[0] == interface + ":":
+                try:
+                    link = float(fields[2].rstrip("."))
+                except ValueError:
+                    return None
+                return min(1.0, max(0.0, link / LINK_QUALITY_MAX))
+        return None
 
     def _get_essid(self):
         return self._essid
 
     def _get_interface(self):
+        if self._interface is None:
+            # iwgetid is run once : the interface does not change
+            fields = self._probe.get_iwgetid().split()
+            if not fields:
+                # not connected
+                return interface
+            self._interface = fields[0]
         return self._interface
 
     def _get_cells(self):
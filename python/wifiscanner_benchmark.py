@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Compares the single pass parser of wifiscanner with the former regex based
+one, over a large recorded scan (a crowded building may show hundreds
+of cells). Can be launched without any wifi interface :
+    python3 wifiscanner_benchmark.py
+"""
+import re
+import sys
+import time
+
+from wifiscanner import parse_cells
+
+# One cell recorded by 'iwlist wlan0 scan', repeated with different numbers
+RECORDED_CELL = """          Cell {number:02d} - Address: CA:FB:1E:B1:{number_hex}:2F
+                    Channel:12
+                    Frequency:2.467 GHz (Channel 12)
+                    Quality={quality}/70  Signal level=-78 dBm  
+                    Encryption key:on
+                    ESSID:"FreeWifi_secure_{number}"
+                    Bit Rates:1 Mb/s; 2 Mb/s; 5.5 Mb/s; 11 Mb/s; 9 Mb/s
+                              18 Mb/s; 36 Mb/s; 54 Mb/s
+                    Bit Rates:6 Mb/s; 12 Mb/s; 24 Mb/s; 48 Mb/s
+                    Mode:Master
+                    Extra:tsf=0000000000000000
+                    Extra: Last beacon: 10ms ago
+                    IE: Unknown: 000F46726565576966695F736563757265
+                    IE: Unknown: 010882848B961224486C
+                    IE: Unknown: 03010C
+                    IE: Unknown: 2A0104
+                    IE: Unknown: 32040C183060
+                    IE: Unknown: 2D1A6E1017FFFF000001000000000000000000000000000000000000
+                    IE: Unknown: 3D160C000600000000000000000000000000000000000000
+                    IE: Unknown: 3E0100
+                    IE: WPA Version 1
+                        Group Cipher : CCMP
+                        Pairwise Ciphers (1) : CCMP
+                        Authentication Suites (1) : 802.1x
+                    IE: Unknown: DD180050F2020101000003A4000027A4000042435E0062322F00
+                    IE: Unknown: 7F0101
+                    IE: Unknown: DD07000C4300000000
+                    IE: Unknown: DD1E00904C336E1017FFFF000001000000000000000000000000000000000000
+                    IE: Unknown: DD1A00904C340C000600000000000000000000000000000000000000"""
+
+
+def recorded_scan(cell_count):
+    cells = [RECORDED_CELL.format(number=number, number_hex="{:02X}".format(number % 256),
+                                  quality=number % 70 + 1)
+             for number in range(1, cell_count + 1)]
+    return "wlan0     Scan completed :\n" + "\n".join(cells) + "\n"
+
+
+class LegacyWifiCell:
+    """ The WifiCell of the previous version of wifiscanner
+    """
+
+    _cell_pattern = re.compile("(?<=Cell).*")
+    _address_pattern = re.compile("(?<=Address:).*")
+    _channel_pattern = re.compile("(?<=Channel:).*")
+    _frequency_pattern = re.compile("(?<=Frequency:).*")
+    _quality_pattern = re.compile("(?<=Quality=).*")
+    _signal_pattern = re.compile("(?<=Signal level=).*")
+    _essid_pattern = re.compile("(?<=ESSID:).*")
+
+    def __init__(self, line):
+        self.cell_number = 0
+        self.address = ""
+        self.essid = ""
+        self.quality = 0.0
+        self.channel = 0
+        self.signal_level = 0
+        self.frequency = 0.0
+        m = LegacyWifiCell._cell_pattern.search(line)
+        if m is not None:
+            content = m.group(0).split("-")
+            self.cell_number = int(content[0])
+            m2 = LegacyWifiCell._address_pattern.search(content[1].strip())
+            if m2 is not None:
+                self.address = m2.group(0).strip()
+
+    def append_line(self, line):
+        if self.channel == 0:
+            match = LegacyWifiCell._channel_pattern.search(line)
+            if match is not None:
+                self.channel = int(match.group(0))
+                return
+        if self.frequency == 0.0:
+            match = LegacyWifiCell._frequency_pattern.search(line)
+            if match is not None:
+                self.frequency = float(match.group(0).split(" ")[0])
+                return
+        if self.quality == 0.0:
+            match = LegacyWifiCell._quality_pattern.search(line)
+            if match is not None:
+                fraction = match.group(0).split(" ")[0].split("/")
+                self.quality = float(fraction[0])/float(fraction[1])
+            match = LegacyWifiCell._signal_pattern.search(line)
+            if match is not None:
+                self.signal_level = int(match.group(0).split(" ")[0])
+            return
+        if not self.essid:
+            match = LegacyWifiCell._essid_pattern.search(line)
+            if match is not None:
+                self.essid = match.group(0).strip().strip("\"")
+
+
+def legacy_parse_cells(output):
+    cells = []
+    cell = None
+    for line in output.split("\n"):
+        if re.match("^[ ]*Cell ", line) is not None:
+            cell = LegacyWifiCell(line)
+            cells.append(cell)
+        elif cell is not None:
+            cell.append_line(line)
+    return cells
+
+
+def fields(cell):
+    return (cell.cell_number, cell.address, cell.channel, cell.frequency,
+            cell.quality, cell.signal_level, cell.essid)
+
+
+def best_time(function, argument, repeat=5):
+    durations = []
+    for i in range(repeat):
+        t0 = time.perf_counter()
+        function(argument)
+        durations.append(time.perf_counter() - t0)
+    return min(durations)
+
+
+if __name__ == "__main__":
+    for cell_count in (10, 100, 1000):
+        output = recorded_scan(cell_count)
+        legacy = legacy_parse_cells(output)
+        cells = parse_cells(output.split("\n"))
+        if [fields(cell) for cell in legacy] != [fields(cell) for cell in cells]:
+            print("ERROR : the parsers do not give the same cells")
+            sys.exit(1)
+        legacy_time = best_time(legacy_parse_cells, output)
+        single_pass_time = best_time(lambda text: parse_cells(text.split("\n")), output)
+        print("{:5d} cells, {:6d} lines : legacy {:8.2f} ms, single pass {:8.2f} ms, x{:.1f}".format(
+              cell_count, output.count("\n"), legacy_time * 1000,
+              single_pass_time * 1000, legacy_time / single_pass_time))